@@ -0,0 +1,215 @@
+import argparse
+import glob
+import json
+import sys
+from collections import deque
+from multiprocessing import Pipe
+from multiprocessing import Process
+from multiprocessing.connection import wait
+from pathlib import Path
+from time import monotonic
+from time import perf_counter
+
+from corner_finder import DEFAULT_THRESHOLDS
+from corner_finder import ModelIndex
+from corner_finder import find_internal_edge_corners
+from corner_finder import find_internal_fillet_corners
+from corner_finder import get_face_cylinder
+from importers import IMPORT_METHODS
+from importers import ShapeCache
+from importers import import_file
+
+# How often (in seconds) the scheduler checks for timeouts and crashes
+POLL_INTERVAL = .1
+
+
+def collect_paths(patterns):
+    """Get the CAD files matching these directories, glob patterns or files.
+
+    Directories are searched recursively for files with a supported
+    extension. The result is sorted and free of duplicates.
+    """
+    paths = set()
+    for pattern in patterns:
+        if Path(pattern).is_dir():
+            candidates = Path(pattern).rglob('*')
+        else:
+            candidates = map(Path, glob.glob(pattern, recursive=True))
+        for path in candidates:
+            if path.is_file() and path.suffix[1:].lower() in IMPORT_METHODS:
+                paths.add(str(path))
+    return sorted(paths)
+
+
+def analyse_file(path, cache_dir=None):
+    """Find the internal corners of this CAD file.
+
+    Returns a JSON-serialisable dict with the corners (as indices of the
+    ModelIndex of the file), the fillet radii and the time of each stage.
+    If cache_dir is given, the imported shape is cached there (see
+    ShapeCache).
+    """
+    cache = ShapeCache(cache_dir) if cache_dir else None
+    start = perf_counter()
+    model = import_file(path, cache)
+    import_time = perf_counter() - start
+    result = analyse_shape(model)
+    result['timings']['import'] = import_time
+    result['timings']['total'] += import_time
+    result['import_cache'] = (('hit' if cache.hits else 'miss') if cache
+                              else None)
+    return dict(path=path, **result)
+
+
+def analyse_shape(model, thresholds=DEFAULT_THRESHOLDS):
+    """Find the internal corners of an imported shape.
+
+    Returns the dict of analyse_file, without the path and the import.
+    """
+    timings = {}
+    start = stage_start = perf_counter()
+    index = ModelIndex(model)
+    timings['index'] = perf_counter() - stage_start
+    stage_start = perf_counter()
+    edges = find_internal_edge_corners(model, index, thresholds=thresholds)
+    timings['edge_corners'] = perf_counter() - stage_start
+    stage_start = perf_counter()
+    fillets = find_internal_fillet_corners(model, index,
+                                           thresholds=thresholds)
+    timings['fillet_corners'] = perf_counter() - stage_start
+    timings['total'] = perf_counter() - start
+    return {
+        'status': 'ok',
+        'n_faces': len(index.faces()),
+        'n_edges': len(index.edges()),
+        'n_edge_corners': len(edges),
+        'n_fillet_corners': len(fillets),
+        'edge_corners': [index.edge_index(edge) for edge in edges],
+        'fillet_corners': [index.face_index(face) for face in fillets],
+        'fillet_radii': [get_face_cylinder(face).Radius() for face in fillets],
+        'timings': timings,
+    }
+
+
+def _run_task(path, cache_dir, connection):
+    """Process target: analyse a file and send the result to the connection.
+    """
+    try:
+        result = analyse_file(path, cache_dir)
+    except Exception as exc:
+        result = {'path': path, 'status': 'error',
+                  'error': "%s: %s" % (type(exc).__name__, exc)}
+    connection.send(result)
+    connection.close()
+
+
+def iter_batch_results(paths, workers=1, timeout=None, cache_dir=None):
+    """Analyse these files in parallel, yielding each result as it is ready.
+
+    Results are yielded in completion order. Each file is analysed in its own
+    process, with at most `workers` processes at a time: unlike a
+    ProcessPoolExecutor, this makes it possible to kill a file that exceeds
+    the timeout (in seconds) or that crashes the interpreter, without
+    stalling the rest of the batch. Imported shapes are cached in cache_dir,
+    if given.
+
+    Each process sends its result through its own pipe, so that killing a
+    process while it writes its result cannot corrupt the results of the
+    others.
+    """
+    pending = deque(paths)
+    running = {}  # result connection -> (path, process, deadline)
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                path = pending.popleft()
+                receiver, sender = Pipe(duplex=False)
+                process = Process(target=_run_task,
+                                  args=(path, cache_dir, sender),
+                                  daemon=True)
+                process.start()
+                # Keep only the worker's end open, so that the receiver gets
+                # an EOF if the worker dies.
+                sender.close()
+                deadline = monotonic() + timeout if timeout else None
+                running[receiver] = (path, process, deadline)
+            for receiver in wait(list(running), timeout=POLL_INTERVAL):
+                task = running.pop(receiver, None)
+                if task is None:
+                    continue
+                path, process, _ = task
+                try:
+                    result = receiver.recv()
+                except (EOFError, OSError):
+                    # The process crashed before sending its whole result.
+                    process.join()
+                    result = {'path': path, 'status': 'error',
+                              'error': "worker exited with code %s"
+                                       % process.exitcode}
+                else:
+                    process.join()
+                receiver.close()
+                yield result
+            now = monotonic()
+            for receiver, (path, process, deadline) in list(running.items()):
+                if deadline is not None and now > deadline:
+                    # A result sent meanwhile is dropped with the pipe.
+                    del running[receiver]
+                    process.kill()
+                    process.join()
+                    receiver.close()
+                    yield {'path': path, 'status': 'timeout',
+                           'error': "timed out after %gs" % timeout}
+    finally:
+        # Only reached with running processes if the consumer stopped early.
+        for receiver, (_, process, _) in running.items():
+            process.kill()
+            process.join()
+            receiver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the internal corners of many CAD files, and stream "
+                    "the results as JSON lines."
+    )
+    parser.add_argument('paths', type=str, nargs='+',
+                        help="files, directories or glob patterns")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="number of files analysed in parallel")
+    parser.add_argument('-t', '--timeout', type=float, default=None,
+                        help="maximum time per file, in seconds")
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help="output file (default: standard output)")
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help="directory where imported shapes are cached")
+    parser.add_argument('--skip-errors', action='store_true',
+                        help="keep going when a file fails or times out")
+    args = parser.parse_args()
+
+    paths = collect_paths(args.paths)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    results = iter_batch_results(paths, args.workers, args.timeout,
+                                 args.cache_dir)
+    n_done = n_failed = 0
+    try:
+        for result in results:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            n_done += 1
+            if result['status'] != 'ok':
+                n_failed += 1
+                if not args.skip_errors:
+                    break
+    finally:
+        # Kills the remaining processes if we stopped early.
+        results.close()
+        if output is not sys.stdout:
+            output.close()
+    print("%d/%d files analysed, %d failed" % (n_done, len(paths), n_failed),
+          file=sys.stderr)
+    sys.exit(1 if n_failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import importlib
+import resource
+from multiprocessing import Pool
+from time import perf_counter
+
+from importers import read_dxf_file
+from importers import read_dxf_file_via_step
+
+# DXF importers to compare
+IMPORTERS = {
+    'brep': read_dxf_file,
+    'step': read_dxf_file_via_step,
+}
+# Modules that the importers import lazily, imported before the timing
+PRELOADED_MODULES = ('cadquery', 'OCC.Extend.DataExchange')
+
+
+def time_import(name, path):
+    """Import a DXF file with an importer, in a fresh worker process.
+
+    Returns (time in seconds, increase of the peak memory in MB). The
+    dependencies are imported first, so that only the import itself is
+    measured.
+    """
+    for module in PRELOADED_MODULES:
+        importlib.import_module(module)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = perf_counter()
+    IMPORTERS[name](path)
+    elapsed = perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux.
+    return elapsed, (rss_after - rss_before) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the DXF import through BRep and through STEP."
+    )
+    parser.add_argument('path', type=str, nargs='?',
+                        default='assets/valve-exhaust-flange-2D.dxf',
+                        help="DXF file")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="number of imports per importer")
+    args = parser.parse_args()
+
+    print("%8s %10s %16s" % ("via", "time (s)", "peak memory (MB)"))
+    for name in IMPORTERS:
+        for _ in range(args.repeat):
+            with Pool(1) as pool:
+                elapsed, memory = pool.apply(time_import, (name, args.path))
+            print("%8s %10.3f %16.1f" % (name, elapsed, memory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from OCC.Core.BRepAdaptor import BRepAdaptor_Curve
+from OCC.Core.GeomAbs import GeomAbs_Line
+
+from corner_finder import MAX_EDGE_SAMPLES
+from corner_finder import FeatureTable
+from corner_finder import ModelIndex
+from corner_finder import get_edge_sample_count
+from corner_finder import get_edge_samples
+from synthetic_models import FACES_PER_FEATURE
+from synthetic_models import make_mixed_plate
+
+# Default numbers of faces of the benchmark models
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def time_edge_samples(edges_with_faces, n_samples):
+    """Time the sampling of these (edge, faces) pairs, with n_samples samples
+    each (None for the adaptive number)."""
+    start = perf_counter()
+    for edge, faces in edges_with_faces:
+        get_edge_samples(edge, faces, n_samples)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the evaluation of edges at a single point, at an "
+                    "adaptive number of samples and at a fixed number of "
+                    "samples, on parts with straight and curved edges."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="approximate numbers of faces of the parts")
+    args = parser.parse_args()
+
+    print("%8s %8s %14s %11s %13s %11s %15s" % (
+        "faces", "edges", "samples/edge", "single (s)", "adaptive (s)",
+        "fixed (s)", "curved corners"))
+    for n_faces in args.sizes:
+        n_features = max(1, round(n_faces / FACES_PER_FEATURE))
+        index = ModelIndex(make_mixed_plate(n_features))
+        faces = index.faces()
+        edges_with_faces = [
+            (edge, [faces[i] for i in index.face_ids_from_edge(edge_id)])
+            for edge_id, edge in enumerate(index.edges())
+            if len(index.face_ids_from_edge(edge_id)) == 2]
+        n_samples = [get_edge_sample_count(BRepAdaptor_Curve(edge),
+                                           edge_faces)
+                     for edge, edge_faces in edges_with_faces]
+        single_time = time_edge_samples(edges_with_faces, 1)
+        adaptive_time = time_edge_samples(edges_with_faces, None)
+        fixed_time = time_edge_samples(edges_with_faces, MAX_EDGE_SAMPLES)
+        table = FeatureTable(index)
+        corner_ids = table.edge_corner_ids()
+        n_curved = np.count_nonzero(
+            table.edge_curve_type[corner_ids] != GeomAbs_Line)
+        print("%8d %8d %14.2f %11.3f %13.3f %11.3f %15d" % (
+            len(faces), len(edges_with_faces), np.mean(n_samples),
+            single_time, adaptive_time, fixed_time, n_curved))
+    print("single: one sample per edge, like the previous evaluation at a "
+          "vertex; fixed: %d samples per edge." % MAX_EDGE_SAMPLES)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+from itertools import product
+from time import perf_counter
+
+from corner_finder import CornerThresholds
+from corner_finder import ModelIndex
+from corner_finder import extract_features
+from corner_finder import find_internal_corners
+from corner_finder import get_edge_corner_ids
+from corner_finder import get_fillet_corner_ids
+from synthetic_models import make_part_with_faces
+
+# Default numbers of faces of the benchmark models
+DEFAULT_SIZES = [100, 1000, 10000]
+# Thresholds of the benchmark sweep
+SWEEP_RADII = [.5, 1., 2., 3., 4., 5., 6., 8.]
+SWEEP_ANGLES = [1., 5., 10., 30., 60.]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare a threshold sweep done by rerunning the corner "
+                    "finders and by querying a precomputed feature table."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="approximate numbers of faces of the models")
+    parser.add_argument('--reruns', type=int, default=3,
+                        help="number of thresholds timed with full reruns")
+    args = parser.parse_args()
+
+    sweep = [CornerThresholds(max_fillet_radius=radius,
+                              min_angle_degrees=angle)
+             for radius, angle in product(SWEEP_RADII, SWEEP_ANGLES)]
+    print("%8s %12s %14s %12s %14s" % (
+        "faces", "rerun (s)", "extract (s)", "query (us)", "sweep speedup"))
+    for n_faces in args.sizes:
+        model = make_part_with_faces(n_faces)
+        index = ModelIndex(model)
+        # A full rerun per threshold; a few are enough to get its time.
+        start = perf_counter()
+        for thresholds in sweep[:args.reruns]:
+            find_internal_corners(model, index, thresholds)
+        rerun_time = (perf_counter() - start) / args.reruns
+        start = perf_counter()
+        features = extract_features(model, index).arrays()
+        extract_time = perf_counter() - start
+        start = perf_counter()
+        for thresholds in sweep:
+            get_edge_corner_ids(features, thresholds)
+            get_fillet_corner_ids(features, thresholds)
+        query_time = (perf_counter() - start) / len(sweep)
+        speedup = (rerun_time * len(sweep)
+                   / (extract_time + query_time * len(sweep)))
+        print("%8d %12.3f %14.3f %12.1f %13.1fx" % (
+            n_faces, rerun_time, extract_time, query_time * 1e6, speedup))
+    print("The speedup is for a sweep of %d thresholds." % len(sweep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import glob
+import gzip
+import os
+import tempfile
+from threading import Event
+from threading import Thread
+from time import perf_counter
+from urllib.request import urlopen
+
+from OCC.Core.gp import gp_Trsf
+from OCC.Core.gp import gp_Vec
+from OCC.Core.TopLoc import TopLoc_Location
+
+from scene_server import SceneServer
+from synthetic_models import get_grid_layout
+from synthetic_models import make_compound
+from synthetic_models import make_mixed_plate
+from viewer import Viewer
+
+# Default numbers of parts of the benchmark assemblies
+DEFAULT_SIZES = [4, 16, 64]
+# Distance between the parts of the benchmark assemblies
+PART_SPACING = 200.
+
+
+def make_assembly(n_parts):
+    """Make a compound of n_parts different mixed plates."""
+    _, corners = get_grid_layout(n_parts, PART_SPACING)
+    parts = []
+    for i, (x, y) in enumerate(corners):
+        trsf = gp_Trsf()
+        trsf.SetTranslation(gp_Vec(x, y, 0.))
+        parts.append(make_mixed_plate(4 + i % 8).Moved(TopLoc_Location(trsf)))
+    return make_compound(parts)
+
+
+def time_static(n_parts):
+    """Get the time until the page of the static viewer can be served: all
+    the shapes are meshed before the first one is drawn."""
+    model = make_assembly(n_parts)
+    with tempfile.TemporaryDirectory() as directory:
+        start = perf_counter()
+        viewer = Viewer(path=directory)
+        viewer.DisplayShape(model, export_edges=True)
+        viewer.generate_html_file()
+        return perf_counter() - start
+
+
+def time_streaming(n_parts):
+    """Get (time to the first shape event, time to the last event, raw and
+    gzipped sizes of the binary files) of the streaming viewer."""
+    model = make_assembly(n_parts)
+    directory = tempfile.mkdtemp()
+    start = perf_counter()
+    viewer = Viewer(path=directory, streaming=True)
+    viewer.DisplayShape(model, export_edges=True)
+    viewer.generate_html_file()
+    events = viewer.iter_scene_events()
+    server = SceneServer(directory, lambda: next(events, None))
+    addresses = []
+    ready = Event()
+
+    def on_ready(address):
+        addresses.append(address)
+        ready.set()
+
+    Thread(target=asyncio.run, args=(server.serve(port=0, on_ready=on_ready),),
+           daemon=True).start()
+    ready.wait()
+    first_time = None
+    with urlopen("http://%s:%d/events" % addresses[0]) as response:
+        for line in response:
+            if first_time is None and line.startswith(b"event: shape"):
+                first_time = perf_counter() - start
+    last_time = perf_counter() - start
+    raw_size = gzip_size = 0
+    for path in glob.glob(os.path.join(directory, '*.bin')):
+        with open(path, 'rb') as f:
+            data = f.read()
+        raw_size += len(data)
+        gzip_size += len(gzip.compress(data, 6))
+    return first_time, last_time, raw_size, gzip_size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the time to the first shape of the static and "
+                    "streaming viewers, on assemblies of different parts."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="numbers of parts of the assemblies")
+    args = parser.parse_args()
+
+    print("%8s %12s %12s %12s %10s %10s" % (
+        "parts", "static (s)", "first (s)", "last (s)", "raw (kB)",
+        "gzip (kB)"))
+    for n_parts in args.sizes:
+        static_time = time_static(n_parts)
+        first_time, last_time, raw_size, gzip_size = time_streaming(n_parts)
+        print("%8d %12.3f %12.3f %12.3f %10.1f %10.1f" % (
+            n_parts, static_time, first_time, last_time, raw_size / 1e3,
+            gzip_size / 1e3))
+    print("The static viewer draws its first shape once all of them are "
+          "meshed; the streaming viewer as soon as the first part is.")
+
+
+if __name__ == "__main__":
+    main()
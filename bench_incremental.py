@@ -0,0 +1,59 @@
+import argparse
+from time import perf_counter
+
+from corner_finder import find_internal_corners
+from revisions import Revision
+from synthetic_models import FACES_PER_FEATURE
+from synthetic_models import make_mixed_plate
+
+# Default numbers of faces of the benchmark models
+DEFAULT_SIZES = [100, 1000, 10000]
+# Default number of features changed between the two revisions
+DEFAULT_EDITS = 1
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the full and incremental corner analyses of a "
+                    "revision of a part, after a small edit."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="approximate numbers of faces of the parts")
+    parser.add_argument('--edits', type=int, default=DEFAULT_EDITS,
+                        help="number of features deepened in the revision")
+    args = parser.parse_args()
+
+    print("%8s %10s %12s %9s %14s %14s %12s" % (
+        "faces", "full (s)", "incr. (s)", "speedup", "edges computed",
+        "faces computed", "added/rem."))
+    for n_faces in args.sizes:
+        n_features = max(1, round(n_faces / FACES_PER_FEATURE))
+        # Spread the edited features over the part.
+        deeper = set(range(0, n_features, max(1, n_features // args.edits)))
+        previous = Revision(make_mixed_plate(n_features))
+        # Build the revision twice, since the analysis leaves data (e.g.
+        # triangulations) in the shapes.
+        model = make_mixed_plate(n_features, deeper=deeper)
+        start = perf_counter()
+        find_internal_corners(model)
+        full_time = perf_counter() - start
+        model = make_mixed_plate(n_features, deeper=deeper)
+        start = perf_counter()
+        revision = Revision(model, previous)
+        changes = revision.diff(previous)
+        incremental_time = perf_counter() - start
+        n_edges, n_faces_computed = revision.n_computed()
+        n_added = len(changes.added_edges) + len(changes.added_fillets)
+        n_removed = len(changes.removed_edges) + len(changes.removed_fillets)
+        print("%8d %10.3f %12.3f %8.1fx %14s %14s %12s" % (
+            len(revision.index.faces()), full_time, incremental_time,
+            full_time / incremental_time,
+            "%d/%d" % (n_edges, len(revision.index.edges())),
+            "%d/%d" % (n_faces_computed, len(revision.index.faces())),
+            "%d/%d" % (n_added, n_removed)))
+    print("The incremental time includes matching the faces and edges with "
+          "the previous revision.")
+
+
+if __name__ == "__main__":
+    main()
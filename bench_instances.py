@@ -0,0 +1,86 @@
+import argparse
+from time import perf_counter
+
+from OCC.Core.gp import gp_Trsf
+from OCC.Core.gp import gp_Vec
+from OCC.Core.TopLoc import TopLoc_Location
+
+from corner_finder import find_instanced_corners
+from corner_finder import find_internal_corners
+from instances import get_instances
+from meshing import compute_mesh
+from synthetic_models import get_grid_layout
+from synthetic_models import make_compound
+from synthetic_models import make_mixed_plate
+
+# Default numbers of instances of the part of the benchmark assemblies
+DEFAULT_SIZES = [1, 10, 100]
+# Number of features of the part repeated in the benchmark assemblies
+FEATURES_PER_PART = 6
+# Distance between the instances of the benchmark assemblies
+INSTANCE_SPACING = 200.
+
+
+def make_assembly(n_instances):
+    """Make a compound of n_instances instances of the same mixed plate.
+
+    The instances share the TShape of the plate, and only differ by their
+    location, as in assemblies read from STEP files.
+    """
+    plate = make_mixed_plate(FEATURES_PER_PART)
+    _, corners = get_grid_layout(n_instances, INSTANCE_SPACING)
+    instances = []
+    for x, y in corners:
+        trsf = gp_Trsf()
+        trsf.SetTranslation(gp_Vec(x, y, 0.))
+        instances.append(plate.Moved(TopLoc_Location(trsf)))
+    return make_compound(instances)
+
+
+def time_call(func, *args):
+    """Call func(*args), and get (time in seconds, result)."""
+    start = perf_counter()
+    result = func(*args)
+    return perf_counter() - start, result
+
+
+def mesh_instances(assembly):
+    """Mesh each unique part of an assembly once, as the Viewer does."""
+    return [compute_mesh(prototype)
+            for prototype, _ in get_instances(assembly)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the corner detection and meshing of assemblies "
+                    "of repeated parts, per instance and per unique part."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="numbers of instances of the part")
+    args = parser.parse_args()
+
+    print("%10s %8s %14s %14s %8s" % ("instances", "stage", "all (s)",
+                                      "unique (s)", "speedup"))
+    for n_instances in args.sizes:
+        assembly = make_assembly(n_instances)
+        all_time, (edges, fillets) = time_call(find_internal_corners,
+                                               assembly)
+        unique_time, (unique_edges, unique_fillets) = time_call(
+            find_instanced_corners, assembly)
+        assert len(unique_edges) == len(edges)
+        assert len(unique_fillets) == len(fillets)
+        print("%10d %8s %14.3f %14.3f %7.1fx" % (
+            n_instances, "corners", all_time, unique_time,
+            all_time / unique_time))
+        # Mesh new assemblies, since meshing keeps the triangulation in the
+        # shape.
+        all_time, _ = time_call(compute_mesh, make_assembly(n_instances))
+        unique_time, _ = time_call(mesh_instances,
+                                   make_assembly(n_instances))
+        print("%10d %8s %14.3f %14.3f %7.1fx" % (
+            n_instances, "mesh", all_time, unique_time,
+            all_time / unique_time))
+
+
+if __name__ == "__main__":
+    main()
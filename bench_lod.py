@@ -0,0 +1,55 @@
+import argparse
+from time import perf_counter
+
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Copy
+
+from meshing import compute_mesh
+from synthetic_models import make_part_with_faces
+from viewer import LOD_QUALITY_FACTOR
+
+# Default numbers of faces of the benchmark models
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+
+def time_mesh(shape, mesh_quality):
+    """Mesh a shape, and get (time in seconds, number of triangles)."""
+    start = perf_counter()
+    mesh = compute_mesh(shape, mesh_quality=mesh_quality)
+    return perf_counter() - start, len(mesh['indices']) // 3
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the time to the first mesh of the viewer with "
+                    "and without levels of detail."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="approximate numbers of faces of the models")
+    parser.add_argument('--lod-levels', type=int, default=2,
+                        help="number of levels finer than the first mesh")
+    args = parser.parse_args()
+
+    print("%8s %8s %10s %10s %10s" % ("faces", "level", "quality",
+                                      "time (s)", "triangles"))
+    for n_faces in args.sizes:
+        model = make_part_with_faces(n_faces)
+        # Without levels of detail, the first mesh is the final one. Mesh a
+        # copy, since meshing keeps the triangulation in the shape.
+        copy = BRepBuilderAPI_Copy(model, True, False).Shape()
+        full_time, full_triangles = time_mesh(copy, 1.)
+        print("%8d %8s %10g %10.3f %10d" % (n_faces, "none", 1., full_time,
+                                            full_triangles))
+        # With levels of detail, the first mesh is the coarsest, and the
+        # finer ones are computed in the background, in this order.
+        for level in range(args.lod_levels + 1):
+            quality = LOD_QUALITY_FACTOR ** (args.lod_levels - level)
+            level_time, n_triangles = time_mesh(model, quality)
+            print("%8d %8d %10g %10.3f %10d" % (n_faces, level, quality,
+                                                level_time, n_triangles))
+        print()
+    print("The time to the first mesh is the time of level 0, against the "
+          "time without levels of detail.")
+
+
+if __name__ == "__main__":
+    main()
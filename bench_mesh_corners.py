@@ -0,0 +1,66 @@
+import argparse
+import glob
+from time import perf_counter
+
+from corner_finder import ModelIndex
+from corner_finder import find_internal_corners
+from importers import import_file
+from mesh_corners import find_internal_corners_from_mesh
+from synthetic_models import make_part_with_faces
+
+# Default numbers of faces of the synthetic benchmark models
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def get_agreement(found, expected):
+    """Get (number of common, extra and missed ids) of found vs expected."""
+    found = set(found)
+    expected = set(expected)
+    return (len(found & expected), len(found - expected),
+            len(expected - found))
+
+
+def compare(name, model):
+    """Time both corner finders on a model, and print their agreement."""
+    index = ModelIndex(model)
+    start = perf_counter()
+    edges, fillets = find_internal_corners(model, index)
+    brep_time = perf_counter() - start
+    start = perf_counter()
+    mesh_edges, mesh_fillets = find_internal_corners_from_mesh(model, index)
+    mesh_time = perf_counter() - start
+    edge_agreement = get_agreement(map(index.edge_index, mesh_edges),
+                                   map(index.edge_index, edges))
+    fillet_agreement = get_agreement(map(index.face_index, mesh_fillets),
+                                     map(index.face_index, fillets))
+    print("%-32s %10.3f %10.3f %8.1fx %14s %14s" % (
+        name, brep_time, mesh_time, brep_time / mesh_time,
+        "%d/%d/%d" % edge_agreement, "%d/%d/%d" % fillet_agreement))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the B-rep and mesh-based corner finders: time "
+                    "and agreement of their corners."
+    )
+    parser.add_argument('--assets', type=str, default='assets/*.step',
+                        help="glob pattern of the models to compare")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="approximate numbers of faces of the synthetic "
+                             "models")
+    args = parser.parse_args()
+
+    print("Agreement: corners found by both / only by the mesh finder / only "
+          "by the B-rep finder.")
+    print("%-32s %10s %10s %9s %14s %14s" % (
+        "model", "brep (s)", "mesh (s)", "speedup", "edge corners",
+        "fillet corners"))
+    for path in sorted(glob.glob(args.assets)):
+        compare(path, import_file(path))
+    for n_faces in args.sizes:
+        compare("synthetic, %d faces" % n_faces,
+                make_part_with_faces(n_faces))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from OCC.Core.Tesselator import ShapeTesselator
+
+from meshing import get_mesh_arrays
+from meshing import read_mesh_buffers
+from meshing import write_mesh_buffers
+from synthetic_models import make_part_with_faces
+
+# Default numbers of faces of the benchmark models
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def bench_json(tess, path):
+    """Time the JSON export of a mesh, and the parsing of the file.
+
+    Returns (export time, load time, file size).
+    """
+    start = perf_counter()
+    with open(path, 'w') as f:
+        f.write(tess.ExportShapeToThreejsJSONString('bench'))
+    export_time = perf_counter() - start
+    start = perf_counter()
+    with open(path) as f:
+        json.load(f)
+    return export_time, perf_counter() - start, os.path.getsize(path)
+
+
+def bench_binary(tess, path):
+    """Time the binary export of a mesh, and the loading of the file.
+
+    Returns (export time, load time, file size).
+    """
+    start = perf_counter()
+    positions, normals, indices = get_mesh_arrays(tess)
+    write_mesh_buffers(path, positions, normals, indices)
+    export_time = perf_counter() - start
+    start = perf_counter()
+    loaded = read_mesh_buffers(path, len(positions), len(indices))
+    # Touch the data, as uploading it to the GPU would.
+    sum(array.sum() for array in loaded)
+    return export_time, perf_counter() - start, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the size and export/load times of the JSON and "
+                    "binary mesh files of the viewer."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="approximate numbers of faces of the models")
+    args = parser.parse_args()
+
+    print("Load times are measured in Python (json.load vs. memory map), as "
+          "a proxy for the parsing in the browser.")
+    print("%8s %10s %8s %10s %10s %10s" % (
+        "faces", "triangles", "format", "size (MB)", "export (s)",
+        "load (s)"))
+    with TemporaryDirectory() as tmpdirname:
+        for n_faces in args.sizes:
+            tess = ShapeTesselator(make_part_with_faces(n_faces))
+            tess.Compute(compute_edges=False, mesh_quality=1., parallel=True)
+            n_triangles = tess.ObjGetTriangleCount()
+            for name, bench in [("json", bench_json),
+                                ("binary", bench_binary)]:
+                path = str(Path(tmpdirname) / ("%d.%s" % (n_faces, name)))
+                export_time, load_time, size = bench(tess, path)
+                print("%8d %10d %8s %10.2f %10.3f %10.3f" % (
+                    n_faces, n_triangles, name, size / 2**20, export_time,
+                    load_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+from time import perf_counter
+
+from OCC.Extend.TopologyUtils import TopologyExplorer
+
+from corner_finder import ModelIndex
+from synthetic_models import make_pocketed_plate
+
+
+def time_lookups(lookup, edges):
+    """Get the average time (in seconds) of lookup(edge) over these edges."""
+    start = perf_counter()
+    for edge in edges:
+        list(lookup(edge))
+    return (perf_counter() - start) / len(edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare edge->face lookups of TopologyExplorer and "
+                    "ModelIndex on models of increasing size."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 1000], help="numbers of pockets")
+    parser.add_argument('--samples', type=int, default=50,
+                        help="number of edges looked up per model")
+    args = parser.parse_args()
+
+    print("%8s %8s %12s %14s %14s" % ("pockets", "faces", "build (s)",
+                                      "explorer (us)", "index (us)"))
+    for n_pockets in args.sizes:
+        model = make_pocketed_plate(n_pockets)
+        start = perf_counter()
+        index = ModelIndex(model)
+        build_time = perf_counter() - start
+        edges = index.edges()[:args.samples]
+        explorer = TopologyExplorer(model)
+        explorer_time = time_lookups(explorer.faces_from_edge, edges)
+        index_time = time_lookups(index.faces_from_edge, edges)
+        print("%8d %8d %12.3f %14.1f %14.1f" % (
+            n_pockets, len(index.faces()), build_time,
+            explorer_time*1e6, index_time*1e6))
+
+
+if __name__ == "__main__":
+    main()
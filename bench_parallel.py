@@ -0,0 +1,46 @@
+import argparse
+from time import perf_counter
+
+from corner_finder import ModelIndex
+from corner_finder import find_internal_edge_corners
+from corner_finder import find_internal_fillet_corners
+from synthetic_models import make_pocketed_plate
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the scaling of the parallel corner finders."
+    )
+    parser.add_argument('--pockets', type=int, default=2000,
+                        help="number of pockets of the synthetic model")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16], help="numbers of workers")
+    args = parser.parse_args()
+
+    model = make_pocketed_plate(args.pockets)
+    index = ModelIndex(model)
+    print("model: %d faces, %d edges" % (len(index.faces()),
+                                         len(index.edges())))
+    finders = [("edges", find_internal_edge_corners),
+               ("fillets", find_internal_fillet_corners)]
+    reference = {}
+    print("%8s %8s %10s %8s %8s" % ("finder", "workers", "time (s)",
+                                    "speedup", "corners"))
+    for name, finder in finders:
+        serial_time = None
+        for workers in args.workers:
+            start = perf_counter()
+            corners = finder(model, index, workers=workers)
+            elapsed = perf_counter() - start
+            if serial_time is None:
+                serial_time = elapsed
+                reference[name] = corners
+            # The parallel results must match the serial ones, in order.
+            assert len(corners) == len(reference[name])
+            assert all(a.IsSame(b) for a, b in zip(corners, reference[name]))
+            print("%8s %8d %10.3f %8.2f %8d" % (
+                name, workers, elapsed, serial_time/elapsed, len(corners)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import glob
+import json
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from time import perf_counter
+from urllib.request import Request
+from urllib.request import urlopen
+
+from corner_service import CornerService
+from corner_service import make_server
+
+
+def post_file(url, path):
+    """Get the corners of a file from the service, and the request time."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    extension = path.rsplit('.', 1)[-1].lower()
+    start = perf_counter()
+    with urlopen(Request("%s/corners?ext=%s" % (url, extension),
+                         data)) as response:
+        json.load(response)
+    return perf_counter() - start
+
+
+def run_round(url, paths, clients, repeat):
+    """Post each file `repeat` times, from `clients` concurrent clients.
+
+    Returns (sorted request latencies, throughput in requests per second).
+    """
+    start = perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = sorted(pool.map(lambda path: post_file(url, path),
+                                    paths * repeat))
+    return latencies, len(latencies) / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the latency and throughput of the corner "
+                    "service, with cold and warm caches."
+    )
+    parser.add_argument('--assets', type=str, default='assets/*.step',
+                        help="glob pattern of the files to post")
+    parser.add_argument('--url', type=str, default=None,
+                        help="URL of a running service (default: start one)")
+    parser.add_argument('-j', '--workers', type=int, default=2,
+                        help="number of workers of the started service")
+    parser.add_argument('-c', '--clients', type=int, default=8,
+                        help="number of concurrent clients")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="number of requests per file and round")
+    args = parser.parse_args()
+
+    server = service = None
+    url = args.url
+    if url is None:
+        service = CornerService(args.workers)
+        server = make_server(service, port=0)
+        url = "http://localhost:%d" % server.server_address[1]
+        Thread(target=server.serve_forever, daemon=True).start()
+    paths = sorted(glob.glob(args.assets))
+    try:
+        print("%8s %10s %10s %10s %14s" % ("round", "p50 (ms)", "p95 (ms)",
+                                           "max (ms)", "requests/s"))
+        # The first round fills the caches, the second one hits them.
+        for name in ["cold", "warm"]:
+            latencies, throughput = run_round(url, paths, args.clients,
+                                              args.repeat)
+            print("%8s %10.1f %10.1f %10.1f %14.1f" % (
+                name, latencies[len(latencies) // 2] * 1e3,
+                latencies[len(latencies) * 95 // 100] * 1e3,
+                latencies[-1] * 1e3, throughput))
+        with urlopen(url + "/metrics") as response:
+            print("service metrics:", json.dumps(json.load(response),
+                                                 indent=2))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
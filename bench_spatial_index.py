@@ -0,0 +1,68 @@
+import argparse
+import random
+from time import perf_counter
+
+from OCC.Core.BRepExtrema import BRepExtrema_DistShapeShape
+
+from corner_finder import ModelIndex
+from corner_finder import find_internal_corners
+from spatial_index import ShapeTree
+from spatial_index import get_corner_clearances
+from synthetic_models import make_pocketed_plate
+
+# Default numbers of pockets of the benchmark plates (8 corners each)
+DEFAULT_SIZES = [16, 128, 512]
+# Distance under which corners are reported as close to one another
+CLOSE_DISTANCE = 1.
+# Number of pairs timed to estimate the pairwise distance computations
+N_SAMPLED_PAIRS = 200
+
+
+def estimate_pairwise_time(shapes):
+    """Estimate the time to compute the distances of all pairs of shapes,
+    from the time of a sample of pairs."""
+    pairs = [random.sample(range(len(shapes)), 2)
+             for _ in range(N_SAMPLED_PAIRS)]
+    start = perf_counter()
+    for i, j in pairs:
+        BRepExtrema_DistShapeShape(shapes[i], shapes[j]).Value()
+    n_pairs = len(shapes) * (len(shapes) - 1) / 2
+    return (perf_counter() - start) / N_SAMPLED_PAIRS * n_pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the corner proximity and tool clearance queries "
+                    "of the spatial index, against pairwise distances."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="numbers of pockets of the plates")
+    args = parser.parse_args()
+
+    random.seed(0)
+    print("%8s %8s %10s %12s %14s %16s" % (
+        "corners", "faces", "build (s)", "pairs (s)", "clearance (s)",
+        "pairwise (s, est.)"))
+    for n_pockets in args.sizes:
+        model = make_pocketed_plate(n_pockets)
+        index = ModelIndex(model)
+        edges, _ = find_internal_corners(model, index)
+        start = perf_counter()
+        corner_tree = ShapeTree(edges)
+        face_tree = ShapeTree(index.faces())
+        build_time = perf_counter() - start
+        start = perf_counter()
+        corner_tree.pairs(CLOSE_DISTANCE)
+        pairs_time = perf_counter() - start
+        start = perf_counter()
+        get_corner_clearances(index, edges, face_tree)
+        clearance_time = perf_counter() - start
+        print("%8d %8d %10.3f %12.3f %14.3f %16.1f" % (
+            len(edges), len(index.faces()), build_time, pairs_time,
+            clearance_time, estimate_pairwise_time(edges)))
+    print("pairwise: distances between all pairs of corners, which the "
+          "close pairs query replaces.")
+
+
+if __name__ == "__main__":
+    main()
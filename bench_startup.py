@@ -0,0 +1,75 @@
+import argparse
+import json
+import subprocess
+import sys
+from time import perf_counter
+
+# Modules imported by each entry point, timed in a fresh interpreter
+DEFAULT_MODULES = ['corner_finder', 'importers', 'viewer', 'batch_corners',
+                   'view_model', 'view_internal_corners']
+
+
+def parse_importtime(stderr):
+    """Get the cumulative import time (in seconds) of each imported module.
+
+    stderr is the output of python -X importtime.
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split('|')
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            # Header line.
+            continue
+        times[fields[2].strip()] = cumulative * 1e-6
+    return times
+
+
+def time_startup(module):
+    """Import a module in a fresh interpreter.
+
+    Returns (wall time in seconds, cumulative import time of each module).
+    """
+    start = perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    wall_time = perf_counter() - start
+    return wall_time, parse_importtime(process.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the cold-start import time of each entry point."
+    )
+    parser.add_argument('modules', type=str, nargs='*',
+                        default=DEFAULT_MODULES, help="modules to import")
+    parser.add_argument('--top', type=int, default=5,
+                        help="number of slowest imports shown per module")
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help="JSON file where the results are written")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        wall_time, times = time_startup(module)
+        results[module] = {'wall_time': wall_time,
+                           'import_time': times.get(module),
+                           'imports': times}
+        print("%s: %.3fs wall time, %.3fs importing" % (
+            module, wall_time, times.get(module, float('nan'))))
+        # The slowest imports, without the module itself.
+        slowest = sorted(((t, name) for name, t in times.items()
+                          if name != module), reverse=True)
+        for import_time, name in slowest[:args.top]:
+            print("    %8.3fs  %s" % (import_time, name))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import resource
+from multiprocessing import Pool
+from time import perf_counter
+
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Transform
+from OCC.Core.gp import gp_Trsf
+from OCC.Core.gp import gp_Vec
+
+from corner_finder import find_internal_corners
+from corner_finder import iter_internal_corners
+from synthetic_models import get_grid_layout
+from synthetic_models import make_compound
+from synthetic_models import make_mixed_plate
+
+# Default numbers of solids of the benchmark assemblies
+DEFAULT_SIZES = [1, 4, 16, 64]
+# Number of features of each solid of the benchmark assemblies
+FEATURES_PER_SOLID = 12
+# Distance between the solids of the benchmark assemblies
+SOLID_SPACING = 200.
+
+
+def make_assembly(n_solids):
+    """Make a compound of n_solids distinct copies of a mixed plate."""
+    plate = make_mixed_plate(FEATURES_PER_SOLID)
+    _, corners = get_grid_layout(n_solids, SOLID_SPACING)
+    solids = []
+    for x, y in corners:
+        trsf = gp_Trsf()
+        trsf.SetTranslation(gp_Vec(x, y, 0.))
+        # Copy the geometry, so that the solids do not share their TShapes.
+        solids.append(BRepBuilderAPI_Transform(plate, trsf, True).Shape())
+    return make_compound(solids)
+
+
+def analyse(mode, n_solids):
+    """Find the corners of an assembly, in a fresh worker process.
+
+    Returns (time in seconds, increase of the peak memory in MB, number of
+    corners). The assembly is built first, so that only the analysis is
+    measured.
+    """
+    model = make_assembly(n_solids)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = perf_counter()
+    if mode == 'whole':
+        edges, fillets = find_internal_corners(model)
+        n_corners = len(edges) + len(fillets)
+    else:
+        # Only keep the counts, as a consumer writing the results would.
+        n_corners = sum(len(edges) + len(fillets)
+                        for _, _, edges, fillets
+                        in iter_internal_corners(model))
+    elapsed = perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux.
+    return elapsed, (rss_after - rss_before) / 1024, n_corners
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the time and peak memory of the analysis of a "
+                    "whole assembly and of the per-solid streaming analysis."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="numbers of solids of the assemblies")
+    args = parser.parse_args()
+
+    print("%8s %10s %10s %16s %10s" % ("solids", "mode", "time (s)",
+                                       "peak memory (MB)", "corners"))
+    for n_solids in args.sizes:
+        for mode in ['whole', 'streaming']:
+            with Pool(1) as pool:
+                elapsed, memory, n_corners = pool.apply(analyse,
+                                                        (mode, n_solids))
+            print("%8d %10s %10.3f %16.1f %10d" % (n_solids, mode, elapsed,
+                                                   memory, n_corners))
+
+
+if __name__ == "__main__":
+    main()
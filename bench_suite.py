@@ -0,0 +1,156 @@
+import argparse
+import json
+import platform
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from time import strftime
+
+import OCC
+from OCC.Core.Tesselator import ShapeTesselator
+from OCC.Extend.DataExchange import write_step_file
+
+from corner_finder import CornerStats
+from corner_finder import ModelIndex
+from corner_finder import find_internal_corners
+from corner_finder import find_internal_edge_corners
+from corner_finder import find_internal_fillet_corners
+from importers import import_file
+from meshing import get_mesh_arrays
+from synthetic_models import make_part_with_faces
+from tessellation_cache import TessellationCache
+from viewer import Viewer
+
+# Default numbers of faces of the benchmark models
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+# A stage is reported as a regression if it got slower by this factor
+REGRESSION_FACTOR = 1.2
+
+
+class StageTimer:
+    """Record the wall time of named stages."""
+
+    def __init__(self):
+        self.timings = {}
+
+    def run(self, name, func, *args, **kwargs):
+        """Run func(*args, **kwargs), record its time and return its result."""
+        start = perf_counter()
+        result = func(*args, **kwargs)
+        self.timings[name] = perf_counter() - start
+        return result
+
+
+def bench_model(n_faces, tmpdirname):
+    """Time each stage of the pipeline on a synthetic model of n_faces faces.
+
+    Returns a JSON-serialisable dict.
+    """
+    timer = StageTimer()
+    model = timer.run('build', make_part_with_faces, n_faces)
+    step_path = str(Path(tmpdirname) / ("model-%d.step" % n_faces))
+    timer.run('write_step', write_step_file, model, step_path)
+    model = timer.run('import', import_file, step_path)
+    index = timer.run('index', ModelIndex, model)
+    edges = timer.run('edge_corners', find_internal_edge_corners,
+                      model, index)
+    fillets = timer.run('fillet_corners', find_internal_fillet_corners,
+                        model, index)
+    timer.run('combined_corners', find_internal_corners, model, index)
+    # Same again with instrumentation, to report where the time goes and what
+    # the instrumentation costs.
+    corner_stats = CornerStats()
+    timer.run('combined_corners_profiled', find_internal_corners, model,
+              index, stats=corner_stats)
+    # Tessellation and JSON export, as done by Viewer.DisplayShape.
+    tess = ShapeTesselator(model)
+    timer.run('tessellation', tess.Compute, compute_edges=True,
+              mesh_quality=1., parallel=True)
+    json_str = timer.run('json_export', tess.ExportShapeToThreejsJSONString,
+                         'bench')
+    positions, normals, indices = timer.run('binary_export', get_mesh_arrays,
+                                            tess)
+    # The whole DisplayShape call, including file writes.
+    viewer_dir = Path(tmpdirname) / ("viewer-%d" % n_faces)
+    viewer_dir.mkdir()
+    display = Viewer(str(viewer_dir))
+    timer.run('display_shape', display.DisplayShape, model, export_edges=True)
+    # The same with a tessellation cache, empty and then filled.
+    mesh_cache = TessellationCache(Path(tmpdirname) / "mesh-cache")
+    for stage in ['display_shape_cache_miss', 'display_shape_cache_hit']:
+        viewer_dir = Path(tmpdirname) / ("viewer-%d-%s" % (n_faces, stage))
+        viewer_dir.mkdir()
+        display = Viewer(str(viewer_dir), cache=mesh_cache)
+        timer.run(stage, display.DisplayShape, model, export_edges=True)
+    return {
+        'target_faces': n_faces,
+        'n_faces': len(index.faces()),
+        'n_edges': len(index.edges()),
+        'n_edge_corners': len(edges),
+        'n_fillet_corners': len(fillets),
+        'n_triangles': tess.ObjGetTriangleCount(),
+        'json_bytes': len(json_str),
+        'binary_bytes': positions.nbytes + normals.nbytes + indices.nbytes,
+        'timings': timer.timings,
+        'corner_stats': corner_stats.as_dict(),
+    }
+
+
+def find_regressions(results, baseline):
+    """Get the (faces, stage, old time, new time) that got slower."""
+    baseline_runs = {run['target_faces']: run for run in baseline['runs']}
+    regressions = []
+    for run in results['runs']:
+        old_run = baseline_runs.get(run['target_faces'])
+        if old_run is None:
+            continue
+        for stage, new_time in run['timings'].items():
+            old_time = old_run['timings'].get(stage)
+            if old_time and new_time > REGRESSION_FACTOR*old_time:
+                regressions.append((run['target_faces'], stage, old_time,
+                                    new_time))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark import, corner detection, tessellation and "
+                    "export on synthetic models of increasing size."
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="approximate numbers of faces of the models")
+    parser.add_argument('-o', '--output', type=str,
+                        default='bench_results.json',
+                        help="JSON file where the results are written")
+    parser.add_argument('--baseline', type=str, default=None,
+                        help="previous results to check for regressions")
+    args = parser.parse_args()
+
+    results = {
+        'date': strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'pythonocc': OCC.VERSION,
+        'machine': platform.platform(),
+        'runs': [],
+    }
+    with TemporaryDirectory() as tmpdirname:
+        for n_faces in args.sizes:
+            run = bench_model(n_faces, tmpdirname)
+            results['runs'].append(run)
+            print("%6d faces: %s" % (run['n_faces'], ", ".join(
+                "%s %.3fs" % item for item in run['timings'].items())))
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f))
+        for n_faces, stage, old_time, new_time in regressions:
+            print("REGRESSION %d faces, %s: %.3fs -> %.3fs" % (
+                n_faces, stage, old_time, new_time))
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,61 @@
-from math import degrees
+import logging
+from collections import Counter
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from math import ceil
+from math import pi
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
 
+import numpy as np
+
+from OCC.Core.gp import gp_Pnt
 from OCC.Core.gp import gp_Trsf
 from OCC.Core.gp import gp_Vec
+from OCC.Core.BRep import BRep_Builder
 from OCC.Core.BRep import BRep_Tool_Continuity
 from OCC.Core.BRep import BRep_Tool_Curve
 from OCC.Core.BRep import BRep_Tool_Parameters
 from OCC.Core.BRep import BRep_Tool_Pnt
 from OCC.Core.BRep import BRep_Tool_Surface
+from OCC.Core.BRepAdaptor import BRepAdaptor_Curve
+from OCC.Core.BRepAdaptor import BRepAdaptor_Curve2d
 from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
 from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Transform
 from OCC.Core.BRepExtrema import BRepExtrema_DistShapeShape
 from OCC.Core.BRepLProp import BRepLProp_SLProps
+from OCC.Core.BRepTools import breptools_Read
+from OCC.Core.BRepTools import breptools_Write
+from OCC.Core.Geom import Geom_Circle
 from OCC.Core.Geom import Geom_Curve
 from OCC.Core.Geom import Geom_CylindricalSurface
 from OCC.Core.Geom import Geom_Line
 from OCC.Core.Geom import Geom_Plane
 from OCC.Core.GeomAbs import GeomAbs_C0
+from OCC.Core.GeomAbs import GeomAbs_Circle
+from OCC.Core.GeomAbs import GeomAbs_Line
+from OCC.Core.GeomAbs import GeomAbs_OtherCurve
+from OCC.Core.TopAbs import TopAbs_EDGE
+from OCC.Core.TopAbs import TopAbs_FACE
+from OCC.Core.TopAbs import TopAbs_FORWARD
 from OCC.Core.TopAbs import TopAbs_REVERSED
-from OCC.Extend.TopologyUtils import TopologyExplorer
+from OCC.Core.TopAbs import TopAbs_SOLID
+from OCC.Core.TopAbs import TopAbs_VERTEX
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopExp import topexp_MapShapes
+from OCC.Core.TopExp import topexp_MapShapesAndAncestors
+from OCC.Core.TopoDS import TopoDS_Shape
+from OCC.Core.TopoDS import topods_Edge
+from OCC.Core.TopoDS import topods_Face
+from OCC.Core.TopoDS import topods_Vertex
+from OCC.Core.TopTools import TopTools_IndexedDataMapOfShapeListOfShape
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+from OCC.Core.TopTools import TopTools_ListIteratorOfListOfShape
+
+from instances import get_instances
 # from OCC.Extend.TopologyUtils import dump_topology_to_string
 
 # Maximum radius of a fillet to qualify as a corner
@@ -26,6 +64,295 @@ MAX_FILLET_RADIUS = 5.
 MIN_ANGLE_DEGREES = 5.
 # How much faces are translated to compute the internal corner check
 TR_DIST_FOR_INTERNALITY_CHECK = 1e-1
+# Version of the corner detection algorithms. Increment it whenever a change
+# affects their results, to invalidate the results cached by older versions.
+ALGORITHM_VERSION = 2
+# Below this value (a cosine), the analytic internality check is considered
+# ambiguous and the distance-based check is used instead
+ANALYTIC_INTERNALITY_TOLERANCE = 1e-3
+# Distance between the samples at which the faces of an edge are compared
+# (see get_edge_sample_count)
+EDGE_SAMPLE_SPACING = 5.
+# Angle (in radians) by which the tangent of an edge turns between samples
+EDGE_SAMPLE_TURN = pi / 8
+# Bounds of the number of samples of the edges, except straight edges
+# between two planes (which need a single sample)
+MIN_EDGE_SAMPLES = 3
+MAX_EDGE_SAMPLES = 32
+# Number of points of the polyline used to estimate the length and the
+# turning of free-form edges
+EDGE_SURVEY_POINTS = 9
+
+# Convexity of a corner: internal corners are concave
+CONCAVE = 1
+CONVEX = -1
+UNDECIDED = 0
+# Edges whose faces meet concavely along part of them and convexly elsewhere
+MIXED = 2
+
+# Kinds of corners, for the functions handling both
+EDGE_CORNERS = "edge"
+FILLET_CORNERS = "fillet"
+
+# Names of the feature arrays of a FeatureTable (see FeatureTable.arrays)
+FEATURE_NAMES = ('edge_curve_type', 'edge_n_faces', 'edge_continuity',
+                 'edge_angle', 'edge_convexity', 'face_is_fillet',
+                 'face_radius', 'face_convexity')
+
+logger = logging.getLogger(__name__)
+
+# Number of internality checks decided by the analytic test ("analytic") and
+# by the distance-based fallback ("fallback"). Call clear() to reset it.
+internality_counts = Counter()
+
+
+class CornerStats:
+    """Statistics collected by the corner finders, to profile them.
+
+    For each kind of corner (EDGE_CORNERS or FILLET_CORNERS):
+      candidates[kind]: number of candidates examined.
+      corners[kind]: number of candidates accepted as corners.
+      rejections[kind][check]: number of candidates rejected by each check.
+      check_times[kind][check]: time spent in each check, in seconds.
+    For the expensive OCC calls, by function name:
+      call_counts[name], call_times[name]: number of calls and their time.
+    And internality[method]: number of internality checks decided by the
+    "analytic" test or by the distance-based "fallback".
+
+    Pass an instance as the stats argument of the finders to collect them.
+    By default the finders use NULL_STATS, which collects nothing.
+    """
+
+    def __init__(self):
+        self.candidates = Counter()
+        self.corners = Counter()
+        self.rejections = defaultdict(Counter)
+        self.check_times = defaultdict(Counter)
+        self.call_counts = Counter()
+        self.call_times = Counter()
+        self.internality = Counter()
+        self._lap_start = 0.
+
+    def start(self, kind):
+        """Start examining a new candidate."""
+        self.candidates[kind] += 1
+        self._lap_start = perf_counter()
+
+    def lap(self, kind, check):
+        """Record the time spent in this check, which the candidate passed."""
+        now = perf_counter()
+        self.check_times[kind][check] += now - self._lap_start
+        self._lap_start = now
+
+    def reject(self, kind, check):
+        """Record that the candidate was rejected by this check."""
+        self.lap(kind, check)
+        self.rejections[kind][check] += 1
+
+    def accept(self, kind, check):
+        """Record that the candidate passed this last check."""
+        self.lap(kind, check)
+        self.corners[kind] += 1
+
+    def call(self, func, *args):
+        """Call func(*args), and record the time spent in it."""
+        start = perf_counter()
+        result = func(*args)
+        self.call_times[func.__name__] += perf_counter() - start
+        self.call_counts[func.__name__] += 1
+        return result
+
+    def count_internality(self, method):
+        self.internality[method] += 1
+
+    def merge(self, other):
+        """Add the statistics of another CornerStats to this one."""
+        self.candidates.update(other.candidates)
+        self.corners.update(other.corners)
+        for kind in other.rejections:
+            self.rejections[kind].update(other.rejections[kind])
+        for kind in other.check_times:
+            self.check_times[kind].update(other.check_times[kind])
+        self.call_counts.update(other.call_counts)
+        self.call_times.update(other.call_times)
+        self.internality.update(other.internality)
+
+    def as_dict(self):
+        """Get the statistics as a JSON-serialisable dict."""
+        return {
+            'candidates': dict(self.candidates),
+            'corners': dict(self.corners),
+            'rejections': {kind: dict(counts)
+                           for kind, counts in self.rejections.items()},
+            'check_times': {kind: dict(times)
+                            for kind, times in self.check_times.items()},
+            'call_counts': dict(self.call_counts),
+            'call_times': dict(self.call_times),
+            'internality': dict(self.internality),
+        }
+
+    def log(self, level=logging.INFO):
+        """Log a summary of the statistics with the module logger."""
+        for kind in sorted(self.candidates):
+            logger.log(level, "%s corners: %d candidates, %d corners", kind,
+                       self.candidates[kind], self.corners[kind])
+            for check, time in self.check_times[kind].most_common():
+                logger.log(level, "  %-20s rejected %6d  %8.3fs", check,
+                           self.rejections[kind][check], time)
+        for name, time in self.call_times.most_common():
+            logger.log(level, "%s: %d calls, %.3fs", name,
+                       self.call_counts[name], time)
+        if self.internality:
+            logger.log(level, "internality checks: %s",
+                       dict(self.internality))
+
+
+class _NullStats:
+    """Stand-in for CornerStats that collects nothing, at almost no cost."""
+
+    def start(self, kind):
+        pass
+
+    def lap(self, kind, check):
+        pass
+
+    def reject(self, kind, check):
+        pass
+
+    def accept(self, kind, check):
+        pass
+
+    def call(self, func, *args):
+        return func(*args)
+
+    def count_internality(self, method):
+        pass
+
+
+NULL_STATS = _NullStats()
+
+
+@dataclass(frozen=True)
+class CornerThresholds:
+    """Thresholds deciding which candidates qualify as corners.
+
+    The defaults are the module-level constants of the same name.
+    """
+    max_fillet_radius: float = MAX_FILLET_RADIUS
+    min_angle_degrees: float = MIN_ANGLE_DEGREES
+    tr_dist_for_internality_check: float = TR_DIST_FOR_INTERNALITY_CHECK
+
+
+DEFAULT_THRESHOLDS = CornerThresholds()
+
+
+class ModelIndex:
+    """Topological index of a TopoDS_Shape model, shared by the finders.
+
+    TopologyExplorer rebuilds the edge->face ancestry map of the whole model
+    every time faces_from_edge is called, which makes the finders quadratic in
+    the number of faces. This index builds the face, edge and vertex maps in a
+    single pass, after which every lookup is a hash map access.
+
+    Faces and edges are numbered from 0, in the same order as
+    TopologyExplorer.faces() and TopologyExplorer.edges().
+    """
+
+    def __init__(self, model):
+        self.model = model
+        # Both maps are keyed with TopoDS_Shape.IsSame, i.e. they ignore
+        # orientation like TopologyExplorer does by default.
+        self._face_map = TopTools_IndexedMapOfShape()
+        topexp_MapShapes(model, TopAbs_FACE, self._face_map)
+        self._edge_map = TopTools_IndexedDataMapOfShapeListOfShape()
+        topexp_MapShapesAndAncestors(model, TopAbs_EDGE, TopAbs_FACE,
+                                     self._edge_map)
+        self._faces = [topods_Face(self._face_map.FindKey(i))
+                       for i in range(1, self._face_map.Extent() + 1)]
+        self._edges = [topods_Edge(self._edge_map.FindKey(i))
+                       for i in range(1, self._edge_map.Extent() + 1)]
+        # Edge -> faces.
+        self._edge_faces = []
+        for i in range(1, self._edge_map.Extent() + 1):
+            face_ids = []
+            it = TopTools_ListIteratorOfListOfShape(
+                self._edge_map.FindFromIndex(i))
+            while it.More():
+                face_id = self._face_map.FindIndex(it.Value()) - 1
+                if face_id not in face_ids:
+                    face_ids.append(face_id)
+                it.Next()
+            self._edge_faces.append(face_ids)
+        # Face -> edges, and orientation of each edge in each of its faces.
+        self._face_edges = []
+        self._edge_orientations = {}
+        for face_id, face in enumerate(self._faces):
+            edge_ids = []
+            explorer = TopExp_Explorer(face, TopAbs_EDGE)
+            while explorer.More():
+                edge = explorer.Current()
+                edge_id = self._edge_map.FindIndex(edge) - 1
+                if edge_id not in edge_ids:
+                    edge_ids.append(edge_id)
+                # Seam edges appear twice with opposite orientations.
+                key = (face_id, edge_id)
+                orientation = edge.Orientation()
+                previous = self._edge_orientations.get(key, orientation)
+                if previous != orientation:
+                    orientation = None
+                self._edge_orientations[key] = orientation
+                explorer.Next()
+            self._face_edges.append(edge_ids)
+        # Edge -> vertices.
+        self._edge_vertices = []
+        for edge in self._edges:
+            vertices = []
+            explorer = TopExp_Explorer(edge, TopAbs_VERTEX)
+            while explorer.More():
+                vertex = topods_Vertex(explorer.Current())
+                if not any(vertex.IsSame(v) for v in vertices):
+                    vertices.append(vertex)
+                explorer.Next()
+            self._edge_vertices.append(vertices)
+
+    def faces(self):
+        return self._faces
+
+    def edges(self):
+        return self._edges
+
+    def face_index(self, face):
+        """Get the index of this face, or -1 if it is not in the model."""
+        return self._face_map.FindIndex(face) - 1
+
+    def edge_index(self, edge):
+        """Get the index of this edge, or -1 if it is not in the model."""
+        return self._edge_map.FindIndex(edge) - 1
+
+    def face_ids_from_edge(self, edge_id):
+        return self._edge_faces[edge_id]
+
+    def edge_ids_from_face(self, face_id):
+        return self._face_edges[face_id]
+
+    def faces_from_edge(self, edge):
+        return [self._faces[i]
+                for i in self._edge_faces[self.edge_index(edge)]]
+
+    def edges_from_face(self, face):
+        return [self._edges[i]
+                for i in self._face_edges[self.face_index(face)]]
+
+    def vertices_from_edge(self, edge):
+        return self._edge_vertices[self.edge_index(edge)]
+
+    def edge_orientation(self, edge, face):
+        """Get the orientation of this edge in this face.
+
+        None is returned for seam edges, which appear with both orientations.
+        """
+        return self._edge_orientations[(self.face_index(face),
+                                        self.edge_index(edge))]
 
 
 def get_edge_line(edge):
@@ -43,6 +370,22 @@ def get_edge_line(edge):
         return None
 
 
+def get_edge_curve_type(edge):
+    """Get the type of the geometric curve associated to this edge.
+
+    Returns GeomAbs_Line or GeomAbs_Circle, and GeomAbs_OtherCurve for other
+    curves. Lines are detected like in get_edge_line.
+    """
+    curve = BRep_Tool_Curve(edge)[0]
+    if type(curve) is not Geom_Curve:
+        return GeomAbs_OtherCurve
+    if Geom_Line.DownCast(curve) is not None:
+        return GeomAbs_Line
+    if Geom_Circle.DownCast(curve) is not None:
+        return GeomAbs_Circle
+    return GeomAbs_OtherCurve
+
+
 def get_face_cylinder(face):
     """Get the geometric cylinder section associated to this face.
 
@@ -87,134 +430,822 @@ def get_translated_face(face, tr):
     return BRepBuilderAPI_Transform(face, xform, True).Shape()
 
 
-def find_internal_fillet_corners(model):
+def normalise_rows(vectors):
+    """Get the unit vectors of the rows of an (n, 3) array.
+
+    Degenerate vectors are NaN.
+    """
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(lengths, 1e-9)
+    vectors[lengths[:, 0] < 1e-9] = np.nan
+    return vectors
+
+
+def get_curve_points_and_derivatives(curve, parameters):
+    """Get the points and first derivatives of a BRepAdaptor_Curve at these
+    parameters, as two (n, 3) arrays."""
+    points = np.empty((len(parameters), 3))
+    derivatives = np.empty((len(parameters), 3))
+    pnt = gp_Pnt()
+    vec = gp_Vec()
+    for i, parameter in enumerate(parameters):
+        curve.D1(parameter, pnt, vec)
+        points[i] = pnt.Coord()
+        derivatives[i] = vec.Coord()
+    return points, derivatives
+
+
+def get_edge_sample_count(curve, faces):
+    """Get the number of samples at which to compare the faces of an edge.
+
+    curve is the BRepAdaptor_Curve of the edge. The normals of two planes are
+    constant along a straight edge, so it needs a single sample. Other edges
+    get a sample every EDGE_SAMPLE_SPACING along them, and every
+    EDGE_SAMPLE_TURN of their tangent, within MIN_EDGE_SAMPLES and
+    MAX_EDGE_SAMPLES.
+    """
+    curve_type = curve.GetType()
+    first = curve.FirstParameter()
+    last = curve.LastParameter()
+    if curve_type == GeomAbs_Line:
+        if all(get_face_plane(face) is not None for face in faces):
+            return 1
+        length = last - first
+        turning = 0.
+    elif curve_type == GeomAbs_Circle:
+        turning = last - first
+        length = curve.Circle().Radius() * turning
+    else:
+        # Estimate them from a polyline along the edge.
+        points, derivatives = get_curve_points_and_derivatives(
+            curve, np.linspace(first, last, EDGE_SURVEY_POINTS))
+        length = np.linalg.norm(np.diff(points, axis=0), axis=1).sum()
+        tangents = normalise_rows(derivatives)
+        cosines = np.einsum('ij,ij->i', tangents[:-1], tangents[1:])
+        turning = np.nansum(np.arccos(np.clip(cosines, -1., 1.)))
+    n_samples = (ceil(length / EDGE_SAMPLE_SPACING)
+                 + ceil(turning / EDGE_SAMPLE_TURN))
+    return min(max(n_samples, MIN_EDGE_SAMPLES), MAX_EDGE_SAMPLES)
+
+
+def get_face_normals_along_edge(edge, face, parameters):
+    """Get the outwards unit normals of a face at these parameters of one of
+    its edges, as an (n, 3) array. Undefined normals are NaN."""
+    pcurve = BRepAdaptor_Curve2d(edge, face)
+    # Sometimes normal computation needs degree 2 properties.
+    slprops = BRepLProp_SLProps(BRepAdaptor_Surface(face), 2, 1e-6)
+    normals = np.full((len(parameters), 3), np.nan)
+    for i, parameter in enumerate(parameters):
+        uv = pcurve.Value(parameter)
+        slprops.SetParameters(uv.X(), uv.Y())
+        if slprops.IsNormalDefined():
+            normals[i] = slprops.Normal().Coord()
+    if face.Orientation() == TopAbs_REVERSED:
+        normals = -normals
+    return normals
+
+
+def get_edge_samples(edge, faces, n_samples=None):
+    """Sample the tangent of an edge and the normals of its faces along it.
+
+    The edge is evaluated at n_samples parameters spread evenly along it,
+    away from its vertices (see get_edge_sample_count for the default).
+    Returns (tangents, normals): the unit tangents of the edge as an (n, 3)
+    array, which follow the parametrisation of the underlying curve (i.e.
+    ignore the orientation of the edge), and the outwards unit normals of
+    the faces as a (len(faces), n, 3) array. Degenerate tangents and
+    undefined normals are NaN.
+    """
+    curve = BRepAdaptor_Curve(edge)
+    if n_samples is None:
+        n_samples = get_edge_sample_count(curve, faces)
+    first = curve.FirstParameter()
+    step = (curve.LastParameter() - first) / n_samples
+    parameters = first + (np.arange(n_samples) + .5) * step
+    _, derivatives = get_curve_points_and_derivatives(curve, parameters)
+    normals = np.stack([get_face_normals_along_edge(edge, face, parameters)
+                        for face in faces])
+    return normalise_rows(derivatives), normals
+
+
+def get_edge_sample_angles(normals):
+    """Get the angles between the normals of two faces at the samples of
+    their edge (see get_edge_samples), in degrees."""
+    cosines = np.einsum('ij,ij->i', normals[0], normals[1])
+    return np.degrees(np.arccos(np.clip(cosines, -1., 1.)))
+
+
+def get_edge_angle(sample_angles):
+    """Get the angle of an edge from those of its samples, in degrees.
+
+    This is the largest one, since the edge is sharp wherever a sample is.
+    NaN is returned if no angle is defined.
+    """
+    sample_angles = sample_angles[~np.isnan(sample_angles)]
+    if len(sample_angles) == 0:
+        return np.nan
+    return float(sample_angles.max())
+
+
+def get_sign(value, tol=ANALYTIC_INTERNALITY_TOLERANCE):
+    """Get the sign of this value (1 or -1), or 0 if it is within tolerance."""
+    if value > tol:
+        return 1
+    if value < -tol:
+        return -1
+    return 0
+
+
+def classify_edge_samples(tangents, normals, orientations,
+                          tol=ANALYTIC_INTERNALITY_TOLERANCE):
+    """Classify the corner between two faces at the samples of their edge.
+
+    tangents and normals are those of get_edge_samples, and orientations are
+    the orientations of the edge in both faces. Returns an array holding, for
+    each sample, CONCAVE if the corner is internal there, CONVEX if it is
+    external, and UNDECIDED if the local geometry is ambiguous.
+
+    The inward direction of a face at the edge is d = n x t, where t is the
+    edge tangent oriented as in the face (faces lie on the left of their
+    edges when seen from outside). The corner is internal if each face goes
+    up along the normal of the other one, i.e. if n1.d2 > 0 and n2.d1 > 0.
+    """
+    signs = []
+    for i, orientation in enumerate(orientations):
+        if orientation == TopAbs_FORWARD:
+            face_tangents = tangents
+        elif orientation == TopAbs_REVERSED:
+            face_tangents = -tangents
+        else:
+            # Seam, internal or external edge: the side is undefined.
+            return np.full(len(tangents), UNDECIDED, np.int8)
+        inward = np.cross(normals[i], face_tangents)
+        dots = np.einsum('ij,ij->i', normals[1 - i], inward)
+        # NaN dots, from degenerate samples, are within tolerance.
+        signs.append(np.where(dots > tol, 1, np.where(dots < -tol, -1, 0)))
+    return np.where(signs[0] == signs[1], signs[0], UNDECIDED).astype(np.int8)
+
+
+def classify_fillet_corner(face, cylinder, vertex, stats=NULL_STATS):
+    """Classify the fillet corner of this cylindrical face.
+
+    The vertex can be any vertex of the face. Returns CONCAVE if the fillet is
+    internal, CONVEX if it is external, and UNDECIDED if the local geometry is
+    ambiguous.
+
+    A fillet is internal if its outwards normal points towards the axis of
+    its cylinder.
+    """
+    normal = stats.call(get_face_normal_at_vertex, face, vertex)
+    axis = cylinder.Axis()
+    radial = gp_Vec(axis.Location(), BRep_Tool_Pnt(vertex))
+    axial = gp_Vec(axis.Direction())
+    radial.Subtract(axial.Multiplied(radial.Dot(axial)))
+    if radial.Magnitude() < 1e-9:
+        return UNDECIDED
+    return -get_sign(gp_Vec(normal).Dot(radial.Normalized()))
+
+
+def is_internal_edge_corner_by_distance(f1, n1, f2, n2,
+                                        tr_dist=TR_DIST_FOR_INTERNALITY_CHECK,
+                                        stats=NULL_STATS):
+    """Check if the edge corner between f1 and f2 is internal.
+
+    This translates each face by tr_dist along its outwards normal (n1, n2):
+    if the translated faces intersect, then it is an internal corner.
+    """
+    # Get a copy of each face translated along their respective normals.
+    f1_tr = stats.call(get_translated_face, f1, gp_Vec(n1)*tr_dist)
+    f2_tr = stats.call(get_translated_face, f2, gp_Vec(n2)*tr_dist)
+    # If translated faces intersect, then it is a interior corner.
+    dist = stats.call(BRepExtrema_DistShapeShape, f1_tr, f2_tr).Value()
+    return dist < 1e-6
+
+
+def is_internal_fillet_corner_by_distance(
+        f1, n1, f2, n2, tr_dist=TR_DIST_FOR_INTERNALITY_CHECK,
+        stats=NULL_STATS):
+    """Check if the fillet corner between side faces f1 and f2 is internal.
+
+    This translates each side face by tr_dist along its outwards normal (n1,
+    n2): if the faces got closer, then it is an internal corner.
+    """
+    # Compute the initial shortest distance between the side faces.
+    dist = stats.call(BRepExtrema_DistShapeShape, f1, f2).Value()
+    # Get a copy of each face translated along their respective normals.
+    f1_tr = stats.call(get_translated_face, f1, gp_Vec(n1)*tr_dist)
+    f2_tr = stats.call(get_translated_face, f2, gp_Vec(n2)*tr_dist)
+    # Compute the new shortest distance between the side faces.
+    dist_tr = stats.call(BRepExtrema_DistShapeShape, f1_tr, f2_tr).Value()
+    # Compare the distances.
+    return dist > dist_tr
+
+
+def get_edge_corner_convexity(edge, f1, f2, tangents, normals, index,
+                              tr_dist=TR_DIST_FOR_INTERNALITY_CHECK,
+                              stats=NULL_STATS):
+    """Get the convexity (CONCAVE, CONVEX or MIXED) of an edge corner.
+
+    tangents and normals are the samples of the edge and of f1 and f2 (see
+    get_edge_samples), at least one of whose angles must be defined. The
+    corner is MIXED if the samples are concave along part of the edge and
+    convex elsewhere. If the analytic check is ambiguous at every sample, the
+    distance-based check is used instead, with the normals of the sharpest
+    sample.
+    """
+    orientations = [index.edge_orientation(edge, face) for face in (f1, f2)]
+    convexities = classify_edge_samples(tangents, normals, orientations)
+    decided = set(convexities[convexities != UNDECIDED].tolist())
+    if decided:
+        internality_counts["analytic"] += 1
+        stats.count_internality("analytic")
+        return decided.pop() if len(decided) == 1 else MIXED
+    internality_counts["fallback"] += 1
+    stats.count_internality("fallback")
+    sample = np.nanargmax(get_edge_sample_angles(normals))
+    n1 = gp_Vec(*normals[0, sample])
+    n2 = gp_Vec(*normals[1, sample])
+    if is_internal_edge_corner_by_distance(f1, n1, f2, n2, tr_dist, stats):
+        return CONCAVE
+    return CONVEX
+
+
+def get_fillet_corner_convexity(face, cylinder, side_faces_with_edge, index,
+                                tr_dist=TR_DIST_FOR_INTERNALITY_CHECK,
+                                stats=NULL_STATS):
+    """Get the convexity (CONCAVE or CONVEX) of a fillet corner.
+
+    side_faces_with_edge holds the two (side face, shared straight edge) pairs
+    of the fillet. If the analytic check is ambiguous, the distance-based
+    check is used instead.
+    """
+    (f1, f1_edge), (f2, f2_edge) = side_faces_with_edge
+    f1_vertex = index.vertices_from_edge(f1_edge)[0]
+    convexity = classify_fillet_corner(face, cylinder, f1_vertex, stats)
+    if convexity != UNDECIDED:
+        internality_counts["analytic"] += 1
+        stats.count_internality("analytic")
+        return convexity
+    internality_counts["fallback"] += 1
+    stats.count_internality("fallback")
+    # Compute each face's normal at some point along their respective edge.
+    n1 = stats.call(get_face_normal_at_vertex, f1, f1_vertex)
+    f2_vertex = index.vertices_from_edge(f2_edge)[0]
+    n2 = stats.call(get_face_normal_at_vertex, f2, f2_vertex)
+    if is_internal_fillet_corner_by_distance(f1, n1, f2, n2, tr_dist, stats):
+        return CONCAVE
+    return CONVEX
+
+
+def is_fillet_corner(face, index, thresholds=DEFAULT_THRESHOLDS,
+                     stats=NULL_STATS):
+    """Check if this face is an internal fillet corner.
+
+    See find_internal_fillet_corners for the definition and method.
+    """
+    kind = FILLET_CORNERS
+    stats.start(kind)
+    # 1. Check if the face is a fillet corner.
+    fillet = get_face_cylinder(face)
+    if fillet is None:
+        stats.reject(kind, 'not_cylinder')
+        return False
+    stats.lap(kind, 'not_cylinder')
+    # Try to find two straight edges. For now we're going to assume that
+    # each straight edge is in a single piece, meaning that there shouldn't
+    # be more than two.
+    straight_edges = []
+    for edge in index.edges_from_face(face):
+        line = get_edge_line(edge)
+        if line is None:
+            continue
+        straight_edges.append(edge)
+    if len(straight_edges) < 2:
+        stats.reject(kind, 'few_straight_edges')
+        return False
+    stats.lap(kind, 'few_straight_edges')
+    # Check that the faces on each side of the fillet are distinct.
+    side_faces_with_edge = []
+    for edge in straight_edges:
+        f1, f2 = index.faces_from_edge(edge)
+        other_face = f1 if face == f2 else f2
+        side_faces_with_edge.append((other_face, edge))
+    if side_faces_with_edge[0][0] == side_faces_with_edge[1][0]:
+        stats.reject(kind, 'same_side_face')
+        return False
+    stats.lap(kind, 'same_side_face')
+    # Check the continuity of the faces at these edges.
+    for side_face, edge in side_faces_with_edge:
+        continuity = BRep_Tool_Continuity(edge, face, side_face)
+        if continuity == GeomAbs_C0:
+            stats.reject(kind, 'c0_continuity')
+            return False
+    stats.lap(kind, 'c0_continuity')
+    # 2. Check the radius of the fillet. It has to be under a predefined
+    # value to qualify as a corner.
+    radius = fillet.Radius()
+    if radius >= thresholds.max_fillet_radius:
+        stats.reject(kind, 'radius')
+        return False
+    stats.lap(kind, 'radius')
+    # 3. Check that this is an interior corner.
+    convexity = get_fillet_corner_convexity(
+        face, fillet, side_faces_with_edge[:2], index,
+        thresholds.tr_dist_for_internality_check, stats)
+    if convexity != CONCAVE:
+        stats.reject(kind, 'internality')
+        return False
+    stats.accept(kind, 'internality')
+    return True
+
+
+def is_edge_corner(edge, index, thresholds=DEFAULT_THRESHOLDS,
+                   stats=NULL_STATS):
+    """Check if this edge is an internal edge corner.
+
+    See find_internal_edge_corners for the definition and method.
+    """
+    kind = EDGE_CORNERS
+    stats.start(kind)
+    # Get the 2 faces sharing this edge.
+    try:
+        f1, f2 = index.faces_from_edge(edge)
+    except ValueError:
+        stats.reject(kind, 'non_manifold')
+        return False
+    stats.lap(kind, 'non_manifold')
+    # Ensure that the interface is not differentiable (C0 max).
+    continuity = BRep_Tool_Continuity(edge, f1, f2)
+    if continuity > GeomAbs_C0:
+        stats.reject(kind, 'smooth')
+        return False
+    stats.lap(kind, 'smooth')
+    # Compute each face's normal at samples along the edge.
+    tangents, normals = stats.call(get_edge_samples, edge, (f1, f2))
+    angle = get_edge_angle(get_edge_sample_angles(normals))
+    # Although the faces are not differentiable at the edge, they might
+    # still be very close. Discard this edge if the normals are too close
+    # (or undefined) all along it.
+    if np.isnan(angle) or angle < thresholds.min_angle_degrees:
+        stats.reject(kind, 'small_angle')
+        return False
+    stats.lap(kind, 'small_angle')
+    # Check that this is an interior corner.
+    convexity = get_edge_corner_convexity(
+        edge, f1, f2, tangents, normals, index,
+        thresholds.tr_dist_for_internality_check, stats)
+    if convexity == MIXED:
+        stats.reject(kind, 'mixed_convexity')
+        return False
+    if convexity != CONCAVE:
+        stats.reject(kind, 'internality')
+        return False
+    stats.accept(kind, 'internality')
+    return True
+
+
+def find_internal_fillet_corners(model, index=None, workers=1,
+                                 thresholds=DEFAULT_THRESHOLDS,
+                                 stats=NULL_STATS):
     """Find the internal fillet corners in a TopoDS_Shape model.
 
     Returns a list of TopoDS_Face, each corresponding to one fillet corner.
+    A ModelIndex of the model can be given to share it between calls. If
+    workers > 1, the faces are analysed in parallel (see
+    find_corners_in_parallel). The detection thresholds are given as a
+    CornerThresholds. Pass a CornerStats as stats to profile the search.
     We assume the following definition: a fillet corner is a cylinder section
     that connects two faces with straight edges in a differentiable way.
 
-    To determine if a fillet corner between two faces is internal, we use the
-    following method:
+    To determine if a fillet corner between two faces is internal, we first
+    check if its outwards normal points towards the cylinder axis (see
+    classify_fillet_corner). If that is ambiguous, we use the following method:
       a. Compute the shortest distance between the two side faces, D.
       b. Translate each side face along its outwards normal, and recompute
          the shortest distance between the now translated side faces, D'.
       c. If the faces got closer (D > D'), then it is an internal corner.
     """
-    model_explorer = TopologyExplorer(model)
-    corner_faces = []
-    for face in model_explorer.faces():
-        # 1. Check if the face is a fillet corner.
-        fillet = get_face_cylinder(face)
-        if fillet is None:
-            continue
-        # Try to find two straight edges. For now we're going to assume that
-        # each straight edge is in a single piece, meaning that there shouldn't
-        # be more than two.
-        straight_edges = []
-        for edge in model_explorer.edges_from_face(face):
-            line = get_edge_line(edge)
-            if line is None:
-                continue
-            straight_edges.append(edge)
-        if len(straight_edges) < 2:
-            continue
-        # Check that the faces on each side of the fillet are distinct.
-        side_faces_with_edge = []
-        for edge in straight_edges:
-            f1, f2 = model_explorer.faces_from_edge(edge)
-            other_face = f1 if face == f2 else f2
-            side_faces_with_edge.append((other_face, edge))
-        if side_faces_with_edge[0][0] == side_faces_with_edge[1][0]:
-            continue
-        # Check the continuity of the faces at these edges.
-        is_continuous = True
-        for side_face, edge in side_faces_with_edge:
-            continuity = BRep_Tool_Continuity(edge, face, side_face)
-            if continuity == GeomAbs_C0:
-                is_continuous = False
-                break
-        if not is_continuous:
-            continue
-        # 2. Check the radius of the fillet. It has to be under a predefined
-        # value to qualify as a corner.
-        radius = fillet.Radius()
-        if radius >= MAX_FILLET_RADIUS:
-            continue
-        # 3. Check that this is an interior corner.
-        # Compute each face's normal at some point along their respective edge.
-        f1, f1_edge = side_faces_with_edge[0]
-        f1_vertex = next(model_explorer.vertices_from_edge(f1_edge))
-        n1 = get_face_normal_at_vertex(f1, f1_vertex)
-        f2, f2_edge = side_faces_with_edge[1]
-        f2_vertex = next(model_explorer.vertices_from_edge(f2_edge))
-        n2 = get_face_normal_at_vertex(f2, f2_vertex)
-        # Compute the initial shortest distance between the side faces.
-        dist = BRepExtrema_DistShapeShape(f1, f2).Value()
-        # Get a copy of each face translated along their respective normals.
-        tr_dist = TR_DIST_FOR_INTERNALITY_CHECK
-        f1_tr = get_translated_face(f1, gp_Vec(n1)*tr_dist)
-        f2_tr = get_translated_face(f2, gp_Vec(n2)*tr_dist)
-        # Compute the new shortest distance between the side faces.
-        dist_tr = BRepExtrema_DistShapeShape(f1_tr, f2_tr).Value()
-        # Compare the distances.
-        if dist > dist_tr:
-            corner_faces.append(face)
-    return corner_faces
-
-
-def find_internal_edge_corners(model):
+    if workers > 1:
+        return find_corners_in_parallel(model, FILLET_CORNERS, workers, index,
+                                        thresholds, stats)
+    if index is None:
+        index = ModelIndex(model)
+    return [face for face in index.faces()
+            if is_fillet_corner(face, index, thresholds, stats)]
+
+
+def find_internal_edge_corners(model, index=None, workers=1,
+                               thresholds=DEFAULT_THRESHOLDS,
+                               stats=NULL_STATS):
     """Find the internal edge corners in a TopoDS_Shape model.
 
     Returns a list of TopoDS_Edge, each corresponding to one edge corner.
-    We assume the following definition: an edge corner is a line segment
-    that connects two faces at an angle (see MIN_ANGLE_DEGREES).
+    A ModelIndex of the model can be given to share it between calls. If
+    workers > 1, the edges are analysed in parallel (see
+    find_corners_in_parallel). The detection thresholds are given as a
+    CornerThresholds. Pass a CornerStats as stats to profile the search.
+    We assume the following definition: an edge corner is an edge (straight
+    or not) that connects two faces at an angle (see min_angle_degrees) and
+    is internal all along its length.
 
-    To determine if an edge corner between two faces is internal, we use the
-    following method:
+    The faces are compared at samples along the edge (see get_edge_samples),
+    whose number grows with its length and curvature; the angle of the edge
+    is the largest one. To determine if an edge corner between two faces is
+    internal, we first compare the normal of each face with the direction
+    going into the other face from the edge at each sample (see
+    classify_edge_samples). Edges that are internal at some samples and
+    external at others are MIXED, and are not corners. If every sample is
+    ambiguous, we use the following method:
       a. Translate each face along its outwards normal, and compute the
          shortest distance between the translated faces D.
       b. If D is 0, the translated faces intersect, and the corner is internal.
+    """
+    if workers > 1:
+        return find_corners_in_parallel(model, EDGE_CORNERS, workers, index,
+                                        thresholds, stats)
+    if index is None:
+        index = ModelIndex(model)
+    return [edge for edge in index.edges()
+            if is_edge_corner(edge, index, thresholds, stats)]
 
-    NB: another method would be to find a point on each side face, close to the
-    edge but not exactly on it, and then compute
-      dot = (x2 - x1).Dot(n1)
-    where n1 is the outwards normal to the first face.
-    If dot > 0, then it is an internal edge.
-    The tricky part would be computing the right point on each side face. It
-    cannot be anywhere on the face, because the face might not be convex.
-    """
-    model_explorer = TopologyExplorer(model)
-    corner_edges = []
-    # Iterate over edges
-    for edge in model_explorer.edges():
-        # We assume that edge corners are straight lines.
-        line = get_edge_line(edge)
-        if line is None:
-            continue
-        # Get the 2 faces sharing this edge.
-        try:
-            f1, f2 = model_explorer.faces_from_edge(edge)
-        except ValueError:
-            continue
-        # Ensure that the interface is not differentiable (C0 max).
-        continuity = BRep_Tool_Continuity(edge, f1, f2)
-        if continuity > GeomAbs_C0:
-            continue
-        # Compute each face's normal at some point along the edge.
-        edge_vertex = next(model_explorer.vertices_from_edge(edge))
-        n1 = get_face_normal_at_vertex(f1, edge_vertex)
-        n2 = get_face_normal_at_vertex(f2, edge_vertex)
-        # Although the faces are not differentiable at the edge, they might
-        # still be very close. Discard this edge if the normals are too close.
-        if degrees(n1.Angle(n2)) < MIN_ANGLE_DEGREES:
-            continue
-        # Get a copy of each face translated along their respective normals.
-        tr_dist = TR_DIST_FOR_INTERNALITY_CHECK
-        f1_tr = get_translated_face(f1, gp_Vec(n1)*tr_dist)
-        f2_tr = get_translated_face(f2, gp_Vec(n2)*tr_dist)
-        # If translated faces intersect, then it is a interior corner.
-        dist = BRepExtrema_DistShapeShape(f1_tr, f2_tr).Value()
-        if dist < 1e-6:
-            corner_edges.append(edge)
-    return corner_edges
+
+class FeatureTable:
+    """Per-edge and per-face features of a model, shared by both corner kinds.
+
+    Each feature is a NumPy array indexed like the edges or faces of the
+    ModelIndex. Edge features:
+      edge_curve_type: GeomAbs_CurveType (see get_edge_curve_type).
+      edge_n_faces: number of faces sharing the edge.
+      edge_continuity: GeomAbs_Shape between the faces of edges between 2
+        faces, -1 if not computed.
+      edge_angle: largest angle between the face normals along the edge in
+        degrees (see get_edge_angle), NaN if not computed.
+      edge_convexity: CONCAVE, CONVEX, MIXED or UNDECIDED if not computed.
+    Face features:
+      face_is_fillet: whether the face is a fillet (a cylinder section joined
+        to two distinct faces by straight edges in a differentiable way).
+      face_radius: radius of fillets, NaN for other faces.
+      face_convexity: CONCAVE, CONVEX or UNDECIDED if not computed.
+
+    Features only needed to reject a candidate are not computed once the
+    candidate has been rejected by a cheaper check, so the table depends on
+    the thresholds. The checks are recorded in stats as by is_edge_corner and
+    is_fillet_corner.
+
+    If complete is True, the angle and radius thresholds are not checked
+    while computing the features, so the convexity of every sharp edge and
+    fillet is computed. The table can then be queried for any angle and
+    radius thresholds (see edge_corner_ids and fillet_corner_ids), e.g. to
+    sweep the tool radius, without calling OCC again; only
+    tr_dist_for_internality_check is fixed.
+    """
+
+    def __init__(self, index, thresholds=DEFAULT_THRESHOLDS,
+                 stats=NULL_STATS, complete=False):
+        self.index = index
+        self.thresholds = thresholds
+        self.stats = stats
+        self.complete = complete
+        n_edges = len(index.edges())
+        n_faces = len(index.faces())
+        self.edge_curve_type = np.full(n_edges, GeomAbs_OtherCurve, np.int8)
+        self.edge_n_faces = np.zeros(n_edges, np.int32)
+        self.edge_continuity = np.full(n_edges, -1, np.int8)
+        self.edge_angle = np.full(n_edges, np.nan)
+        self.edge_convexity = np.full(n_edges, UNDECIDED, np.int8)
+        self.face_is_fillet = np.zeros(n_faces, bool)
+        self.face_radius = np.full(n_faces, np.nan)
+        self.face_convexity = np.full(n_faces, UNDECIDED, np.int8)
+        self._compute_edge_features(range(n_edges))
+        self._compute_face_features(range(n_faces))
+
+    def _compute_edge_features(self, edge_ids):
+        index = self.index
+        stats = self.stats
+        kind = EDGE_CORNERS
+        faces = index.faces()
+        edges = index.edges()
+        for edge_id in edge_ids:
+            edge = edges[edge_id]
+            stats.start(kind)
+            curve_type = get_edge_curve_type(edge)
+            face_ids = index.face_ids_from_edge(edge_id)
+            self.edge_curve_type[edge_id] = curve_type
+            self.edge_n_faces[edge_id] = len(face_ids)
+            # Both corner kinds only involve edges between 2 faces.
+            if len(face_ids) != 2:
+                stats.reject(kind, 'non_manifold')
+                continue
+            stats.lap(kind, 'non_manifold')
+            f1, f2 = faces[face_ids[0]], faces[face_ids[1]]
+            continuity = BRep_Tool_Continuity(edge, f1, f2)
+            self.edge_continuity[edge_id] = continuity
+            if continuity > GeomAbs_C0:
+                stats.reject(kind, 'smooth')
+                continue
+            stats.lap(kind, 'smooth')
+            tangents, normals = stats.call(get_edge_samples, edge, (f1, f2))
+            angle = get_edge_angle(get_edge_sample_angles(normals))
+            self.edge_angle[edge_id] = angle
+            if np.isnan(angle) or (
+                    not self.complete
+                    and angle < self.thresholds.min_angle_degrees):
+                stats.reject(kind, 'small_angle')
+                continue
+            stats.lap(kind, 'small_angle')
+            convexity = get_edge_corner_convexity(
+                edge, f1, f2, tangents, normals, index,
+                self.thresholds.tr_dist_for_internality_check, stats)
+            self.edge_convexity[edge_id] = convexity
+            if convexity == MIXED:
+                stats.reject(kind, 'mixed_convexity')
+            elif convexity != CONCAVE:
+                stats.reject(kind, 'internality')
+            else:
+                stats.accept(kind, 'internality')
+
+    def _compute_face_features(self, face_ids):
+        index = self.index
+        stats = self.stats
+        kind = FILLET_CORNERS
+        faces = index.faces()
+        edges = index.edges()
+        for face_id in face_ids:
+            face = faces[face_id]
+            stats.start(kind)
+            fillet = get_face_cylinder(face)
+            if fillet is None:
+                stats.reject(kind, 'not_cylinder')
+                continue
+            stats.lap(kind, 'not_cylinder')
+            straight_edge_ids = [
+                edge_id for edge_id in index.edge_ids_from_face(face_id)
+                if self.edge_curve_type[edge_id] == GeomAbs_Line]
+            if len(straight_edge_ids) < 2:
+                stats.reject(kind, 'few_straight_edges')
+                continue
+            if any(self.edge_n_faces[edge_id] != 2
+                   for edge_id in straight_edge_ids):
+                stats.reject(kind, 'non_manifold')
+                continue
+            stats.lap(kind, 'few_straight_edges')
+            # Check that the faces on each side of the fillet are distinct.
+            side_face_ids = []
+            for edge_id in straight_edge_ids:
+                id1, id2 = index.face_ids_from_edge(edge_id)
+                side_face_ids.append(id1 if id2 == face_id else id2)
+            if side_face_ids[0] == side_face_ids[1]:
+                stats.reject(kind, 'same_side_face')
+                continue
+            stats.lap(kind, 'same_side_face')
+            # Check the continuity of the faces at these edges.
+            if any(self.edge_continuity[edge_id] == GeomAbs_C0
+                   for edge_id in straight_edge_ids):
+                stats.reject(kind, 'c0_continuity')
+                continue
+            stats.lap(kind, 'c0_continuity')
+            self.face_is_fillet[face_id] = True
+            radius = fillet.Radius()
+            self.face_radius[face_id] = radius
+            if (not self.complete
+                    and radius >= self.thresholds.max_fillet_radius):
+                stats.reject(kind, 'radius')
+                continue
+            stats.lap(kind, 'radius')
+            side_faces_with_edge = [
+                (faces[side_face_ids[i]], edges[straight_edge_ids[i]])
+                for i in range(2)]
+            convexity = get_fillet_corner_convexity(
+                face, fillet, side_faces_with_edge, index,
+                self.thresholds.tr_dist_for_internality_check, stats)
+            self.face_convexity[face_id] = convexity
+            if convexity != CONCAVE:
+                stats.reject(kind, 'internality')
+            else:
+                stats.accept(kind, 'internality')
+
+    def arrays(self):
+        """Get the feature arrays, by name (see FEATURE_NAMES)."""
+        return {name: getattr(self, name) for name in FEATURE_NAMES}
+
+    def covers(self, thresholds):
+        """Tell whether the table can be queried with these thresholds.
+
+        Thresholds stricter than those of an incomplete table are covered,
+        since the features of the candidates they accept were computed.
+        """
+        if (thresholds.tr_dist_for_internality_check
+                != self.thresholds.tr_dist_for_internality_check):
+            return False
+        return self.complete or (
+            thresholds.min_angle_degrees >= self.thresholds.min_angle_degrees
+            and (thresholds.max_fillet_radius
+                 <= self.thresholds.max_fillet_radius))
+
+    def _query_thresholds(self, thresholds):
+        if thresholds is None:
+            return self.thresholds
+        if not self.covers(thresholds):
+            raise ValueError("The feature table does not cover %s; compute "
+                             "it with complete=True" % (thresholds,))
+        return thresholds
+
+    def edge_corner_ids(self, thresholds=None):
+        """Get the ids of the internal edge corners, in increasing order.
+
+        The thresholds default to those of the table (see covers).
+        """
+        return get_edge_corner_ids(self.arrays(),
+                                   self._query_thresholds(thresholds))
+
+    def fillet_corner_ids(self, thresholds=None):
+        """Get the ids of the internal fillet corners, in increasing order.
+
+        The thresholds default to those of the table (see covers).
+        """
+        return get_fillet_corner_ids(self.arrays(),
+                                     self._query_thresholds(thresholds))
+
+    def mixed_edge_ids(self):
+        """Get the ids of the MIXED edges, in increasing order.
+
+        Their faces meet concavely along part of them and convexly elsewhere,
+        so they are not edge corners, but may hold internal corners.
+        """
+        return np.flatnonzero(self.edge_convexity == MIXED)
+
+
+def get_edge_corner_ids(features, thresholds=DEFAULT_THRESHOLDS):
+    """Get the ids of the internal edge corners of a feature table.
+
+    features are the arrays of a FeatureTable, by name (see
+    FeatureTable.arrays), e.g. read back from disk: the query is a few
+    vectorised comparisons, and does not need the model.
+    """
+    return np.flatnonzero(
+        (features['edge_n_faces'] == 2)
+        & (features['edge_continuity'] == GeomAbs_C0)
+        & (features['edge_angle'] >= thresholds.min_angle_degrees)
+        & (features['edge_convexity'] == CONCAVE))
+
+
+def get_fillet_corner_ids(features, thresholds=DEFAULT_THRESHOLDS):
+    """Get the ids of the internal fillet corners of a feature table.
+
+    See get_edge_corner_ids.
+    """
+    return np.flatnonzero(
+        features['face_is_fillet']
+        & (features['face_radius'] < thresholds.max_fillet_radius)
+        & (features['face_convexity'] == CONCAVE))
+
+
+def extract_features(model, index=None,
+                     tr_dist=TR_DIST_FOR_INTERNALITY_CHECK, stats=NULL_STATS):
+    """Compute the complete FeatureTable of a TopoDS_Shape model.
+
+    The table can be queried for any angle and radius thresholds (see
+    FeatureTable.edge_corner_ids and FeatureTable.fillet_corner_ids).
+    """
+    if index is None:
+        index = ModelIndex(model)
+    thresholds = CornerThresholds(tr_dist_for_internality_check=tr_dist)
+    return FeatureTable(index, thresholds, stats, complete=True)
+
+
+def find_internal_corners(model, index=None, thresholds=DEFAULT_THRESHOLDS,
+                          stats=NULL_STATS):
+    """Find the internal edge and fillet corners in a TopoDS_Shape model.
+
+    Returns a tuple (list of TopoDS_Edge, list of TopoDS_Face), identical to
+    the results of find_internal_edge_corners and
+    find_internal_fillet_corners. The topology is walked only once, and the
+    features shared by both kinds of corners are computed only once (see
+    FeatureTable). Pass a CornerStats as stats to profile the search.
+    """
+    if index is None:
+        index = ModelIndex(model)
+    table = FeatureTable(index, thresholds, stats)
+    edges = index.edges()
+    faces = index.faces()
+    return ([edges[i] for i in table.edge_corner_ids()],
+            [faces[i] for i in table.fillet_corner_ids()])
+
+
+def iter_internal_corners(model, thresholds=DEFAULT_THRESHOLDS,
+                          stats=NULL_STATS, shape_type=TopAbs_SOLID):
+    """Find the internal corners of each solid of a model, one at a time.
+
+    Yields a tuple (solid number, solid, list of TopoDS_Edge, list of
+    TopoDS_Face) per sub-shape of shape_type (solids by default), in the
+    order of TopExp_Explorer, as soon as its corners are found. If the model
+    has no such sub-shapes, it is analysed as a whole. Each solid gets its
+    own ModelIndex and FeatureTable, which are released before the next one
+    is analysed, so the memory used does not grow with the size of the
+    assembly. The corners are sub-shapes of the model as well, but shapes
+    outside of the solids (e.g. free faces of a compound) are not analysed.
+    """
+    explorer = TopExp_Explorer(model, shape_type)
+    if not explorer.More():
+        yield (0, model) + find_internal_corners(model, None, thresholds,
+                                                 stats)
+        return
+    solid_number = 0
+    while explorer.More():
+        solid = explorer.Current()
+        explorer.Next()
+        edges, fillets = find_internal_corners(solid, None, thresholds,
+                                               stats)
+        yield solid_number, solid, edges, fillets
+        solid_number += 1
+
+
+def find_instanced_corners(model, thresholds=DEFAULT_THRESHOLDS,
+                           stats=NULL_STATS):
+    """Find the internal corners of a model, once per unique part.
+
+    Assemblies often repeat the same part (same TShape) at different
+    locations. Each unique part (see instances.get_instances) is analysed
+    once, without its location, and its corners are moved to each of its
+    instances, since a part has the same corners wherever it is placed.
+    Returns a tuple (list of TopoDS_Edge, list of TopoDS_Face), like
+    find_internal_corners, but grouped by part and instance instead of in
+    the order of the ModelIndex of the model.
+    """
+    edges = []
+    fillets = []
+    for prototype, locations in get_instances(model):
+        part_edges, part_fillets = find_internal_corners(
+            prototype, None, thresholds, stats)
+        for location in locations:
+            edges.extend(edge.Moved(location) for edge in part_edges)
+            fillets.extend(face.Moved(location) for face in part_fillets)
+    return edges, fillets
+
+
+# Model index of the current worker process (see find_corners_in_parallel).
+_worker_index = None
+
+
+def _init_worker(brep_path):
+    """Load the model shared by find_corners_in_parallel in this worker."""
+    global _worker_index
+    model = TopoDS_Shape()
+    breptools_Read(model, brep_path, BRep_Builder())
+    _worker_index = ModelIndex(model)
+
+
+def _find_corner_ids(kind, thresholds, collect_stats, ids):
+    """Get the ids of the corners among these candidates, in this worker.
+
+    Also returns the internality counts of this batch, and its CornerStats if
+    collect_stats is True (None otherwise), to merge them in the main process.
+    """
+    internality_counts.clear()
+    stats = CornerStats() if collect_stats else NULL_STATS
+    if kind == EDGE_CORNERS:
+        shapes = _worker_index.edges()
+        is_corner = is_edge_corner
+    else:
+        shapes = _worker_index.faces()
+        is_corner = is_fillet_corner
+    corner_ids = [i for i in ids
+                  if is_corner(shapes[i], _worker_index, thresholds, stats)]
+    return (corner_ids, Counter(internality_counts),
+            stats if collect_stats else None)
+
+
+def find_corners_in_parallel(model, kind, workers, index=None,
+                             thresholds=DEFAULT_THRESHOLDS, stats=NULL_STATS,
+                             chunk_size=None):
+    """Find the internal corners of a model with a pool of processes.
+
+    kind is EDGE_CORNERS or FILLET_CORNERS. The model is serialised once in
+    the BRep format, and each worker loads it and builds its own ModelIndex.
+    The candidate edges/faces are split in chunks of indices, and the results
+    are merged in the same order as the serial finders. The CornerStats of
+    the workers are merged into stats; their times add up over the workers.
+    """
+    if index is None:
+        index = ModelIndex(model)
+    shapes = index.edges() if kind == EDGE_CORNERS else index.faces()
+    if chunk_size is None:
+        # A few chunks per worker evens out the load.
+        chunk_size = max(1, ceil(len(shapes) / (4*workers)))
+    chunks = [range(i, min(i + chunk_size, len(shapes)))
+              for i in range(0, len(shapes), chunk_size)]
+    corner_ids = []
+    with TemporaryDirectory() as tmpdirname:
+        brep_path = str(Path(tmpdirname) / "model.brep")
+        breptools_Write(model, brep_path)
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(brep_path,)) as executor:
+            # map() returns results in the order of the chunks.
+            for ids, counts, chunk_stats in executor.map(
+                    _find_corner_ids, repeat(kind), repeat(thresholds),
+                    repeat(stats is not NULL_STATS), chunks):
+                corner_ids.extend(ids)
+                internality_counts.update(counts)
+                if chunk_stats is not None:
+                    stats.merge(chunk_stats)
+    return [shapes[i] for i in corner_ids]
@@ -0,0 +1,458 @@
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from collections import Counter
+from collections import OrderedDict
+from collections import defaultdict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from tempfile import mkdtemp
+from threading import RLock
+from time import monotonic
+from time import perf_counter
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from batch_corners import analyse_shape
+from corner_finder import CornerThresholds
+from corner_finder import MAX_FILLET_RADIUS
+from corner_finder import MIN_ANGLE_DEGREES
+from corner_finder import ModelIndex
+from corner_finder import find_internal_corners
+from importers import IMPORT_METHODS
+from importers import ShapeCache
+from importers import import_file
+from result_cache import CornerResultCache
+from tessellation_cache import TessellationCache
+from viewer import Viewer
+
+# Default maximum numbers of imported shapes kept in memory by each worker,
+# and of analysis results and scenes kept by the service
+DEFAULT_MAX_SHAPES = 8
+DEFAULT_MAX_RESULTS = 256
+DEFAULT_MAX_SCENES = 32
+# Number of latencies per endpoint kept to compute the metrics
+LATENCY_WINDOW = 1000
+
+
+class LRUCache:
+    """In-memory mapping that keeps its max_items most recently used items.
+
+    on_evict(key, value), if given, is called on the items evicted.
+    """
+
+    def __init__(self, max_items, on_evict=None):
+        self.max_items = max_items
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        """Get the item with this key, or None if missing."""
+        if key not in self._items:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            evicted_key, evicted_value = self._items.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_value)
+
+    def pop(self, key):
+        """Remove the item with this key, without calling on_evict.
+
+        Returns the item, or None if missing.
+        """
+        return self._items.pop(key, None)
+
+    def stats(self):
+        return {'items': len(self._items), 'hits': self.hits,
+                'misses': self.misses}
+
+
+class ServiceMetrics:
+    """Request counts, latencies and throughput of each endpoint."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.start_time = monotonic()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        # Computations run by the workers, and requests that waited for the
+        # computation of a concurrent request instead of starting their own
+        self.computations = Counter()
+        self.collapsed = Counter()
+        self._lock = RLock()
+
+    def record(self, endpoint, latency, ok):
+        with self._lock:
+            self.requests[endpoint] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+            self.latencies[endpoint].append(latency)
+
+    def as_dict(self):
+        with self._lock:
+            uptime = monotonic() - self.start_time
+            endpoints = {}
+            for endpoint, count in self.requests.items():
+                latencies = sorted(self.latencies[endpoint])
+                endpoints[endpoint] = {
+                    'requests': count,
+                    'errors': self.errors[endpoint],
+                    'throughput': count / uptime,
+                }
+                for percentile in [50, 95, 99]:
+                    i = min(len(latencies) - 1,
+                            len(latencies) * percentile // 100)
+                    endpoints[endpoint]['p%d_ms' % percentile] = (
+                        latencies[i] * 1e3)
+            return {'uptime': uptime,
+                    'throughput': sum(self.requests.values()) / uptime,
+                    'endpoints': endpoints,
+                    'computations': dict(self.computations),
+                    'collapsed': dict(self.collapsed)}
+
+
+# Imported shapes of the current worker process, and the directory where
+# they are cached on disk (see _init_worker)
+_worker_shapes = None
+_worker_cache_dir = None
+
+
+def _init_worker(cache_dir, max_shapes):
+    global _worker_shapes, _worker_cache_dir
+    _worker_shapes = LRUCache(max_shapes)
+    _worker_cache_dir = cache_dir
+
+
+def _warm_up():
+    """Worker task run at startup, so that the workers are spawned early."""
+    return os.getpid()
+
+
+def _get_shape(path, file_hash):
+    """Import a file in a worker, or get it from the worker's LRU.
+
+    Returns (shape, import time in seconds).
+    """
+    shape = _worker_shapes.get(file_hash)
+    if shape is not None:
+        return shape, 0.
+    start = perf_counter()
+    cache = ShapeCache(_worker_cache_dir) if _worker_cache_dir else None
+    shape = import_file(path, cache)
+    _worker_shapes.put(file_hash, shape)
+    return shape, perf_counter() - start
+
+
+def _analyse(path, file_hash, thresholds):
+    """Worker task: find the corners of an uploaded file."""
+    shape, import_time = _get_shape(path, file_hash)
+    result = analyse_shape(shape, thresholds)
+    result['timings']['import'] = import_time
+    result['timings']['total'] += import_time
+    return result
+
+
+def _build_scene(path, file_hash, thresholds, directory):
+    """Worker task: write the viewer scene of a file and its corners."""
+    shape, _ = _get_shape(path, file_hash)
+    edges, fillets = find_internal_corners(shape, ModelIndex(shape),
+                                           thresholds)
+    mesh_cache = (TessellationCache(_worker_cache_dir) if _worker_cache_dir
+                  else None)
+    display = Viewer(path=directory, cache=mesh_cache)
+    display.DisplayShape(shape, export_edges=True, transparency=.3,
+                         shininess=0, specular_color=(0, 0, 0))
+    display.Highlight(fillets, color=(1., 0., 0.))
+    display.Highlight(edges, color=(1., 0., 0.), line_width=5.)
+    display.generate_html_file()
+    return directory
+
+
+class CornerService:
+    """Corner detection kept warm between requests (see CornerHandler).
+
+    Files are analysed by a pool of worker processes, each keeping the
+    shapes it imported last in memory. The service keeps the last results
+    and viewer scenes, and runs a computation only once for concurrent
+    requests with the same file content and thresholds.
+    """
+
+    def __init__(self, workers=1, cache_dir=None,
+                 max_shapes=DEFAULT_MAX_SHAPES,
+                 max_results=DEFAULT_MAX_RESULTS,
+                 max_scenes=DEFAULT_MAX_SCENES):
+        self.directory = Path(mkdtemp(prefix='corner-service-'))
+        self.uploads_directory = self.directory / 'uploads'
+        self.scenes_directory = self.directory / 'scenes'
+        self.uploads_directory.mkdir()
+        self.scenes_directory.mkdir()
+        self.metrics = ServiceMetrics()
+        self.results = LRUCache(max_results)
+        self.scenes = LRUCache(
+            max_scenes, lambda key, path: shutil.rmtree(path, True))
+        # (upload path, file hash, thresholds) of each result id. An upload
+        # is deleted with the last source using it.
+        self.sources = LRUCache(
+            max_results, lambda key, source: self._release_upload(source[0]))
+        self._upload_refs = Counter()
+        self._in_flight = {}
+        self._lock = RLock()
+        self._pool = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                         initargs=(cache_dir, max_shapes))
+        for future in [self._pool.submit(_warm_up) for _ in range(workers)]:
+            future.result()
+
+    def close(self):
+        self._pool.shutdown()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _get_or_compute(self, kind, key, cache, func, *args):
+        """Get an item from the cache, or compute it in a worker.
+
+        Concurrent requests for the same missing item wait for the same
+        computation.
+        """
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                return value
+            future = self._in_flight.get((kind, key))
+            if future is None:
+                self.metrics.computations[kind] += 1
+                future = self._pool.submit(func, *args)
+                self._in_flight[kind, key] = future
+                future.add_done_callback(
+                    lambda done: self._finish(kind, key, cache, done))
+            else:
+                self.metrics.collapsed[kind] += 1
+        return future.result()
+
+    def _finish(self, kind, key, cache, future):
+        # The result is cached before the computation is forgotten, so that
+        # no request starts it again in between.
+        with self._lock:
+            if future.exception() is None:
+                cache.put(key, future.result())
+            del self._in_flight[kind, key]
+
+    def _save_upload(self, data, extension):
+        """Save an uploaded file, named after its content."""
+        file_hash = hashlib.sha256(data).hexdigest()
+        path = self.uploads_directory / ("%s.%s" % (file_hash, extension))
+        if not path.exists():
+            tmp_path = path.with_name("%s.%d.tmp" % (path.name, id(data)))
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        return str(path), file_hash
+
+    def _release_upload(self, path):
+        """Forget a source using this upload, and delete the upload if it was
+        the last one."""
+        self._upload_refs[path] -= 1
+        if self._upload_refs[path] <= 0:
+            del self._upload_refs[path]
+            Path(path).unlink(missing_ok=True)
+
+    def corners(self, data, extension, thresholds):
+        """Get the corners of an uploaded file (see analyse_shape).
+
+        The result also gives its id, and the URL of its viewer scene.
+        """
+        if extension not in IMPORT_METHODS:
+            raise ValueError("Unsupported file extension: %r" % extension)
+        # The upload is saved under the lock, so that it cannot be deleted
+        # (see _release_upload) before its source is recorded.
+        with self._lock:
+            path, file_hash = self._save_upload(data, extension)
+            result_id = CornerResultCache.key(file_hash, thresholds)
+            if result_id not in self.sources:
+                self._upload_refs[path] += 1
+            self.sources.put(result_id, (path, file_hash, thresholds))
+        try:
+            result = self._get_or_compute('corners', result_id, self.results,
+                                          _analyse, path, file_hash,
+                                          thresholds)
+        except Exception:
+            # Forget the source of a file that cannot be analysed.
+            with self._lock:
+                if self.sources.pop(result_id) is not None:
+                    self._release_upload(path)
+            raise
+        return dict(result, id=result_id, scene='/scene/%s/' % result_id)
+
+    def scene(self, result_id):
+        """Get the directory of the viewer scene of a result, or None."""
+        with self._lock:
+            source = self.sources.get(result_id)
+        if source is None:
+            return None
+        directory = self.scenes_directory / result_id
+        directory.mkdir(exist_ok=True)
+        return self._get_or_compute('scene', result_id, self.scenes,
+                                    _build_scene, *source, str(directory))
+
+
+def get_thresholds(query):
+    """Get the CornerThresholds given by the query string of a request."""
+    return CornerThresholds(
+        max_fillet_radius=float(query.get('max_fillet_radius',
+                                          [MAX_FILLET_RADIUS])[0]),
+        min_angle_degrees=float(query.get('min_angle',
+                                          [MIN_ANGLE_DEGREES])[0]))
+
+
+class CornerHandler(BaseHTTPRequestHandler):
+    """HTTP interface of the CornerService of the server.
+
+    POST /corners?ext=step[&max_fillet_radius=5&min_angle=5], with the file
+      as body: the corners, as JSON.
+    GET /scene/<id>/: the viewer scene of a result of /corners.
+    GET /metrics: the metrics of the service, as JSON.
+    """
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/corners':
+            return self._timed('other', self._send_error, 404, "Not found")
+        self._timed('corners', self._post_corners, parse_qs(url.query))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if parts[0] == 'scene' and len(parts) in (2, 3):
+            name = parts[2] if len(parts) == 3 else 'index.html'
+            return self._timed('scene', self._get_scene, parts[1], name)
+        if url.path == '/metrics':
+            return self._timed('metrics', self._send_json,
+                               self._get_metrics())
+        self._timed('other', self._send_error, 404, "Not found")
+
+    def _timed(self, endpoint, func, *args):
+        start = perf_counter()
+        status = func(*args)
+        self.server.service.metrics.record(endpoint, perf_counter() - start,
+                                           status < 400)
+
+    def _post_corners(self, query):
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            thresholds = get_thresholds(query)
+            extension = query.get('ext', [''])[0].lower()
+            result = self.server.service.corners(data, extension, thresholds)
+        except ValueError as exc:
+            return self._send_error(400, str(exc))
+        except Exception as exc:
+            return self._send_error(500, "%s: %s" % (type(exc).__name__, exc))
+        return self._send_json(result)
+
+    def _get_scene(self, result_id, name):
+        try:
+            directory = self.server.service.scene(result_id)
+        except Exception as exc:
+            return self._send_error(500, "%s: %s" % (type(exc).__name__, exc))
+        # The scene files are all in the same directory.
+        path = Path(directory or '') / name
+        if (directory is None or name != Path(name).name
+                or not path.is_file()):
+            return self._send_error(404, "Not found")
+        content_type = mimetypes.guess_type(name)[0]
+        return self._send(200, path.read_bytes(),
+                          content_type or 'application/octet-stream')
+
+    def _get_metrics(self):
+        service = self.server.service
+        metrics = service.metrics.as_dict()
+        with service._lock:
+            metrics['results'] = service.results.stats()
+            metrics['scenes'] = service.scenes.stats()
+        return metrics
+
+    def _send_json(self, data):
+        return self._send(200, json.dumps(data).encode(), 'application/json')
+
+    def _send_error(self, status, message):
+        return self._send(status, json.dumps({'error': message}).encode(),
+                          'application/json')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def log_message(self, format, *args):
+        # The metrics replace the request log.
+        pass
+
+
+def make_server(service, host='localhost', port=8080):
+    """Make an HTTP server for a CornerService (see CornerHandler).
+
+    Pass port 0 to use any free port, given by server.server_address.
+    """
+    server = ThreadingHTTPServer((host, port), CornerHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve the corner detection over HTTP, with warm workers "
+                    "and in-memory caches."
+    )
+    parser.add_argument('--host', type=str, default='localhost',
+                        help="address to listen on")
+    parser.add_argument('--port', type=int, default=8080,
+                        help="port to listen on")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="number of worker processes")
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help="directory where imported shapes and meshes "
+                             "are also cached on disk")
+    parser.add_argument('--max-shapes', type=int, default=DEFAULT_MAX_SHAPES,
+                        help="imported shapes kept in memory per worker")
+    parser.add_argument('--max-results', type=int,
+                        default=DEFAULT_MAX_RESULTS,
+                        help="analysis results kept in memory")
+    args = parser.parse_args()
+
+    service = CornerService(args.workers, args.cache_dir, args.max_shapes,
+                            args.max_results)
+    server = make_server(service, args.host, args.port)
+    print("Serving on http://%s:%d" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+# Default maximum size of a cache directory, in bytes
+DEFAULT_MAX_BYTES = 2**30
+
+
+def hash_file(path, chunk_size=2**20):
+    """Get the SHA-256 hex digest of the content of this file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Size-bounded cache of files in a directory, with LRU eviction.
+
+    Each entry is a single file named after its key. The entries of a cache
+    live in a subdirectory named after its namespace and version: creating a
+    cache with a new version deletes the entries of the previous versions.
+    Recency is tracked with the modification time of the files, so it is
+    shared between processes using the same directory.
+    """
+
+    def __init__(self, directory, namespace, version,
+                 max_bytes=DEFAULT_MAX_BYTES, suffix=''):
+        self.root = Path(directory)
+        self.directory = self.root / ("%s-v%s" % (namespace, version))
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for other in self.root.glob("%s-v*" % namespace):
+            if other != self.directory and other.is_dir():
+                shutil.rmtree(other, ignore_errors=True)
+
+    def path(self, key):
+        return self.directory / (key + self.suffix)
+
+    def get(self, key):
+        """Get the path of the entry with this key, or None if missing."""
+        path = self.path(key)
+        try:
+            # Mark the entry as recently used.
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def discard(self, key):
+        """Remove the entry with this key, e.g. if it turned out unreadable.
+
+        The lookup that returned it is counted as a miss instead of a hit.
+        """
+        self.path(key).unlink(missing_ok=True)
+        self.hits -= 1
+        self.misses += 1
+
+    def put(self, key, write):
+        """Add an entry with this key, written to disk by write(path).
+
+        The entry is written to a temporary file first, so that concurrent
+        readers never see a partial file. Returns the path of the entry.
+        """
+        path = self.path(key)
+        tmp_path = path.with_name("%s.%d.tmp" % (path.name, os.getpid()))
+        try:
+            write(str(tmp_path))
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits."""
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Evicted by another process.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Get the hit/miss statistics of this cache object."""
+        n_lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / n_lookups if n_lookups else 0.,
+        }
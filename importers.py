@@ -1,9 +1,29 @@
+import importlib
+from collections.abc import Mapping
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
-from cadquery import importers as cq_imp
-from cadquery import exporters as cq_exp
-from OCC.Extend.DataExchange import read_iges_file, read_step_file, read_stl_file
+import OCC
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.BRepTools import breptools_Read
+from OCC.Core.BRepTools import breptools_Write
+from OCC.Core.TopoDS import TopoDS_Shape
+
+from disk_cache import DEFAULT_MAX_BYTES
+from disk_cache import DiskCache
+from disk_cache import hash_file
+
+# Version of the importers. Increment it whenever an importer changes the
+# shapes it returns, to invalidate the shapes cached by previous versions.
+IMPORTER_VERSION = 2
+
+
+def read_brep_file(path):
+    """Import a file in OCC's native BRep format."""
+    shp = TopoDS_Shape()
+    if not breptools_Read(shp, str(path), BRep_Builder()):
+        raise IOError("Could not read BRep file %s" % path)
+    return shp
 
 
 def read_dxf_file(path):
@@ -14,8 +34,28 @@ def read_dxf_file(path):
     """
     # The cadquery package has the ability to load 2D DXF files. It used to
     # rely on pythonOCC, but now uses its own OCC python bindings instead. As a
-    # workaround, this function exports the loaded file as STEP, and re-imports
-    # it with pythonOCC.
+    # workaround, this function exports the loaded faces in OCC's native BRep
+    # format, and re-imports them with pythonOCC. Unlike STEP, BRep is written
+    # and parsed without any translation, and keeps the shapes unchanged.
+    # cadquery is slow to import and only needed here, so it is imported on
+    # first use.
+    import cadquery as cq
+    wk = cq.importers.importDXF(path)  # imports a cadquery "workspace"
+    compound = cq.Compound.makeCompound(wk.vals())
+    with TemporaryDirectory() as tmpdirname:
+        brep_path = str(Path(tmpdirname) / "file.brep")
+        compound.exportBrep(brep_path)
+        return read_brep_file(brep_path)
+
+
+def read_dxf_file_via_step(path):
+    """Import a 2D DXF file through a STEP file, as read_dxf_file used to.
+
+    This is only kept to check and benchmark read_dxf_file against it.
+    """
+    from cadquery import importers as cq_imp
+    from cadquery import exporters as cq_exp
+    from OCC.Extend.DataExchange import read_step_file
     wk = cq_imp.importDXF(path)  # imports a cadquery "workspace"
     with TemporaryDirectory() as tmpdirname:
         path = str(Path(tmpdirname) / "file.step")
@@ -24,21 +64,85 @@ def read_dxf_file(path):
         return shp
 
 
-IMPORT_METHODS = {
+class ImporterRegistry(Mapping):
+    """Mapping from file extensions to importers, loaded on first use.
+
+    Importers are registered either as functions, or as "module:function"
+    strings. In the latter case, the module is only imported when a file
+    with this extension is first imported, so that each format only pays for
+    its own dependencies.
+    """
+
+    def __init__(self, importers):
+        self._importers = dict(importers)
+
+    def register(self, extension, importer):
+        self._importers[extension] = importer
+
+    def __getitem__(self, extension):
+        importer = self._importers[extension]
+        if isinstance(importer, str):
+            module_name, function_name = importer.split(':')
+            module = importlib.import_module(module_name)
+            importer = self._importers[extension] = getattr(module,
+                                                            function_name)
+        return importer
+
+    def __iter__(self):
+        return iter(self._importers)
+
+    def __len__(self):
+        return len(self._importers)
+
+
+IMPORT_METHODS = ImporterRegistry({
+    'brep': read_brep_file,
     'dxf': read_dxf_file,
-    'iges': read_iges_file,
-    'igs': read_iges_file,
-    'stl': read_stl_file,
-    'step': read_step_file,
-    'stp': read_step_file,
-}
+    'iges': 'OCC.Extend.DataExchange:read_iges_file',
+    'igs': 'OCC.Extend.DataExchange:read_iges_file',
+    'stl': 'OCC.Extend.DataExchange:read_stl_file',
+    'step': 'OCC.Extend.DataExchange:read_step_file',
+    'stp': 'OCC.Extend.DataExchange:read_step_file',
+})
+
+
+class ShapeCache(DiskCache):
+    """On-disk cache of imported shapes, stored in the BRep format.
+
+    Shapes are keyed by a hash of the imported file's content, so that copied
+    or renamed files are still found in the cache. The cache is invalidated
+    when IMPORTER_VERSION or the version of pythonOCC changes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        version = "%d-occ%s" % (IMPORTER_VERSION, OCC.VERSION)
+        super().__init__(directory, 'shapes', version, max_bytes, '.brep')
 
 
-def import_file(path):
-    """Import a CAD file. Supported formats: DXF (2D only), IGES, STEP, STL.
+def import_file(path, cache=None):
+    """Import a CAD file. Supported formats: BRep, DXF (2D only), IGES, STEP,
+    STL.
 
-    The format is implicitly set by the file extension.
+    The format is implicitly set by the file extension. If a ShapeCache is
+    given, the shape is loaded from it when the same file content has been
+    imported before, and stored in it otherwise.
     """
     extension = Path(path).suffix[1:].lower()
     importer = IMPORT_METHODS[extension]
-    return importer(path)
+    if cache is None:
+        return importer(path)
+    key = "%s-%s" % (hash_file(path), extension)
+    cached_path = cache.get(key)
+    if cached_path is not None:
+        try:
+            return read_brep_file(cached_path)
+        except IOError:
+            cache.discard(key)
+    shp = importer(path)
+    try:
+        cache.put(key, lambda brep_path: breptools_Write(shp, brep_path))
+    except IOError:
+        # The BRep could not be written (breptools_Write does not raise):
+        # the file will just be imported again next time.
+        pass
+    return shp
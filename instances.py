@@ -0,0 +1,65 @@
+import numpy as np
+
+from OCC.Core.TopAbs import TopAbs_COMPOUND
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import TopoDS_Iterator
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+
+
+def iter_parts(shape):
+    """Iterate over the parts of a shape, with their locations composed.
+
+    The parts are the sub-shapes that are not compounds, found by walking
+    the compounds of the shape recursively (e.g. the solids of an
+    assembly). A shape that is not a compound is its own single part.
+    """
+    if shape.ShapeType() != TopAbs_COMPOUND:
+        yield shape
+        return
+    iterator = TopoDS_Iterator(shape)
+    while iterator.More():
+        yield from iter_parts(iterator.Value())
+        iterator.Next()
+
+
+def get_instances(shape):
+    """Group the parts of a shape (see iter_parts) by underlying TShape.
+
+    Returns a list of tuples (prototype, list of TopLoc_Location), one per
+    unique part, in order of first appearance. The prototype is the part
+    without its location, and each instance of the part is
+    prototype.Moved(location): its sub-shapes are the sub-shapes of the
+    prototype moved by the same location.
+    """
+    prototypes = TopTools_IndexedMapOfShape()
+    instances = []
+    for part in iter_parts(shape):
+        prototype = part.Located(TopLoc_Location())
+        # IsSame compares the TShapes and locations, not the orientations.
+        part_id = prototypes.FindIndex(prototype) - 1
+        if part_id < 0:
+            prototypes.Add(prototype)
+            instances.append((prototype, []))
+            part_id = len(instances) - 1
+        instances[part_id][1].append(part.Location())
+    return instances
+
+
+def has_repeated_parts(instances):
+    """Tell whether some part appears several times in these instances."""
+    return any(len(locations) > 1 for _, locations in instances)
+
+
+def get_location_matrix(location):
+    """Get the 4x4 matrix of the transformation of a TopLoc_Location."""
+    trsf = location.Transformation()
+    matrix = np.eye(4)
+    for row in range(3):
+        for col in range(4):
+            matrix[row, col] = trsf.Value(row + 1, col + 1)
+    return matrix
+
+
+def transform_points(points, matrix):
+    """Apply a 4x4 transformation matrix to an (n, 3) array of points."""
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
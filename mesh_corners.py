@@ -0,0 +1,253 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from corner_finder import DEFAULT_THRESHOLDS
+from corner_finder import ModelIndex
+from meshing import compute_mesh
+
+# Minimum angle (in degrees) between the normals of two triangles for their
+# edge to be sharp. Smaller angles are assumed to come from the tessellation
+# of a smooth surface: ShapeTesselator keeps them below 0.5 rad (~28.6
+# degrees) at mesh quality 1.
+SHARP_ANGLE_DEGREES = 30.
+# Below this value (relative to the length of an edge), the height of a
+# vertex over the plane of a triangle is considered zero when checking the
+# convexity of the edge
+CONVEXITY_TOLERANCE = 1e-6
+# Minimum fraction of the area of a face covered by fillet triangles for the
+# face to be a fillet corner (see find_internal_corners_from_mesh)
+MIN_FILLET_AREA_FRACTION = .5
+# Dtypes of the records of binary STL files, after the header
+STL_COUNT_DTYPE = np.dtype('<u4')
+STL_TRIANGLE_DTYPE = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', 9),
+                               ('attributes', '<u2')])
+
+
+@dataclass
+class MeshCorners:
+    """Internal corners found in a triangle mesh by find_mesh_corners.
+
+    edge_vertices: (n_edges, 2) vertex ids of the sharp concave edges.
+    edge_triangles: (n_edges, 2) ids of the triangles sharing each of them.
+    edge_angles: angle between the normals of these triangles, in degrees.
+    triangle_radii: estimated radius of curvature of each triangle in a
+      concave smooth region (inf for the other triangles).
+    fillet_labels: region id of each triangle of a concave region with a
+      radius below the maximum fillet radius, -1 for the other triangles.
+      Regions are connected through the triangle edges.
+    fillet_radii: median radius of each region.
+    """
+    edge_vertices: np.ndarray
+    edge_triangles: np.ndarray
+    edge_angles: np.ndarray
+    triangle_radii: np.ndarray
+    fillet_labels: np.ndarray
+    fillet_radii: np.ndarray
+
+
+def read_stl_mesh(path):
+    """Read the triangles of a binary or ASCII STL file, without OCC.
+
+    Returns (positions, triangles), as float32 (n_vertices, 3) and int64
+    (n_triangles, 3) arrays, with the identical vertices merged.
+    """
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = np.frombuffer(f.read(4), STL_COUNT_DTYPE)
+        size = f.seek(0, 2)
+    # ASCII files start with "solid", but so do some binary files: the size
+    # of the file tells them apart.
+    if len(count) and size == (84 + int(count[0])
+                               * STL_TRIANGLE_DTYPE.itemsize):
+        records = np.fromfile(path, STL_TRIANGLE_DTYPE, offset=84)
+        points = records['vertices'].reshape(-1, 3)
+    else:
+        with open(path) as f:
+            points = np.array([line.split()[1:4] for line in f
+                               if line.lstrip().startswith('vertex')],
+                              np.float32).reshape(-1, 3)
+    return weld_vertices(points, np.arange(len(points)).reshape(-1, 3))
+
+
+def weld_vertices(positions, triangles):
+    """Merge the vertices of a mesh that have the same position.
+
+    Meshes with normals (e.g. from meshing.compute_mesh) duplicate the
+    vertices of sharp edges, which hides the adjacency of their triangles.
+    Returns (positions, triangles), with the triangles in the same order.
+    """
+    positions, inverse = np.unique(positions, axis=0, return_inverse=True)
+    return positions, inverse.reshape(-1)[triangles]
+
+
+def get_edge_adjacency(triangles, n_vertices):
+    """Find the pairs of half-edges of the manifold edges of a mesh.
+
+    Half-edge h goes from corner h % 3 to the next corner of triangle h // 3.
+    Returns two arrays of half-edge ids, the two halves of each edge shared
+    by exactly two triangles. Edges on the boundary or shared by more
+    triangles are left out.
+    """
+    starts = triangles.reshape(-1)
+    ends = triangles[:, [1, 2, 0]].reshape(-1)
+    keys = (np.minimum(starts, ends).astype(np.int64) * n_vertices
+            + np.maximum(starts, ends))
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    first = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[first, len(keys)])
+    first = first[counts == 2]
+    return order[first], order[first + 1]
+
+
+def get_connected_components(n_items, pairs):
+    """Label the connected components of a graph given by pairs of items.
+
+    Returns the label of each item: the smallest item of its component.
+    """
+    labels = np.arange(n_items)
+    if not len(pairs):
+        return labels
+    a, b = pairs[:, 0], pairs[:, 1]
+    while True:
+        smallest = np.minimum(labels[a], labels[b])
+        previous = labels.copy()
+        np.minimum.at(labels, a, smallest)
+        np.minimum.at(labels, b, smallest)
+        # Pointer jumping, so long chains converge in a few iterations.
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def find_mesh_corners(positions, triangles, thresholds=DEFAULT_THRESHOLDS,
+                      sharp_angle=SHARP_ANGLE_DEGREES):
+    """Find the internal corners of a triangle mesh.
+
+    The triangles must be consistently oriented, with normals pointing out
+    of the part (as in STL files and meshing.compute_mesh), and their
+    identical vertices merged (see weld_vertices). Degenerate triangles are
+    never part of a corner. Everything is computed over the edges shared by
+    two triangles at once:
+    - the angle between the normals of the triangles, and the convexity of
+      the edge, from the side of the plane of each triangle where the
+      opposite vertex of the other triangle lies;
+    - concave edges with an angle of at least max(sharp_angle,
+      thresholds.min_angle_degrees) are sharp edge corners;
+    - concave edges with a smaller angle bend a smooth surface, whose radius
+      of curvature is estimated from the height h of each triangle over the
+      edge and the angle a: r = h / (2 sin(a/2)), exact for the facets of a
+      cylinder. Each triangle gets the smallest radius of its edges, and
+      the regions of triangles with a radius below
+      thresholds.max_fillet_radius are fillet corners.
+    Returns a MeshCorners.
+    """
+    positions = np.asarray(positions, np.float64)
+    triangles = np.asarray(triangles, np.int64)
+    p0, p1, p2 = (positions[triangles[:, i]] for i in range(3))
+    cross = np.cross(p1 - p0, p2 - p0)
+    double_areas = np.linalg.norm(cross, axis=1)
+    normals = cross / np.maximum(double_areas, np.finfo(float).tiny)[:, None]
+
+    h1, h2 = get_edge_adjacency(triangles, len(positions))
+    t1, t2 = h1 // 3, h2 // 3
+    a = triangles[t1, h1 % 3]
+    b = triangles[t1, (h1 + 1) % 3]
+    # Opposite vertex of each half-edge in its triangle.
+    o1 = triangles[t1, (h1 + 2) % 3]
+    o2 = triangles[t2, (h2 + 2) % 3]
+    # Consistently oriented triangles go through their edge both ways.
+    consistent = triangles[t2, h2 % 3] == b
+    edge_vectors = positions[b] - positions[a]
+    lengths = np.linalg.norm(edge_vectors, axis=1)
+    cosines = np.einsum('ij,ij->i', normals[t1], normals[t2])
+    angles = np.degrees(np.arccos(np.clip(cosines, -1., 1.)))
+    tolerance = CONVEXITY_TOLERANCE * lengths
+    side1 = np.einsum('ij,ij->i', normals[t1], positions[o2] - positions[a])
+    side2 = np.einsum('ij,ij->i', normals[t2], positions[o1] - positions[a])
+    concave = consistent & (side1 > tolerance) & (side2 > tolerance)
+
+    sharp = concave & (angles >= max(sharp_angle,
+                                     thresholds.min_angle_degrees))
+    smooth = concave & ~sharp
+    # Radius of curvature seen from each triangle of the smooth edges.
+    half_angles = np.radians(angles[smooth]) / 2
+    radii = []
+    for t in (t1, t2):
+        heights = double_areas[t[smooth]] / lengths[smooth]
+        with np.errstate(divide='ignore'):
+            radii.append(heights / (2 * np.sin(half_angles)))
+    triangle_radii = np.full(len(triangles), np.inf)
+    np.minimum.at(triangle_radii, np.concatenate([t1[smooth], t2[smooth]]),
+                  np.concatenate(radii))
+
+    is_fillet = triangle_radii < thresholds.max_fillet_radius
+    linked = is_fillet[t1] & is_fillet[t2]
+    labels = get_connected_components(
+        len(triangles), np.stack([t1[linked], t2[linked]], axis=1))
+    roots, fillet_labels = np.unique(labels[is_fillet], return_inverse=True)
+    labels = np.full(len(triangles), -1)
+    labels[is_fillet] = fillet_labels
+    fillet_radii = np.array([np.median(triangle_radii[labels == i])
+                             for i in range(len(roots))])
+    return MeshCorners(
+        edge_vertices=np.stack([a[sharp], b[sharp]], axis=1),
+        edge_triangles=np.stack([t1[sharp], t2[sharp]], axis=1),
+        edge_angles=angles[sharp],
+        triangle_radii=triangle_radii,
+        fillet_labels=labels,
+        fillet_radii=fillet_radii)
+
+
+def find_internal_corners_from_mesh(model, index=None,
+                                    thresholds=DEFAULT_THRESHOLDS,
+                                    mesh_quality=1.,
+                                    sharp_angle=SHARP_ANGLE_DEGREES):
+    """Find the internal corners of a TopoDS_Shape model from its mesh.
+
+    This is a fast approximation of corner_finder.find_internal_corners: the
+    model is tessellated (see meshing.compute_mesh), its corners are found
+    with find_mesh_corners, and mapped back to the model. The edge corners
+    are the edges between two faces that are joined by a sharp concave mesh
+    edge, and the fillet corners the faces mostly covered by fillet
+    triangles (see MIN_FILLET_AREA_FRACTION). Unlike the exact finder, edge
+    corners may be curved, and edges bending by less than sharp_angle are
+    missed. Returns a tuple (list of TopoDS_Edge, list of TopoDS_Face).
+    """
+    if index is None:
+        index = ModelIndex(model)
+    mesh = compute_mesh(model, mesh_quality=mesh_quality)
+    if 'face_ids' not in mesh:
+        raise ValueError("The triangles of the mesh could not be mapped to "
+                         "the faces of the model")
+    # Face of each triangle.
+    triangle_faces = np.repeat(mesh['face_ids'], np.diff(mesh['face_offsets']))
+    positions, triangles = weld_vertices(mesh['positions'],
+                                         mesh['indices'].reshape(-1, 3))
+    corners = find_mesh_corners(positions, triangles, thresholds, sharp_angle)
+
+    # Edges between each pair of faces.
+    face_pair_edges = {}
+    for edge_id in range(len(index.edges())):
+        face_ids = index.face_ids_from_edge(edge_id)
+        if len(face_ids) == 2:
+            face_pair_edges.setdefault(
+                (min(face_ids), max(face_ids)), []).append(edge_id)
+    edge_ids = set()
+    face_pairs = np.sort(triangle_faces[corners.edge_triangles], axis=1)
+    for f1, f2 in np.unique(face_pairs, axis=0):
+        edge_ids.update(face_pair_edges.get((f1, f2), []))
+
+    n_faces = len(index.faces())
+    p0, p1, p2 = (positions[triangles[:, i]] for i in range(3))
+    areas = np.linalg.norm(np.cross(p1 - p0, p2 - p0), axis=1)
+    face_areas = np.bincount(triangle_faces, areas, n_faces)
+    fillet_areas = np.bincount(triangle_faces[corners.fillet_labels >= 0],
+                               areas[corners.fillet_labels >= 0], n_faces)
+    face_ids = np.flatnonzero(
+        fillet_areas > MIN_FILLET_AREA_FRACTION * face_areas)
+    edges = index.edges()
+    faces = index.faces()
+    return ([edges[i] for i in sorted(edge_ids)],
+            [faces[i] for i in face_ids])
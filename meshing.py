@@ -0,0 +1,286 @@
+import json
+
+import numpy as np
+from OCC.Core.BRep import BRep_Tool_Pnt
+from OCC.Core.BRep import BRep_Tool_Triangulation
+from OCC.Core.TopAbs import TopAbs_EDGE
+from OCC.Core.TopAbs import TopAbs_FACE
+from OCC.Core.Tesselator import ShapeTesselator
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopExp import topexp_FirstVertex
+from OCC.Core.TopExp import topexp_LastVertex
+from OCC.Core.TopExp import topexp_MapShapes
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import topods_Face
+from OCC.Core.TopTools import TopTools_IndexedMapOfShape
+
+# Types of the arrays written by write_mesh_buffers, as read by three.js
+# (typed arrays use the byte order of the machine, little-endian in practice)
+POSITION_DTYPE = np.dtype('<f4')
+INDEX_DTYPE = np.dtype('<u4')
+# Magic number at the start of the files written by write_arrays
+ARRAYS_MAGIC = b'ARRAYS01'
+# Alignment of the arrays in these files, in bytes
+ARRAYS_ALIGNMENT = 64
+
+
+def get_triangle_soup(tess):
+    """Get the vertex positions and normals computed by a ShapeTesselator.
+
+    Returns two float32 arrays of shape (3*n_triangles, 3): each triangle has
+    its own 3 vertices.
+    """
+    positions = np.array(tess.GetVerticesPositionAsTuple(), POSITION_DTYPE)
+    normals = np.array(tess.GetNormalsAsTuple(), POSITION_DTYPE)
+    return positions.reshape(-1, 3), normals.reshape(-1, 3)
+
+
+def get_indexed_mesh(positions, normals):
+    """Merge the identical vertices of a triangle soup.
+
+    Vertices are only merged if both their position and their normal are
+    equal, so that sharp edges stay sharp. Returns (positions, normals,
+    indices), where indices holds the 3 vertex indices of each triangle.
+    """
+    vertices = np.hstack((positions, normals))
+    unique, indices = np.unique(vertices, axis=0, return_inverse=True)
+    return (np.ascontiguousarray(unique[:, :3]),
+            np.ascontiguousarray(unique[:, 3:]),
+            indices.reshape(-1).astype(INDEX_DTYPE))
+
+
+def get_mesh_arrays(tess):
+    """Get the indexed mesh computed by a ShapeTesselator.
+
+    Returns (positions, normals, indices), see get_indexed_mesh.
+    """
+    return get_indexed_mesh(*get_triangle_soup(tess))
+
+
+def write_mesh_buffers(path, positions, normals, indices):
+    """Write the arrays of an indexed mesh one after the other, in binary.
+
+    The arrays are written straight from their memory, without conversion,
+    so that the browser can load them as typed arrays without parsing.
+    """
+    with open(path, 'wb') as f:
+        positions.astype(POSITION_DTYPE, copy=False).tofile(f)
+        normals.astype(POSITION_DTYPE, copy=False).tofile(f)
+        indices.astype(INDEX_DTYPE, copy=False).tofile(f)
+
+
+def read_mesh_buffers(path, n_vertices, n_indices):
+    """Read the arrays written by write_mesh_buffers, without copying them.
+
+    Returns (positions, normals, indices) as views of a memory map.
+    """
+    buffer = np.memmap(path, np.uint8, mode='r')
+    size = 3*n_vertices*POSITION_DTYPE.itemsize
+    positions = buffer[:size].view(POSITION_DTYPE).reshape(-1, 3)
+    normals = buffer[size:2*size].view(POSITION_DTYPE).reshape(-1, 3)
+    indices = buffer[2*size:].view(INDEX_DTYPE)
+    if len(indices) != n_indices:
+        raise ValueError("unexpected size of mesh buffers: %s" % path)
+    return positions, normals, indices
+
+
+def get_edge_polylines(tess):
+    """Get the discretised edges computed by a ShapeTesselator.
+
+    Returns a list of float32 arrays of shape (n_points, 3), one per edge.
+    """
+    polylines = []
+    for i_edge in range(tess.ObjGetEdgeCount()):
+        n_points = tess.ObjEdgeGetVertexCount(i_edge)
+        points = [tess.GetEdgeVertex(i_edge, i_point)
+                  for i_point in range(n_points)]
+        polylines.append(np.array(points, POSITION_DTYPE).reshape(-1, 3))
+    return polylines
+
+
+def get_line_segments(polylines):
+    """Gather polylines (sequences of 3D points) in one array of segments.
+
+    Returns (segments, offsets). segments has shape (2*n_segments, 3) and
+    holds the 2 ends of each segment, as drawn by three.js LineSegments.
+    Polyline i is made of the segments offsets[i] to offsets[i+1] (excluded).
+    """
+    counts = [max(len(polyline) - 1, 0) for polyline in polylines]
+    offsets = np.zeros(len(polylines) + 1, INDEX_DTYPE)
+    offsets[1:] = np.cumsum(counts)
+    segments = np.empty((2*offsets[-1], 3), POSITION_DTYPE)
+    for polyline, start, end in zip(polylines, offsets[:-1], offsets[1:]):
+        if end > start:
+            polyline = np.asarray(polyline, POSITION_DTYPE)
+            segments[2*start:2*end:2] = polyline[:-1]
+            segments[2*start+1:2*end:2] = polyline[1:]
+    return segments, offsets
+
+
+def write_line_buffers(path, segments, offsets):
+    """Write the arrays of get_line_segments one after the other, in binary.
+
+    See write_mesh_buffers.
+    """
+    with open(path, 'wb') as f:
+        segments.astype(POSITION_DTYPE, copy=False).tofile(f)
+        offsets.astype(INDEX_DTYPE, copy=False).tofile(f)
+
+
+def get_face_map(shape):
+    """Get the TopTools_IndexedMapOfShape of the faces of a shape."""
+    face_map = TopTools_IndexedMapOfShape()
+    topexp_MapShapes(shape, TopAbs_FACE, face_map)
+    return face_map
+
+
+def get_face_triangles(shape, face_map, tess):
+    """Get the triangles of each face of a shape meshed by a ShapeTesselator.
+
+    Returns (face_ids, offsets): the triangles offsets[i] to offsets[i+1]
+    (excluded) of the ShapeTesselator belong to the face of index face_ids[i]
+    (0-based) in face_map (see get_face_map). Returns None if the triangles
+    of the ShapeTesselator do not add up.
+    """
+    # ShapeTesselator explores the faces in this order, and skips the faces
+    # without triangulation.
+    face_ids = []
+    counts = [0]
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    while explorer.More():
+        face = topods_Face(explorer.Current())
+        triangulation = BRep_Tool_Triangulation(face, TopLoc_Location())
+        if triangulation is not None:
+            face_ids.append(face_map.FindIndex(face) - 1)
+            counts.append(triangulation.NbTriangles())
+        explorer.Next()
+    offsets = np.cumsum(counts)
+    if offsets[-1] != tess.ObjGetTriangleCount():
+        return None
+    return np.array(face_ids, np.int64), offsets
+
+
+def get_triangle_ranges(face_ids, offsets, selected_ids):
+    """Get the ranges of triangles of the selected faces.
+
+    face_ids and offsets are as returned by get_face_triangles. Returns a
+    flat list [start, count, start, count, ...] of triangle ranges, where
+    consecutive ranges are merged.
+    """
+    mask = np.isin(face_ids, selected_ids)
+    starts = offsets[:-1][mask]
+    ends = offsets[1:][mask]
+    if not len(starts):
+        return []
+    is_new = np.ones(len(starts), bool)
+    is_new[1:] = starts[1:] != ends[:-1]
+    is_last = np.ones(len(starts), bool)
+    is_last[:-1] = is_new[1:]
+    starts = starts[is_new]
+    ends = ends[is_last]
+    return np.column_stack((starts, ends - starts)).ravel().tolist()
+
+
+def get_edge_map(shape):
+    """Get the TopTools_IndexedMapOfShape of the edges of a shape.
+
+    This is the order of the edges of ShapeTesselator, as long as the number
+    of edges matches. See also polyline_matches_edge.
+    """
+    edge_map = TopTools_IndexedMapOfShape()
+    topexp_MapShapes(shape, TopAbs_EDGE, edge_map)
+    return edge_map
+
+
+def polyline_matches_edge(polyline, edge, tol=1e-3):
+    """Check that the ends of the polyline are the vertices of the edge."""
+    if len(polyline) < 2:
+        return False
+    ends = [BRep_Tool_Pnt(topexp_FirstVertex(edge)).Coord(),
+            BRep_Tool_Pnt(topexp_LastVertex(edge)).Coord()]
+    return (np.allclose(polyline[[0, -1]], ends, atol=tol)
+            or np.allclose(polyline[[-1, 0]], ends, atol=tol))
+
+
+def get_polylines(points, offsets):
+    """Split the points of consecutive polylines, see compute_mesh."""
+    return np.split(points, offsets[1:-1])
+
+
+def compute_mesh(shape, export_edges=False, mesh_quality=1.):
+    """Tessellate a shape with ShapeTesselator, and get its mesh as arrays.
+
+    Returns a dict of arrays:
+      positions, normals, indices: the indexed mesh (see get_indexed_mesh).
+      face_ids, face_offsets: the triangles of each face (see
+        get_face_triangles), missing if they could not be found.
+      edge_points, edge_offsets (if export_edges): the polylines of the
+        edges, one after the other. Edge i is made of the points
+        edge_offsets[i] to edge_offsets[i+1] (excluded).
+    """
+    tess = ShapeTesselator(shape)
+    tess.Compute(compute_edges=export_edges, mesh_quality=mesh_quality,
+                 parallel=True)
+    positions, normals, indices = get_mesh_arrays(tess)
+    mesh = {'positions': positions, 'normals': normals, 'indices': indices}
+    face_triangles = get_face_triangles(shape, get_face_map(shape), tess)
+    if face_triangles is not None:
+        mesh['face_ids'], mesh['face_offsets'] = face_triangles
+    if export_edges:
+        polylines = get_edge_polylines(tess)
+        mesh['edge_points'] = np.concatenate(
+            [np.empty((0, 3), POSITION_DTYPE)] + polylines)
+        mesh['edge_offsets'] = np.cumsum(
+            [0] + [len(polyline) for polyline in polylines])
+    return mesh
+
+
+def _align(size):
+    """Round up a size to a multiple of ARRAYS_ALIGNMENT."""
+    return -(-size // ARRAYS_ALIGNMENT) * ARRAYS_ALIGNMENT
+
+
+def write_arrays(path, arrays):
+    """Write a dict of arrays to a binary file that can be memory-mapped.
+
+    The file starts with ARRAYS_MAGIC, the size of a JSON header (uint64) and
+    the header, which gives the type, shape and offset of each array. The
+    arrays follow, each aligned on ARRAYS_ALIGNMENT bytes.
+    """
+    header = {}
+    size = 0
+    for name, array in arrays.items():
+        header[name] = {'dtype': array.dtype.str, 'shape': array.shape,
+                        'offset': size}
+        size += _align(array.nbytes)
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(ARRAYS_MAGIC) + 8 + len(header_bytes))
+    with open(path, 'wb') as f:
+        f.write(ARRAYS_MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header[name]['offset'])
+            np.ascontiguousarray(array).tofile(f)
+        f.truncate(data_start + size)
+
+
+def read_arrays(path):
+    """Read the arrays written by write_arrays, as read-only memory maps."""
+    with open(path, 'rb') as f:
+        if f.read(len(ARRAYS_MAGIC)) != ARRAYS_MAGIC:
+            raise ValueError("not an arrays file: %s" % path)
+        header_size = int(np.frombuffer(f.read(8), np.uint64)[0])
+        header = json.loads(f.read(header_size))
+    data_start = _align(len(ARRAYS_MAGIC) + 8 + header_size)
+    arrays = {}
+    for name, info in header.items():
+        dtype = np.dtype(info['dtype'])
+        shape = tuple(info['shape'])
+        if 0 in shape:
+            # Empty arrays cannot be memory-mapped.
+            arrays[name] = np.empty(shape, dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype, 'r',
+                                     data_start + info['offset'], shape)
+    return arrays
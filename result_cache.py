@@ -0,0 +1,150 @@
+import hashlib
+import json
+from dataclasses import asdict
+
+import OCC
+
+from corner_finder import ALGORITHM_VERSION
+from corner_finder import DEFAULT_THRESHOLDS
+from corner_finder import TR_DIST_FOR_INTERNALITY_CHECK
+from corner_finder import extract_features
+from corner_finder import find_internal_corners
+from disk_cache import DEFAULT_MAX_BYTES
+from disk_cache import DiskCache
+from importers import IMPORTER_VERSION
+from meshing import read_arrays
+from meshing import write_arrays
+
+
+def get_cache_version():
+    """Get the version of the caches of corners and features.
+
+    Their entries are indices in the ModelIndex of the imported model, so
+    they also depend on the importer and on the version of pythonOCC.
+    """
+    return "%d-%d-occ%s" % (ALGORITHM_VERSION, IMPORTER_VERSION, OCC.VERSION)
+
+
+class CornerResultCache(DiskCache):
+    """On-disk cache of corner detection results.
+
+    Results are keyed by a hash of the model content, the detection
+    thresholds and ALGORITHM_VERSION. They are stored as indices of the edges
+    and faces in the ModelIndex of the model, which are stable for a given
+    model content and importer, and turned back into shapes with the index
+    when loaded. The cache is cleared when ALGORITHM_VERSION,
+    IMPORTER_VERSION or the version of pythonOCC changes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory, 'corners', get_cache_version(), max_bytes,
+                         '.json')
+
+    @staticmethod
+    def key(model_hash, thresholds):
+        thresholds_str = json.dumps(asdict(thresholds), sort_keys=True)
+        return hashlib.sha256(
+            (model_hash + thresholds_str).encode()).hexdigest()
+
+    def load(self, model_hash, thresholds, index):
+        """Get the cached (edge corners, fillet corners) of a model.
+
+        Returns None if the results are not in the cache, or are unreadable.
+        """
+        key = self.key(model_hash, thresholds)
+        path = self.get(key)
+        if path is None:
+            return None
+        edges = index.edges()
+        faces = index.faces()
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return ([edges[i] for i in data['edge_corners']],
+                    [faces[i] for i in data['fillet_corners']])
+        except (IOError, ValueError, KeyError, IndexError, TypeError):
+            self.discard(key)
+            return None
+
+    def store(self, model_hash, thresholds, index, edges, fillets):
+        """Add the corners found in a model to the cache."""
+        data = {
+            'edge_corners': [index.edge_index(edge) for edge in edges],
+            'fillet_corners': [index.face_index(face) for face in fillets],
+        }
+
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(data, f)
+
+        self.put(self.key(model_hash, thresholds), write)
+
+
+def find_internal_corners_cached(model, index, model_hash, cache,
+                                 thresholds=DEFAULT_THRESHOLDS):
+    """Find the internal (edge, fillet) corners of a model, using this cache.
+
+    model_hash identifies the model content, e.g. the hash of its file. If
+    the cache is None, the corners are always computed.
+    """
+    if cache is not None:
+        corners = cache.load(model_hash, thresholds, index)
+        if corners is not None:
+            return corners
+    edges, fillets = find_internal_corners(model, index, thresholds)
+    if cache is not None:
+        cache.store(model_hash, thresholds, index, edges, fillets)
+    return edges, fillets
+
+
+class FeatureTableCache(DiskCache):
+    """On-disk cache of the complete feature tables of models.
+
+    Tables (see corner_finder.extract_features) are keyed by a hash of the
+    model content, the translation distance of the internality check and
+    ALGORITHM_VERSION. They are stored with write_arrays and loaded as memory
+    maps, ready to be queried for any angle and radius thresholds. Like the
+    CornerResultCache, they are indexed like the ModelIndex of the model.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory, 'features', get_cache_version(),
+                         max_bytes, '.arrays')
+
+    @staticmethod
+    def key(model_hash, tr_dist):
+        return "%s-t%s" % (model_hash, float(tr_dist))
+
+    def load(self, key):
+        """Get the cached feature arrays with this key, or None if missing."""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return read_arrays(path)
+        except (OSError, ValueError, IndexError):
+            # IndexError: the file is too short to hold a header size.
+            self.discard(key)
+            return None
+
+    def store(self, key, features):
+        """Add the feature arrays of a model to the cache."""
+        self.put(key, lambda path: write_arrays(path, features))
+
+
+def extract_features_cached(model, index, model_hash, cache,
+                            tr_dist=TR_DIST_FOR_INTERNALITY_CHECK):
+    """Get the feature arrays of a model's complete table, using this cache.
+
+    Returns the arrays by name (see FeatureTable.arrays), to query with
+    corner_finder.get_edge_corner_ids and get_fillet_corner_ids. If the
+    cache is None, the features are always computed.
+    """
+    if cache is None:
+        return extract_features(model, index, tr_dist).arrays()
+    key = cache.key(model_hash, tr_dist)
+    features = cache.load(key)
+    if features is None:
+        features = extract_features(model, index, tr_dist).arrays()
+        cache.store(key, features)
+    return features
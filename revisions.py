@@ -0,0 +1,265 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from OCC.Core.BRepAdaptor import BRepAdaptor_Curve
+from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
+from OCC.Core.BRepGProp import brepgprop_SurfaceProperties
+from OCC.Core.GeomAbs import GeomAbs_Circle
+from OCC.Core.GeomAbs import GeomAbs_Cone
+from OCC.Core.GeomAbs import GeomAbs_Cylinder
+from OCC.Core.GeomAbs import GeomAbs_Plane
+from OCC.Core.GeomAbs import GeomAbs_Sphere
+from OCC.Core.GeomAbs import GeomAbs_Torus
+from OCC.Core.GProp import GProp_GProps
+
+from corner_finder import DEFAULT_THRESHOLDS
+from corner_finder import FEATURE_NAMES
+from corner_finder import NULL_STATS
+from corner_finder import FeatureTable
+from corner_finder import ModelIndex
+from spatial_index import get_bounding_box
+
+# Number of decimals kept in the geometric signatures of faces and edges.
+# Faces and edges are matched between revisions if their rounded signatures
+# are equal.
+SIGNATURE_DECIMALS = 6
+# Names of the edge and face features of a FeatureTable
+EDGE_FEATURE_NAMES = tuple(name for name in FEATURE_NAMES
+                           if name.startswith('edge_'))
+FACE_FEATURE_NAMES = tuple(name for name in FEATURE_NAMES
+                           if name.startswith('face_'))
+
+
+def _round(values):
+    return tuple(round(value, SIGNATURE_DECIMALS) for value in values)
+
+
+def get_face_signature(face):
+    """Get the geometric signature of a face.
+
+    This is a tuple of its surface type, the parameters of its surface
+    (normal and offset of planes, axis and radius of cylinders, etc.), its
+    bounding box, its area and its orientation, rounded to
+    SIGNATURE_DECIMALS.
+    """
+    surface = BRepAdaptor_Surface(face)
+    surface_type = surface.GetType()
+    if surface_type == GeomAbs_Plane:
+        axis = surface.Plane().Axis()
+        normal = axis.Direction()
+        offset = (normal.X()*axis.Location().X()
+                  + normal.Y()*axis.Location().Y()
+                  + normal.Z()*axis.Location().Z())
+        parameters = (normal.X(), normal.Y(), normal.Z(), offset)
+    elif surface_type == GeomAbs_Cylinder:
+        cylinder = surface.Cylinder()
+        direction = cylinder.Axis().Direction()
+        parameters = (direction.X(), direction.Y(), direction.Z(),
+                      cylinder.Radius())
+    elif surface_type == GeomAbs_Cone:
+        cone = surface.Cone()
+        parameters = (cone.SemiAngle(), cone.RefRadius())
+    elif surface_type == GeomAbs_Sphere:
+        parameters = (surface.Sphere().Radius(),)
+    elif surface_type == GeomAbs_Torus:
+        torus = surface.Torus()
+        parameters = (torus.MajorRadius(), torus.MinorRadius())
+    else:
+        # Other surfaces are told apart by their box and area.
+        parameters = ()
+    props = GProp_GProps()
+    brepgprop_SurfaceProperties(face, props)
+    return (surface_type, _round(parameters),
+            _round(get_bounding_box(face)), _round((props.Mass(),)),
+            face.Orientation())
+
+
+def get_edge_signature(edge):
+    """Get the geometric signature of an edge.
+
+    This is a tuple of its curve type, its end points, its bounding box and
+    the radius of circles, rounded to SIGNATURE_DECIMALS.
+    """
+    curve = BRepAdaptor_Curve(edge)
+    curve_type = curve.GetType()
+    ends = sorted(_round(curve.Value(parameter).Coord())
+                  for parameter in (curve.FirstParameter(),
+                                    curve.LastParameter()))
+    radius = curve.Circle().Radius() if curve_type == GeomAbs_Circle else 0.
+    return (curve_type, tuple(ends), _round(get_bounding_box(edge)),
+            _round((radius,)))
+
+
+def get_neighbourhood_keys(index):
+    """Get the keys of the neighbourhoods of the edges and faces of a model.
+
+    The features of an edge (see FeatureTable) only depend on its geometry,
+    and on the geometry of its faces and its orientation in them; so its key
+    is its signature, with the signatures of its faces and its orientations.
+    The features of a face depend on its geometry and on the features of
+    its edges; so its key is its signature, with the keys of its edges.
+    Returns (list of edge keys, list of face keys), in the order of the
+    ModelIndex.
+    """
+    faces = index.faces()
+    face_signatures = [get_face_signature(face) for face in faces]
+    edge_keys = []
+    for edge_id, edge in enumerate(index.edges()):
+        neighbours = []
+        for face_id in index.face_ids_from_edge(edge_id):
+            orientation = index.edge_orientation(edge, faces[face_id])
+            neighbours.append((face_signatures[face_id],
+                               -1 if orientation is None else orientation))
+        edge_keys.append((get_edge_signature(edge), tuple(sorted(neighbours))))
+    face_keys = [
+        (face_signatures[face_id],
+         tuple(sorted(edge_keys[edge_id]
+                      for edge_id in index.edge_ids_from_face(face_id))))
+        for face_id in range(len(faces))]
+    return edge_keys, face_keys
+
+
+def match_keys(previous_keys, keys):
+    """Get the index of each key in previous_keys, or -1 if it is not in it.
+    """
+    previous_ids = {key: i for i, key in enumerate(previous_keys)}
+    return np.array([previous_ids.get(key, -1) for key in keys], np.int64)
+
+
+class RevisionFeatureTable(FeatureTable):
+    """FeatureTable of a revision of a model, which carries over the features
+    of a previous revision.
+
+    edge_sources and face_sources give, for each edge and face, its index in
+    the previous table, or -1 if its neighbourhood changed (see
+    get_neighbourhood_keys): only the features of these are computed. The
+    previous table must cover the thresholds (see FeatureTable.covers).
+    Carried over candidates are not recorded in stats.
+    """
+
+    def __init__(self, index, previous, edge_sources, face_sources,
+                 thresholds=DEFAULT_THRESHOLDS, stats=NULL_STATS,
+                 complete=False):
+        if (not previous.covers(thresholds)
+                or (complete and not previous.complete)):
+            raise ValueError("The previous feature table does not cover %s"
+                             % (thresholds,))
+        self._previous = previous
+        self._edge_sources = edge_sources
+        self._face_sources = face_sources
+        super().__init__(index, thresholds, stats, complete)
+
+    def _compute_edge_features(self, edge_ids):
+        edge_ids = self._carry_over(edge_ids, self._edge_sources,
+                                    EDGE_FEATURE_NAMES)
+        super()._compute_edge_features(edge_ids)
+
+    def _compute_face_features(self, face_ids):
+        face_ids = self._carry_over(face_ids, self._face_sources,
+                                    FACE_FEATURE_NAMES)
+        super()._compute_face_features(face_ids)
+
+    def _carry_over(self, ids, sources, names):
+        """Copy the features of these ids from the previous table, where
+        they have a source, and get the other ids."""
+        ids = np.asarray(ids, np.int64)
+        sources = sources[ids]
+        carried = sources >= 0
+        for name in names:
+            getattr(self, name)[ids[carried]] = getattr(
+                self._previous, name)[sources[carried]]
+        return ids[~carried]
+
+
+@dataclass
+class CornerChanges:
+    """Corners added and removed between two revisions of a model.
+
+    A corner whose neighbourhood changed (e.g. the edge of a deepened
+    pocket) is both removed and added. Removed corners are shapes of the
+    previous model, the others are shapes of the new one.
+    """
+    added_edges: list
+    removed_edges: list
+    added_fillets: list
+    removed_fillets: list
+    n_kept_edges: int
+    n_kept_fillets: int
+
+
+class Revision:
+    """A revision of a model, analysed incrementally from the previous one.
+
+    Design iterations usually change a few features of a part. The faces and
+    edges of the model are matched with those of the previous Revision, if
+    any, by the key of their neighbourhood (see get_neighbourhood_keys): the
+    features of the matched ones are carried over, and only those of the
+    others are computed (see RevisionFeatureTable). The arguments are those
+    of FeatureTable; the previous revision must cover the thresholds.
+    """
+
+    def __init__(self, model, previous=None, thresholds=DEFAULT_THRESHOLDS,
+                 stats=NULL_STATS, complete=False):
+        self.model = model
+        self.index = ModelIndex(model)
+        self.edge_keys, self.face_keys = get_neighbourhood_keys(self.index)
+        if previous is None:
+            self.edge_sources = np.full(len(self.edge_keys), -1, np.int64)
+            self.face_sources = np.full(len(self.face_keys), -1, np.int64)
+            self.table = FeatureTable(self.index, thresholds, stats,
+                                      complete)
+        else:
+            self.edge_sources = match_keys(previous.edge_keys,
+                                           self.edge_keys)
+            self.face_sources = match_keys(previous.face_keys,
+                                           self.face_keys)
+            self.table = RevisionFeatureTable(
+                self.index, previous.table, self.edge_sources,
+                self.face_sources, thresholds, stats, complete)
+
+    def n_computed(self):
+        """Get the numbers of edges and faces whose features were computed
+        rather than carried over."""
+        return (int(np.count_nonzero(self.edge_sources < 0)),
+                int(np.count_nonzero(self.face_sources < 0)))
+
+    def corners(self, thresholds=None):
+        """Get the internal corners of the model.
+
+        Returns a tuple (list of TopoDS_Edge, list of TopoDS_Face), like
+        corner_finder.find_internal_corners. The thresholds default to those
+        of the table (see FeatureTable.covers).
+        """
+        edges = self.index.edges()
+        faces = self.index.faces()
+        return ([edges[i] for i in self.table.edge_corner_ids(thresholds)],
+                [faces[i] for i in self.table.fillet_corner_ids(thresholds)])
+
+    def diff(self, previous, thresholds=None):
+        """Get the CornerChanges from a previous revision to this one."""
+        edge_ids = self.table.edge_corner_ids(thresholds)
+        previous_edge_ids = previous.table.edge_corner_ids(thresholds)
+        fillet_ids = self.table.fillet_corner_ids(thresholds)
+        previous_fillet_ids = previous.table.fillet_corner_ids(thresholds)
+        added_edges, removed_edges, n_kept_edges = _diff_ids(
+            edge_ids, self.edge_keys, self.index.edges(),
+            previous_edge_ids, previous.edge_keys, previous.index.edges())
+        added_fillets, removed_fillets, n_kept_fillets = _diff_ids(
+            fillet_ids, self.face_keys, self.index.faces(),
+            previous_fillet_ids, previous.face_keys, previous.index.faces())
+        return CornerChanges(added_edges, removed_edges, added_fillets,
+                             removed_fillets, n_kept_edges, n_kept_fillets)
+
+
+def _diff_ids(ids, keys, shapes, previous_ids, previous_keys,
+              previous_shapes):
+    """Get (added shapes, removed shapes, number of kept shapes) between the
+    corner ids of two revisions, matched by key."""
+    corner_keys = {keys[i] for i in ids}
+    previous_corner_keys = {previous_keys[i] for i in previous_ids}
+    added = [shapes[i] for i in ids
+             if keys[i] not in previous_corner_keys]
+    removed = [previous_shapes[i] for i in previous_ids
+               if previous_keys[i] not in corner_keys]
+    return added, removed, len(ids) - len(added)
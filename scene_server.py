@@ -0,0 +1,195 @@
+import asyncio
+import gzip
+import json
+import mimetypes
+import webbrowser
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional: without it, responses are only gzip-compressed.
+    brotli = None
+
+# Number of consecutive ports tried when the first one is in use
+MAX_PORT_ATTEMPTS = 10
+# Compression levels of the responses
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Files smaller than this (in bytes) are sent uncompressed
+MIN_COMPRESSED_SIZE = 1024
+# Cache-Control header of the scene files: their names are unique to a
+# scene, so their content never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def get_encoding(accept_encoding):
+    """Pick the compression of a response from the Accept-Encoding header."""
+    accepted = {item.split(';')[0].strip()
+                for item in accept_encoding.split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(data, GZIP_LEVEL)
+    return data
+
+
+class SceneServer:
+    """Asynchronous HTTP server streaming a viewer scene as it is built.
+
+    The files of the scene are served from directory. Events are produced by
+    calling next_event (a blocking function returning (name, data) tuples,
+    and None once the scene is complete) in a thread, from the moment the
+    server starts. Clients of /events receive them as server-sent events,
+    the past ones first, so a page gets each shape as soon as it is ready.
+    Files are compressed with brotli or gzip, and can be cached by the
+    browser: the page is revalidated with its ETag, and the other files
+    never change.
+    """
+
+    def __init__(self, directory, next_event, index='index.html'):
+        self.directory = Path(directory)
+        self.next_event = next_event
+        self.index = index
+        self.events = []
+        self.complete = False
+        self._compressed = {}
+        self._changed = None
+
+    async def _produce_events(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, self.next_event)
+            async with self._changed:
+                if event is None:
+                    self.complete = True
+                else:
+                    self.events.append(event)
+                self._changed.notify_all()
+            if event is None:
+                return
+
+    async def _stream_events(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-store\r\n"
+                     b"Connection: close\r\n\r\n")
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: sent < len(self.events) or self.complete)
+                events = self.events[sent:]
+                complete = self.complete
+            for name, data in events:
+                writer.write(b"event: %s\ndata: %s\n\n"
+                             % (name.encode(), json.dumps(data).encode()))
+            sent += len(events)
+            await writer.drain()
+            if complete:
+                writer.write(b"event: done\ndata: {}\n\n")
+                await writer.drain()
+                return
+
+    async def _send_file(self, writer, name, headers):
+        path = self.directory / name
+        # The scene files are all in the directory itself.
+        if name != Path(name).name or not path.is_file():
+            return self._send(writer, 404, b"Not found", 'text/plain')
+        stat = path.stat()
+        etag = '"%s-%d-%d"' % (name, stat.st_size, stat.st_mtime_ns)
+        cache_control = ('no-cache' if name == self.index
+                         else IMMUTABLE_CACHE_CONTROL)
+        extra_headers = {'ETag': etag, 'Cache-Control': cache_control,
+                         'Vary': 'Accept-Encoding'}
+        if headers.get('if-none-match') == etag:
+            return self._send(writer, 304, b'', None, extra_headers)
+        encoding = None
+        if stat.st_size >= MIN_COMPRESSED_SIZE:
+            encoding = get_encoding(headers.get('accept-encoding', ''))
+        key = (etag, encoding)
+        if key not in self._compressed:
+            data = path.read_bytes()
+            # Compression is CPU-bound: keep the event loop responsive.
+            self._compressed[key] = await asyncio.get_running_loop(
+                ).run_in_executor(None, compress, data, encoding)
+        if encoding is not None:
+            extra_headers['Content-Encoding'] = encoding
+        content_type = (mimetypes.guess_type(name)[0]
+                        or 'application/octet-stream')
+        self._send(writer, 200, self._compressed[key], content_type,
+                   extra_headers)
+
+    @staticmethod
+    def _send(writer, status, body, content_type, headers=None):
+        reasons = {200: 'OK', 304: 'Not Modified', 404: 'Not Found',
+                   405: 'Method Not Allowed'}
+        lines = ["HTTP/1.1 %d %s" % (status, reasons[status]),
+                 "Content-Length: %d" % len(body),
+                 "Connection: close"]
+        if content_type is not None:
+            lines.append("Content-Type: %s" % content_type)
+        lines.extend("%s: %s" % item for item in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1')
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            method, target = request_line.split()[:2]
+            path = target.split('?')[0].lstrip('/') or self.index
+            if method != 'GET':
+                self._send(writer, 405, b"Method not allowed", 'text/plain')
+            elif path == 'events':
+                await self._stream_events(writer)
+            else:
+                await self._send_file(writer, path, headers)
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            # The client went away or sent a malformed request.
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='localhost', port=8080, open_webbrowser=False,
+                    on_ready=None):
+        """Serve the scene until cancelled.
+
+        If the port is in use, the next ones are tried. on_ready, if given,
+        is called with the (host, port) of the server once it listens.
+        """
+        self._changed = asyncio.Condition()
+        for attempt in range(MAX_PORT_ATTEMPTS):
+            try:
+                server = await asyncio.start_server(self._handle, host,
+                                                    port + attempt)
+                break
+            except OSError:
+                if port == 0 or attempt == MAX_PORT_ATTEMPTS - 1:
+                    raise
+        address = server.sockets[0].getsockname()[:2]
+        print("## Serving the scene at http://%s:%d" % address)
+        if on_ready is not None:
+            on_ready(address)
+        if open_webbrowser:
+            webbrowser.open("http://%s:%d" % address)
+        producer = asyncio.ensure_future(self._produce_events())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            producer.cancel()
@@ -0,0 +1,304 @@
+import heapq
+from itertools import repeat
+
+import numpy as np
+
+from OCC.Core.gp import gp_Vec
+from OCC.Core.Bnd import Bnd_Box
+from OCC.Core.BRep import BRep_Tool_Surface
+from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
+from OCC.Core.BRepBndLib import brepbndlib_Add
+from OCC.Core.BRepExtrema import BRepExtrema_DistShapeShape
+from OCC.Core.BRepLProp import BRepLProp_SLProps
+from OCC.Core.ShapeAnalysis import ShapeAnalysis_Surface
+from OCC.Core.TopAbs import TopAbs_REVERSED
+from OCC.Core.TopAbs import TopAbs_FACE
+from OCC.Core.TopAbs import TopAbs_VERTEX
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopExp import topexp_MapShapesAndAncestors
+from OCC.Core.TopTools import TopTools_IndexedDataMapOfShapeListOfShape
+from OCC.Core.TopTools import TopTools_ListIteratorOfListOfShape
+
+from corner_finder import NULL_STATS
+
+# Maximum number of boxes in a leaf of a BoxTree
+LEAF_SIZE = 8
+# Distance under which shapes are considered in contact
+CONTACT_TOLERANCE = 1e-6
+
+
+def get_bounding_box(shape):
+    """Get (xmin, ymin, zmin, xmax, ymax, zmax) of the shape's geometry.
+
+    The triangulation of the shape, if any, is ignored, so the box does not
+    depend on whether the shape was meshed.
+    """
+    box = Bnd_Box()
+    brepbndlib_Add(shape, box, False)
+    return box.Get()
+
+
+def get_bounding_boxes(shapes):
+    """Get the bounding boxes of these shapes, as an (n, 6) array."""
+    boxes = np.array([get_bounding_box(shape) for shape in shapes], float)
+    return boxes.reshape(-1, 6)
+
+
+def get_box_distances(boxes, box):
+    """Get the distances between boxes and box (arrays of [min, max] boxes,
+    broadcast against each other). Overlapping boxes are at distance 0.
+
+    The distance between the bounding boxes of two shapes is a lower bound
+    of the distance between the shapes.
+    """
+    boxes = np.asarray(boxes, float)
+    box = np.asarray(box, float)
+    gaps = np.maximum(np.maximum(boxes[..., :3] - box[..., 3:],
+                                 box[..., :3] - boxes[..., 3:]), 0.)
+    return np.sqrt((gaps**2).sum(-1))
+
+
+class BoxTree:
+    """Bounding volume hierarchy over axis-aligned boxes.
+
+    The boxes are given as an (n, 6) array of [min, max] corners. The tree is
+    built top-down, by splitting the boxes at the median of their centers
+    along the longest axis, until leaves hold at most leaf_size boxes. Nodes
+    are held in NumPy arrays: node i has the bounds node_boxes[i], and covers
+    the boxes order[starts[i]:ends[i]]; its children are i + 1 and rights[i],
+    or it is a leaf if rights[i] is -1.
+    """
+
+    def __init__(self, boxes, leaf_size=LEAF_SIZE):
+        self.boxes = np.asarray(boxes, float).reshape(-1, 6)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(self.boxes))
+        self._centers = (self.boxes[:, :3] + self.boxes[:, 3:]) / 2
+        self._nodes = []
+        if len(self.boxes):
+            self._build(0, len(self.boxes))
+        nodes = np.array(self._nodes, np.int64).reshape(-1, 3)
+        self.starts, self.ends, self.rights = nodes.T
+        self.node_boxes = np.array(
+            [np.concatenate((self.boxes[self.order[start:end], :3].min(0),
+                             self.boxes[self.order[start:end], 3:].max(0)))
+             for start, end, _ in self._nodes]).reshape(-1, 6)
+        del self._nodes
+
+    def _build(self, start, end):
+        node = len(self._nodes)
+        self._nodes.append([start, end, -1])
+        if end - start > self.leaf_size:
+            ids = self.order[start:end]
+            centers = self._centers[ids]
+            axis = np.argmax(centers.max(0) - centers.min(0))
+            middle = (end - start) // 2
+            self.order[start:end] = ids[np.argpartition(centers[:, axis],
+                                                        middle)]
+            self._build(start, start + middle)
+            self._nodes[node][2] = self._build(start + middle, end)
+        return node
+
+    def query(self, boxes, distance=0.):
+        """Get the pairs of (query box, box of the tree) within distance.
+
+        boxes is a (q, 6) array of query boxes (or a single box). All the
+        queries traverse the tree together, level by level, with vectorised
+        box tests. Returns two arrays (ids of the query boxes, ids of the
+        tree boxes), sorted by query.
+        """
+        boxes = np.asarray(boxes, float).reshape(-1, 6)
+        query_ids = np.arange(len(boxes))
+        nodes = np.zeros(len(boxes), np.int64)
+        if not len(self.node_boxes):
+            query_ids = nodes = query_ids[:0]
+        found_queries = [query_ids[:0]]
+        found_ids = [nodes[:0]]
+        while len(nodes):
+            near = get_box_distances(self.node_boxes[nodes],
+                                     boxes[query_ids]) <= distance
+            query_ids = query_ids[near]
+            nodes = nodes[near]
+            is_leaf = self.rights[nodes] < 0
+            # Each leaf gives all its boxes as candidates.
+            leaves = nodes[is_leaf]
+            counts = self.ends[leaves] - self.starts[leaves]
+            offsets = np.repeat(self.starts[leaves] - np.cumsum(counts)
+                                + counts, counts)
+            found_queries.append(np.repeat(query_ids[is_leaf], counts))
+            found_ids.append(self.order[np.arange(counts.sum()) + offsets])
+            # The other nodes are replaced by their children.
+            inner = nodes[~is_leaf]
+            query_ids = np.tile(query_ids[~is_leaf], 2)
+            nodes = np.concatenate((inner + 1, self.rights[inner]))
+        query_ids = np.concatenate(found_queries)
+        ids = np.concatenate(found_ids)
+        near = get_box_distances(self.boxes[ids],
+                                 boxes[query_ids]) <= distance
+        query_ids = query_ids[near]
+        ids = ids[near]
+        order = np.argsort(query_ids, kind='stable')
+        return query_ids[order], ids[order]
+
+    def iter_nearest(self, box, max_distance=np.inf):
+        """Yield (box distance, id) of the boxes of the tree, by increasing
+        distance to box, up to max_distance.
+
+        The tree is explored best-first, so only the nodes closer than the
+        last box yielded are opened.
+        """
+        if not len(self.node_boxes):
+            return
+        box = np.asarray(box, float)
+        heap = [(float(get_box_distances(self.node_boxes[0], box)), 1, 0)]
+        while heap:
+            box_distance, is_node, i = heapq.heappop(heap)
+            if box_distance > max_distance:
+                return
+            if not is_node:
+                yield box_distance, i
+            elif self.rights[i] < 0:
+                ids = self.order[self.starts[i]:self.ends[i]]
+                distances = get_box_distances(self.boxes[ids], box)
+                # Boxes come before nodes at the same distance.
+                for item in zip(distances.tolist(), repeat(0), ids.tolist()):
+                    heapq.heappush(heap, item)
+            else:
+                children = [i + 1, self.rights[i]]
+                distances = get_box_distances(self.node_boxes[children], box)
+                for distance, child in zip(distances.tolist(), children):
+                    heapq.heappush(heap, (distance, 1, int(child)))
+
+
+class ShapeTree:
+    """BoxTree over OCC shapes, whose queries return exact distances.
+
+    The bounding boxes of the shapes prune the candidates of each query, and
+    the exact distances (BRepExtrema_DistShapeShape) are only computed for
+    the remaining ones. Pass a CornerStats as stats to count these calls.
+    """
+
+    def __init__(self, shapes, leaf_size=LEAF_SIZE, stats=NULL_STATS):
+        self.shapes = list(shapes)
+        self.tree = BoxTree(get_bounding_boxes(self.shapes), leaf_size)
+        self.stats = stats
+
+    def _extrema(self, shape, i):
+        return self.stats.call(BRepExtrema_DistShapeShape, shape,
+                               self.shapes[i])
+
+    def near(self, shape, distance):
+        """Get the shapes within distance of a shape (e.g. a face, or a solid
+        box for a region), as a list of (id, distance)."""
+        _, ids = self.tree.query(get_bounding_box(shape), distance)
+        result = []
+        for i in ids.tolist():
+            shape_distance = self._extrema(shape, i).Value()
+            if shape_distance <= distance:
+                result.append((i, shape_distance))
+        return result
+
+    def pairs(self, distance):
+        """Get the pairs of shapes within distance of one another, as a list
+        of (id, id, distance), the first id being the smallest."""
+        query_ids, ids = self.tree.query(self.tree.boxes, distance)
+        result = []
+        for i, j in zip(query_ids.tolist(), ids.tolist()):
+            if i >= j:
+                continue
+            shape_distance = self._extrema(self.shapes[i], j).Value()
+            if shape_distance <= distance:
+                result.append((i, j, shape_distance))
+        return result
+
+    def nearest(self, shape, exclude=(), max_distance=np.inf, accept=None):
+        """Get (id, distance) of the nearest shape to this one, ignoring the
+        ids in exclude, or (-1, inf) if none is within max_distance.
+
+        If accept is given, it is called with the id and the
+        BRepExtrema_DistShapeShape of each candidate, and the candidates it
+        rejects are ignored as well. The candidates are visited by
+        increasing box distance, and the search stops when a box is further
+        than the nearest shape found.
+        """
+        best = (-1, np.inf)
+        for box_distance, i in self.tree.iter_nearest(
+                get_bounding_box(shape), max_distance):
+            if box_distance >= best[1]:
+                break
+            if i in exclude:
+                continue
+            extrema = self._extrema(shape, i)
+            shape_distance = extrema.Value()
+            if (shape_distance < best[1] and shape_distance <= max_distance
+                    and (accept is None or accept(i, extrema))):
+                best = (i, shape_distance)
+        return best
+
+
+def is_facing(extrema, face):
+    """Tell whether a face is turned towards the first shape of extrema (a
+    BRepExtrema_DistShapeShape whose second shape is the face), i.e. if its
+    outwards normal at its nearest point points towards the shape.
+
+    Shapes in contact with the face are considered facing it.
+    """
+    if extrema.Value() < CONTACT_TOLERANCE:
+        return True
+    point = extrema.PointOnShape2(1)
+    uv = ShapeAnalysis_Surface(BRep_Tool_Surface(face)).ValueOfUV(
+        point, CONTACT_TOLERANCE)
+    props = BRepLProp_SLProps(BRepAdaptor_Surface(face), uv.X(), uv.Y(), 1,
+                              CONTACT_TOLERANCE)
+    if not props.IsNormalDefined():
+        return True
+    normal = gp_Vec(props.Normal())
+    if face.Orientation() == TopAbs_REVERSED:
+        normal.Reverse()
+    return normal.Dot(gp_Vec(point, extrema.PointOnShape1(1))) > 0.
+
+
+def get_touching_face_ids(index, shape, vertex_faces):
+    """Get the ids of the faces of a ModelIndex that share a vertex with a
+    shape. vertex_faces maps the vertices of the model to their faces."""
+    face_ids = set()
+    explorer = TopExp_Explorer(shape, TopAbs_VERTEX)
+    while explorer.More():
+        vertex_id = vertex_faces.FindIndex(explorer.Current())
+        if vertex_id > 0:
+            it = TopTools_ListIteratorOfListOfShape(
+                vertex_faces.FindFromIndex(vertex_id))
+            while it.More():
+                face_ids.add(index.face_index(it.Value()))
+                it.Next()
+        explorer.Next()
+    return face_ids
+
+
+def get_corner_clearances(index, corners, face_tree=None,
+                          max_distance=np.inf, stats=NULL_STATS):
+    """Get the clearance of each corner of a model, for tool access.
+
+    The clearance of a corner (edge or face of the ModelIndex) is the
+    distance across the air to the nearest face of the model, i.e. to the
+    nearest face that does not touch it (share a vertex with it) and is
+    turned towards it (see is_facing). A tool of radius r can only reach a
+    corner if its clearance is at least 2r. Returns an array of clearances,
+    inf where no face is within max_distance. A ShapeTree of the faces of
+    the model can be given to share it between calls. The faces are found
+    with the tree, so the cost grows with the number of corners, not with
+    the number of corners times the number of faces.
+    """
+    if face_tree is None:
+        face_tree = ShapeTree(index.faces(), stats=stats)
+    vertex_faces = TopTools_IndexedDataMapOfShapeListOfShape()
+    topexp_MapShapesAndAncestors(index.model, TopAbs_VERTEX, TopAbs_FACE,
+                                 vertex_faces)
+    clearances = np.full(len(corners), np.inf)
+    for i, corner in enumerate(corners):
+        touching = get_touching_face_ids(index, corner, vertex_faces)
+        _, clearances[i] = face_tree.nearest(
+            corner, touching, max_distance,
+            lambda face_id, extrema: is_facing(extrema,
+                                               face_tree.shapes[face_id]))
+    return clearances
@@ -0,0 +1,117 @@
+from math import ceil
+from math import sqrt
+
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.BRep import BRep_Tool_Pnt
+from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut
+from OCC.Core.BRepFilletAPI import BRepFilletAPI_MakeFillet
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder
+from OCC.Core.gp import gp_Ax2
+from OCC.Core.gp import gp_Dir
+from OCC.Core.gp import gp_Pnt
+from OCC.Core.TopoDS import TopoDS_Compound
+from OCC.Extend.TopologyUtils import TopologyExplorer
+
+# Fillet radii used by make_mixed_plate, in turn. Some of them are above the
+# MAX_FILLET_RADIUS of corner_finder, so that not all fillets are corners.
+FILLET_RADII = (.5, 1., 2., 3.5, 6.)
+# Approximate number of faces per feature of make_mixed_plate: a pocket has 5
+# faces, a filleted pocket 9 and a blind hole 2
+FACES_PER_FEATURE = 16 / 3
+
+
+def make_compound(shapes):
+    """Gather these shapes in a TopoDS_Compound."""
+    compound = TopoDS_Compound()
+    builder = BRep_Builder()
+    builder.MakeCompound(compound)
+    for shape in shapes:
+        builder.Add(compound, shape)
+    return compound
+
+
+def get_grid_layout(n_items, spacing):
+    """Get the size of a square grid of n_items cells, and their corners."""
+    n_cols = max(1, ceil(sqrt(n_items)))
+    n_rows = max(1, ceil(n_items / n_cols))
+    corners = [(col*spacing, row*spacing)
+               for row, col in (divmod(i, n_cols) for i in range(n_items))]
+    return (n_cols*spacing, n_rows*spacing), corners
+
+
+def make_rounded_box(corner, dx, dy, dz, radius):
+    """Make a box whose vertical edges are filleted with this radius."""
+    box = BRepPrimAPI_MakeBox(corner, dx, dy, dz).Shape()
+    fillet = BRepFilletAPI_MakeFillet(box)
+    box_explorer = TopologyExplorer(box)
+    for edge in box_explorer.edges():
+        p1, p2 = (BRep_Tool_Pnt(v)
+                  for v in box_explorer.vertices_from_edge(edge))
+        if abs(p1.X() - p2.X()) < 1e-9 and abs(p1.Y() - p2.Y()) < 1e-9:
+            fillet.Add(radius, edge)
+    return fillet.Shape()
+
+
+def make_pocketed_plate(n_pockets, pocket_size=4., spacing=8., depth=2.,
+                        thickness=5.):
+    """Make a plate with n_pockets square pockets cut into its top face.
+
+    The pockets are laid out on a square grid. Each pocket has 5 faces and 8
+    internal edge corners (4 vertical, 4 at the bottom).
+    """
+    (width, length), corners = get_grid_layout(n_pockets, spacing)
+    margin = spacing - pocket_size
+    plate = BRepPrimAPI_MakeBox(width + margin, length + margin,
+                                thickness).Shape()
+    if n_pockets == 0:
+        return plate
+    tools = []
+    for x, y in corners:
+        corner = gp_Pnt(margin + x, margin + y, thickness - depth)
+        # Make the tool stick out of the plate to avoid coplanar faces.
+        tools.append(BRepPrimAPI_MakeBox(corner, pocket_size, pocket_size,
+                                         depth + 1.).Shape())
+    return BRepAlgoAPI_Cut(plate, make_compound(tools)).Shape()
+
+
+def make_mixed_plate(n_features, pocket_size=14., spacing=20., depth=4.,
+                     thickness=8., deeper=()):
+    """Make a plate with n_features features cut into its top face.
+
+    The features cycle through square pockets (plane faces, edge corners),
+    filleted pockets (cylinder faces, fillet corners with the radii of
+    FILLET_RADII in turn) and blind holes (cylinder and plane faces). The
+    features whose indices are in deeper are cut 1 deeper, to make revisions
+    of a plate that differ by a few features.
+    """
+    (width, length), corners = get_grid_layout(n_features, spacing)
+    margin = spacing - pocket_size
+    plate = BRepPrimAPI_MakeBox(width + margin, length + margin,
+                                thickness).Shape()
+    if n_features == 0:
+        return plate
+    tools = []
+    for i, (x, y) in enumerate(corners):
+        feature_depth = depth + 1. if i in deeper else depth
+        corner = gp_Pnt(margin + x, margin + y, thickness - feature_depth)
+        if i % 3 == 0:
+            tool = BRepPrimAPI_MakeBox(corner, pocket_size, pocket_size,
+                                       feature_depth + 1.).Shape()
+        elif i % 3 == 1:
+            radius = FILLET_RADII[(i // 3) % len(FILLET_RADII)]
+            tool = make_rounded_box(corner, pocket_size, pocket_size,
+                                    feature_depth + 1., radius)
+        else:
+            center = gp_Pnt(corner.X() + pocket_size/2,
+                            corner.Y() + pocket_size/2, corner.Z())
+            tool = BRepPrimAPI_MakeCylinder(gp_Ax2(center, gp_Dir(0, 0, 1)),
+                                            pocket_size/3,
+                                            feature_depth + 1.).Shape()
+        tools.append(tool)
+    return BRepAlgoAPI_Cut(plate, make_compound(tools)).Shape()
+
+
+def make_part_with_faces(n_faces):
+    """Make a mixed plate with approximately n_faces faces."""
+    return make_mixed_plate(max(1, round(n_faces / FACES_PER_FEATURE)))
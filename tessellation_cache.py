@@ -0,0 +1,87 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import OCC
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Copy
+from OCC.Core.BRepTools import breptools_Write
+
+from disk_cache import DEFAULT_MAX_BYTES
+from disk_cache import DiskCache
+from disk_cache import hash_file
+from meshing import compute_mesh
+from meshing import read_arrays
+from meshing import write_arrays
+
+# Version of the cached meshes. Increment it whenever compute_mesh changes
+# the arrays it returns, to invalidate the meshes cached by previous versions.
+MESH_CACHE_VERSION = 1
+
+
+def hash_shape(shape):
+    """Get a hash of the geometry and topology of a shape.
+
+    The hash is computed on the BRep serialisation of the shape, so it is
+    stable across sessions, unlike the hash of the TopoDS_Shape object. The
+    shape is copied without its triangulations first, so that the hash does
+    not depend on whether the shape has been meshed already.
+    """
+    copy = BRepBuilderAPI_Copy(shape, True, False).Shape()
+    with TemporaryDirectory() as tmpdirname:
+        brep_path = str(Path(tmpdirname) / "shape.brep")
+        breptools_Write(copy, brep_path)
+        return hash_file(brep_path)
+
+
+class TessellationCache(DiskCache):
+    """On-disk cache of tessellated shapes (see meshing.compute_mesh).
+
+    Meshes are keyed by a hash of the shape (see hash_shape) and the
+    tessellation parameters. They are stored with write_arrays, and loaded as
+    memory maps, so only the parts actually used are read from disk. The
+    cache is invalidated when MESH_CACHE_VERSION or the version of pythonOCC
+    changes, since both affect the meshes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        version = "%d-occ%s" % (MESH_CACHE_VERSION, OCC.VERSION)
+        super().__init__(directory, 'meshes', version, max_bytes, '.mesh')
+
+    @staticmethod
+    def key(shape_hash, export_edges, mesh_quality):
+        return "%s-e%d-q%s" % (shape_hash, export_edges, float(mesh_quality))
+
+    def load(self, key):
+        """Get the cached mesh with this key, or None if missing."""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return read_arrays(path)
+        except (OSError, ValueError):
+            self.discard(key)
+            return None
+
+    def store(self, key, mesh):
+        """Add a mesh to the cache."""
+        self.put(key, lambda path: write_arrays(path, mesh))
+
+
+def compute_mesh_cached(shape, cache, export_edges=False, mesh_quality=1.,
+                        geometry_hash=None):
+    """Get the mesh of a shape (see compute_mesh), using this cache.
+
+    geometry_hash is the hash_shape of the shape. Hashing serialises the
+    whole shape, so pass it when meshing a shape several times (e.g. at
+    several qualities); it is computed if None. If the cache is None, the
+    mesh is always computed.
+    """
+    if cache is None:
+        return compute_mesh(shape, export_edges, mesh_quality)
+    if geometry_hash is None:
+        geometry_hash = hash_shape(shape)
+    key = cache.key(geometry_hash, export_edges, mesh_quality)
+    mesh = cache.load(key)
+    if mesh is None:
+        mesh = compute_mesh(shape, export_edges, mesh_quality)
+        cache.store(key, mesh)
+    return mesh
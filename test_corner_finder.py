@@ -1,8 +1,50 @@
+import dataclasses
 import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
-from corner_finder import (find_internal_edge_corners,
-                           find_internal_fillet_corners)
+import numpy as np
+
+from OCC.Core.gp import gp_Trsf
+from OCC.Core.gp import gp_Vec
+from OCC.Core.GeomAbs import GeomAbs_Circle
+from OCC.Core.TopAbs import TopAbs_FORWARD
+from OCC.Core.TopAbs import TopAbs_REVERSED
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Extend.DataExchange import write_stl_file
+
+from corner_finder import (CONCAVE,
+                           CONVEX,
+                           EDGE_CORNERS,
+                           FILLET_CORNERS,
+                           UNDECIDED,
+                           CornerStats,
+                           CornerThresholds,
+                           FeatureTable,
+                           ModelIndex,
+                           classify_edge_samples,
+                           extract_features,
+                           find_instanced_corners,
+                           find_internal_corners,
+                           find_internal_edge_corners,
+                           find_internal_fillet_corners,
+                           get_edge_corner_ids,
+                           get_fillet_corner_ids,
+                           internality_counts,
+                           iter_internal_corners)
 from importers import import_file
+from instances import get_instances
+from mesh_corners import find_internal_corners_from_mesh
+from mesh_corners import find_mesh_corners
+from mesh_corners import read_stl_mesh
+from result_cache import CornerResultCache
+from result_cache import FeatureTableCache
+from result_cache import extract_features_cached
+from result_cache import find_internal_corners_cached
+from revisions import Revision
+from synthetic_models import make_compound
+from synthetic_models import make_mixed_plate
+from synthetic_models import make_pocketed_plate
 
 
 class TestCornerFinder(unittest.TestCase):
@@ -15,7 +57,32 @@ class TestCornerFinder(unittest.TestCase):
     def test_plane2cylinder_edge_corner(self):
         model = import_file("assets/simple-with-cyl.step")
         edges = find_internal_edge_corners(model)
-        self.assertEqual(len(edges), 4)
+        # 4 straight edges, and the circle at the foot of the cylinder.
+        self.assertEqual(len(edges), 5)
+
+    def test_curved_edge_corners(self):
+        # The floors of the filleted pocket (4 arcs) and of the blind hole (a
+        # circle) are internal; their rims are external.
+        model = make_mixed_plate(3)
+        index = ModelIndex(model)
+        table = FeatureTable(index)
+        circle_ids = np.flatnonzero(table.edge_curve_type == GeomAbs_Circle)
+        corner_ids = table.edge_corner_ids()
+        self.assertEqual(len(np.intersect1d(circle_ids, corner_ids)), 5)
+        self.assertEqual(
+            np.count_nonzero(table.edge_convexity[circle_ids] == CONVEX), 5)
+        self.assertEqual(len(table.mixed_edge_ids()), 0)
+        self.assertEqual(len(find_internal_edge_corners(model, index)),
+                         len(corner_ids))
+        # Samples of an edge along x, between a face of normal z and a face
+        # whose normal flips from y to -y, then a degenerate sample.
+        tangents = np.array([[1., 0., 0.]] * 3)
+        tangents[2] = np.nan
+        normals = np.array([[[0., 0., 1.]] * 3,
+                            [[0., 1., 0.], [0., -1., 0.], [0., 1., 0.]]])
+        convexities = classify_edge_samples(
+            tangents, normals, (TopAbs_FORWARD, TopAbs_REVERSED))
+        self.assertEqual(convexities.tolist(), [CONCAVE, CONVEX, UNDECIDED])
 
     def test_plane2plane_fillet_corner(self):
         model = import_file("assets/simple-rad1int1ext.step")
@@ -27,6 +94,225 @@ class TestCornerFinder(unittest.TestCase):
         fillets = find_internal_fillet_corners(model)
         self.assertEqual(len(fillets), 1)
 
+    def test_shared_model_index(self):
+        model = import_file("assets/simple-rad1int1ext.step")
+        index = ModelIndex(model)
+        edges = find_internal_edge_corners(model, index)
+        fillets = find_internal_fillet_corners(model, index)
+        self.assertEqual(len(edges), len(find_internal_edge_corners(model)))
+        self.assertEqual(len(fillets), 1)
+
+    def test_analytic_internality_check(self):
+        model = import_file("assets/simple-rad0.step")
+        internality_counts.clear()
+        edges = find_internal_edge_corners(model)
+        self.assertEqual(len(edges), 3)
+        self.assertGreater(internality_counts["analytic"], 0)
+        self.assertEqual(internality_counts["fallback"], 0)
+
+    def test_parallel_matches_serial(self):
+        model = import_file("assets/simple-with-cyl.step")
+        index = ModelIndex(model)
+        serial = find_internal_edge_corners(model, index)
+        parallel = find_internal_edge_corners(model, index, workers=2)
+        self.assertEqual(len(parallel), len(serial))
+        for edge, serial_edge in zip(parallel, serial):
+            self.assertTrue(edge.IsSame(serial_edge))
+
+    def test_thresholds(self):
+        model = import_file("assets/simple-rad1and5.step")
+        thresholds = CornerThresholds(max_fillet_radius=6.)
+        fillets = find_internal_fillet_corners(model, thresholds=thresholds)
+        self.assertEqual(len(fillets), 2)
+
+    def test_result_cache(self):
+        model = import_file("assets/simple-rad1and5.step")
+        index = ModelIndex(model)
+        with TemporaryDirectory() as cache_dir:
+            cache = CornerResultCache(cache_dir)
+            thresholds = CornerThresholds()
+            edges, fillets = find_internal_corners_cached(
+                model, index, "model", cache, thresholds)
+            cached_edges, cached_fillets = find_internal_corners_cached(
+                model, index, "model", cache, thresholds)
+            self.assertEqual(cache.hits, 1)
+            self.assertEqual(len(cached_edges), len(edges))
+            self.assertTrue(cached_fillets[0].IsSame(fillets[0]))
+            # Other thresholds are not in the cache.
+            thresholds = dataclasses.replace(thresholds, min_angle_degrees=1.)
+            find_internal_corners_cached(model, index, "model", cache,
+                                         thresholds)
+            self.assertEqual(cache.misses, 2)
+            # A truncated entry is a miss, and is computed again.
+            cache.path(cache.key("model", thresholds)).write_text('{"edge')
+            self.assertIsNone(cache.load("model", thresholds, index))
+            self.assertEqual(cache.misses, 3)
+
+    def test_combined_finder(self):
+        for path in ["assets/simple-rad0.step",
+                     "assets/simple-rad1and5.step",
+                     "assets/simple-rad1int1ext.step",
+                     "assets/simple-with-cyl.step"]:
+            model = import_file(path)
+            index = ModelIndex(model)
+            edges, fillets = find_internal_corners(model, index)
+            self.assertEqual(
+                [index.edge_index(e) for e in edges],
+                [index.edge_index(e)
+                 for e in find_internal_edge_corners(model, index)])
+            self.assertEqual(
+                [index.face_index(f) for f in fillets],
+                [index.face_index(f)
+                 for f in find_internal_fillet_corners(model, index)])
+
+    def test_corner_stats(self):
+        model = import_file("assets/simple-rad1and5.step")
+        index = ModelIndex(model)
+        stats = CornerStats()
+        fillets = find_internal_fillet_corners(model, index, stats=stats)
+        edges = find_internal_edge_corners(model, index, stats=stats)
+        # Every candidate is either accepted or rejected by a single check.
+        for kind, corners, candidates in [
+                (FILLET_CORNERS, fillets, index.faces()),
+                (EDGE_CORNERS, edges, index.edges())]:
+            self.assertEqual(stats.candidates[kind], len(candidates))
+            self.assertEqual(stats.corners[kind], len(corners))
+            self.assertEqual(
+                sum(stats.rejections[kind].values()),
+                len(candidates) - len(corners))
+        # The fillet of radius 5 is rejected by the radius check.
+        self.assertEqual(stats.rejections[FILLET_CORNERS]['radius'], 1)
+        # The combined finder records the same checks.
+        combined_stats = CornerStats()
+        find_internal_corners(model, index, stats=combined_stats)
+        self.assertEqual(combined_stats.corners, stats.corners)
+        self.assertEqual(combined_stats.rejections, stats.rejections)
+
+    def test_streaming_finder(self):
+        paths = ["assets/simple-rad0.step", "assets/simple-rad1int1ext.step"]
+        models = [import_file(path) for path in paths]
+        results = list(iter_internal_corners(make_compound(models)))
+        self.assertEqual(len(results), len(models))
+        for i, (number, _, edges, fillets) in enumerate(results):
+            self.assertEqual(number, i)
+            expected_edges, expected_fillets = find_internal_corners(
+                models[i])
+            self.assertEqual(len(edges), len(expected_edges))
+            for edge, expected_edge in zip(edges, expected_edges):
+                self.assertTrue(edge.IsSame(expected_edge))
+            self.assertEqual(len(fillets), len(expected_fillets))
+
+    def test_instanced_finder(self):
+        model = import_file("assets/simple-rad1int1ext.step")
+        parts = []
+        for x in [0., 1000., 2000.]:
+            trsf = gp_Trsf()
+            trsf.SetTranslation(gp_Vec(x, 0., 0.))
+            parts.append(model.Moved(TopLoc_Location(trsf)))
+        assembly = make_compound(parts)
+        (prototype, locations), = get_instances(assembly)
+        self.assertEqual(len(locations), len(parts))
+        # The corners of the part are moved to each instance.
+        index = ModelIndex(assembly)
+        edges, fillets = find_instanced_corners(assembly)
+        expected_edges, expected_fillets = find_internal_corners(assembly,
+                                                                 index)
+        self.assertEqual(sorted(index.edge_index(e) for e in edges),
+                         sorted(index.edge_index(e) for e in expected_edges))
+        self.assertEqual(sorted(index.face_index(f) for f in fillets),
+                         sorted(index.face_index(f)
+                                for f in expected_fillets))
+        self.assertEqual(len(fillets), len(parts))
+
+    def test_feature_table_query(self):
+        model = import_file("assets/simple-rad1and5.step")
+        index = ModelIndex(model)
+        table = extract_features(model, index)
+        for radius, angle in [(5., 5.), (6., 5.), (1., 100.)]:
+            thresholds = CornerThresholds(max_fillet_radius=radius,
+                                          min_angle_degrees=angle)
+            edges, fillets = find_internal_corners(model, index, thresholds)
+            self.assertEqual(list(table.edge_corner_ids(thresholds)),
+                             [index.edge_index(e) for e in edges])
+            self.assertEqual(list(table.fillet_corner_ids(thresholds)),
+                             [index.face_index(f) for f in fillets])
+        self.assertEqual(len(table.fillet_corner_ids(
+            CornerThresholds(max_fillet_radius=6.))), 2)
+        # An incomplete table only covers stricter thresholds.
+        table = FeatureTable(index)
+        with self.assertRaises(ValueError):
+            table.fillet_corner_ids(CornerThresholds(max_fillet_radius=6.))
+        # The cached arrays give the same results.
+        with TemporaryDirectory() as cache_dir:
+            cache = FeatureTableCache(cache_dir)
+            extract_features_cached(model, index, "model", cache)
+            features = extract_features_cached(model, index, "model", cache)
+            self.assertEqual(cache.hits, 1)
+            thresholds = CornerThresholds(max_fillet_radius=6.)
+            self.assertEqual(len(get_fillet_corner_ids(features, thresholds)),
+                             2)
+            self.assertEqual(list(get_edge_corner_ids(features)),
+                             list(table.edge_corner_ids()))
+
+    def test_incremental_revision(self):
+        previous = Revision(make_mixed_plate(6))
+        model = make_mixed_plate(6, deeper=(0,))
+        revision = Revision(model, previous)
+        # Only the neighbourhood of the deepened pocket is re-evaluated, and
+        # the corners are those of a full analysis.
+        n_edges, n_faces = revision.n_computed()
+        self.assertLess(n_edges, len(revision.index.edges()) / 2)
+        self.assertLess(n_faces, len(revision.index.faces()) / 2)
+        index = revision.index
+        edges, fillets = find_internal_corners(model, index)
+        revision_edges, revision_fillets = revision.corners()
+        self.assertEqual([index.edge_index(e) for e in revision_edges],
+                         [index.edge_index(e) for e in edges])
+        self.assertEqual([index.face_index(f) for f in revision_fillets],
+                         [index.face_index(f) for f in fillets])
+        # The 8 edge corners of the pocket changed, the others did not.
+        changes = revision.diff(previous)
+        self.assertEqual(len(changes.added_edges), 8)
+        self.assertEqual(len(changes.removed_edges), 8)
+        self.assertEqual(changes.n_kept_edges, len(edges) - 8)
+        self.assertEqual(changes.added_fillets, [])
+        self.assertEqual(changes.removed_fillets, [])
+        # An unchanged model is not re-evaluated at all.
+        self.assertEqual(Revision(model, revision).n_computed(), (0, 0))
+
+
+class TestMeshCorners(unittest.TestCase):
+
+    def test_agreement_with_brep_finder(self):
+        model = import_file("assets/simple-rad0.step")
+        index = ModelIndex(model)
+        edges, _ = find_internal_corners_from_mesh(model, index)
+        expected_edges, _ = find_internal_corners(model, index)
+        self.assertEqual([index.edge_index(e) for e in edges],
+                         [index.edge_index(e) for e in expected_edges])
+        model = import_file("assets/simple-rad1int1ext.step")
+        index = ModelIndex(model)
+        _, fillets = find_internal_corners_from_mesh(model, index)
+        _, expected_fillets = find_internal_corners(model, index)
+        self.assertEqual([index.face_index(f) for f in fillets],
+                         [index.face_index(f) for f in expected_fillets])
+
+    def test_stl_file(self):
+        n_pockets = 4
+        model = make_pocketed_plate(n_pockets, pocket_size=4., depth=2.)
+        with TemporaryDirectory() as tmpdirname:
+            for mode in ["binary", "ascii"]:
+                path = str(Path(tmpdirname) / ("model-%s.stl" % mode))
+                write_stl_file(model, path, mode)
+                positions, triangles = read_stl_mesh(path)
+                corners = find_mesh_corners(positions, triangles)
+                ends = positions[corners.edge_vertices].astype(float)
+                length = np.linalg.norm(ends[:, 1] - ends[:, 0], axis=1).sum()
+                # 4 vertical edges of length 2 and 4 bottom edges of length
+                # 4 per pocket.
+                self.assertAlmostEqual(length, n_pockets * 24., places=3)
+                self.assertEqual(len(corners.fillet_radii), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,89 @@
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import Request
+from urllib.request import urlopen
+
+from corner_finder import CornerThresholds
+from corner_service import CornerService
+from corner_service import make_server
+
+
+class TestCornerService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = CornerService(workers=2)
+        cls.server = make_server(cls.service, port=0)
+        cls.url = "http://localhost:%d" % cls.server.server_address[1]
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def post_file(self, path, query):
+        with open(path, 'rb') as f:
+            request = Request(self.url + "/corners?" + query, f.read())
+        with urlopen(request) as response:
+            return json.load(response)
+
+    def get_metrics(self):
+        with urlopen(self.url + "/metrics") as response:
+            return json.load(response)
+
+    def test_concurrent_requests(self):
+        path = "assets/simple-rad1and5.step"
+        query = "ext=step"
+        computations = self.get_metrics()['computations'].get('corners', 0)
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lambda _: self.post_file(path, query),
+                                    range(4)))
+        self.assertEqual(results[0]['n_fillet_corners'], 1)
+        for result in results[1:]:
+            self.assertEqual(result['fillet_corners'],
+                             results[0]['fillet_corners'])
+        # The file was analysed once: the other requests either waited for
+        # that computation or got its result from the LRU.
+        metrics = self.get_metrics()
+        self.assertEqual(metrics['computations']['corners'],
+                         computations + 1)
+        # Other thresholds give another result.
+        result = self.post_file(path, "ext=step&max_fillet_radius=6")
+        self.assertEqual(result['n_fillet_corners'], 2)
+        self.assertEqual(self.get_metrics()['computations']['corners'],
+                         computations + 2)
+
+    def test_scene(self):
+        result = self.post_file("assets/simple-rad0.step", "ext=step")
+        with urlopen(self.url + result['scene']) as response:
+            self.assertIn(b"three.min.js", response.read())
+        with self.assertRaises(HTTPError) as context:
+            urlopen(self.url + "/scene/unknown/")
+        self.assertEqual(context.exception.code, 404)
+
+    def test_upload_eviction(self):
+        # Uploads are deleted with the last result that uses them.
+        service = CornerService(workers=1, max_results=1)
+        try:
+            for path in ["assets/simple-rad0.step",
+                         "assets/simple-rad1and5.step"]:
+                with open(path, 'rb') as f:
+                    service.corners(f.read(), 'step', CornerThresholds())
+                self.assertEqual(
+                    len(list(service.uploads_directory.iterdir())), 1)
+        finally:
+            service.close()
+
+    def test_unsupported_extension(self):
+        with self.assertRaises(HTTPError) as context:
+            self.post_file("assets/simple-rad0.step", "ext=xyz")
+        self.assertEqual(context.exception.code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+import unittest
+from tempfile import TemporaryDirectory
+
+from corner_finder import ModelIndex
+from corner_finder import find_internal_fillet_corners
+from importers import ShapeCache
+from importers import import_file
+from importers import read_dxf_file_via_step
+
+
+class TestShapeCache(unittest.TestCase):
+
+    def test_cached_import(self):
+        with TemporaryDirectory() as cache_dir:
+            cache = ShapeCache(cache_dir)
+            model = import_file("assets/simple-rad1int1ext.step", cache)
+            cached_model = import_file("assets/simple-rad1int1ext.step", cache)
+            self.assertEqual(cache.stats()['misses'], 1)
+            self.assertEqual(cache.stats()['hits'], 1)
+            self.assertEqual(len(find_internal_fillet_corners(model)),
+                             len(find_internal_fillet_corners(cached_model)))
+
+    def test_cache_eviction(self):
+        with TemporaryDirectory() as cache_dir:
+            cache = ShapeCache(cache_dir, max_bytes=1)
+            import_file("assets/simple-rad0.step", cache)
+            self.assertEqual(cache.evictions, 1)
+            import_file("assets/simple-rad0.step", cache)
+            self.assertEqual(cache.stats()['misses'], 2)
+
+
+class TestImporterRegistry(unittest.TestCase):
+
+    def test_lazy_dependencies(self):
+        # Importing a STEP file must not load the DXF dependencies.
+        code = ("import sys; import importers; "
+                "importers.import_file('assets/simple-rad0.step'); "
+                "sys.exit('cadquery' in sys.modules)")
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+
+class TestDxfImport(unittest.TestCase):
+
+    def test_same_as_step_round_trip(self):
+        path = "assets/valve-exhaust-flange-2D.dxf"
+        index = ModelIndex(import_file(path))
+        step_index = ModelIndex(read_dxf_file_via_step(path))
+        self.assertEqual(len(index.faces()), len(step_index.faces()))
+        self.assertEqual(len(index.edges()), len(step_index.edges()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from importers import import_file
+from tessellation_cache import TessellationCache
+from tessellation_cache import compute_mesh_cached
+from tessellation_cache import hash_shape
+
+
+class TestTessellationCache(unittest.TestCase):
+
+    def test_cached_mesh(self):
+        model = import_file("assets/simple-rad1int1ext.step")
+        with TemporaryDirectory() as cache_dir:
+            cache = TessellationCache(cache_dir)
+            mesh = compute_mesh_cached(model, cache, export_edges=True)
+            cached_mesh = compute_mesh_cached(model, cache, export_edges=True)
+            self.assertEqual(cache.stats()['misses'], 1)
+            self.assertEqual(cache.stats()['hits'], 1)
+            self.assertEqual(mesh.keys(), cached_mesh.keys())
+            for name in mesh:
+                np.testing.assert_array_equal(mesh[name], cached_mesh[name])
+            # Other parameters give another mesh.
+            compute_mesh_cached(model, cache, export_edges=False)
+            self.assertEqual(cache.stats()['misses'], 2)
+            # A precomputed hash gives the same entries.
+            compute_mesh_cached(model, cache, export_edges=False,
+                                geometry_hash=hash_shape(model))
+            self.assertEqual(cache.stats()['hits'], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from threading import Event
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import Request
+from urllib.request import urlopen
+
+from scene_server import SceneServer
+
+
+class TestSceneServer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(cls.directory.name, 'index.html'), 'w') as f:
+            f.write("<html></html>")
+        cls.data = bytes(range(256)) * 64
+        with open(os.path.join(cls.directory.name, 'mesh.bin'), 'wb') as f:
+            f.write(cls.data)
+        events = iter([('shape', {'url': 'mesh.bin'}),
+                       ('lines', {'url': 'lines.bin'})])
+        server = SceneServer(cls.directory.name, lambda: next(events, None))
+        addresses = []
+        ready = Event()
+
+        def on_ready(address):
+            addresses.append(address)
+            ready.set()
+
+        Thread(target=asyncio.run,
+               args=(server.serve(port=0, on_ready=on_ready),),
+               daemon=True).start()
+        ready.wait()
+        cls.url = "http://%s:%d" % addresses[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_events(self):
+        # Each client gets all the events, the past ones first.
+        for _ in range(2):
+            with urlopen(self.url + "/events") as response:
+                lines = response.read().decode().splitlines()
+            names = [line[7:] for line in lines if line.startswith("event: ")]
+            self.assertEqual(names, ['shape', 'lines', 'done'])
+            self.assertEqual(json.loads(lines[1][6:]), {'url': 'mesh.bin'})
+
+    def test_cached_compressed_file(self):
+        request = Request(self.url + "/mesh.bin",
+                          headers={'Accept-Encoding': 'gzip'})
+        with urlopen(request) as response:
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            self.assertEqual(gzip.decompress(response.read()), self.data)
+            etag = response.headers['ETag']
+        request = Request(self.url + "/mesh.bin",
+                          headers={'If-None-Match': etag})
+        with self.assertRaises(HTTPError) as context:
+            urlopen(request)
+        self.assertEqual(context.exception.code, 304)
+        with self.assertRaises(HTTPError) as context:
+            urlopen(self.url + "/missing.bin")
+        self.assertEqual(context.exception.code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from corner_finder import ModelIndex
+from corner_finder import find_internal_corners
+from spatial_index import BoxTree
+from spatial_index import ShapeTree
+from spatial_index import get_box_distances
+from spatial_index import get_corner_clearances
+from synthetic_models import make_pocketed_plate
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def test_box_tree_queries(self):
+        rng = np.random.default_rng(0)
+        corners = rng.uniform(0., 100., (1000, 3))
+        boxes = np.hstack((corners, corners + rng.uniform(0., 3., (1000, 3))))
+        tree = BoxTree(boxes)
+        queries = boxes[:20] + [-1., -1., -1., 1., 1., 1.]
+        distances = get_box_distances(boxes[None], queries[:, None])
+        query_ids, ids = tree.query(queries, 2.)
+        self.assertEqual(set(zip(query_ids.tolist(), ids.tolist())),
+                         set(zip(*np.nonzero(distances <= 2.))))
+        nearest = list(tree.iter_nearest(queries[0], 5.))
+        self.assertEqual([i for _, i in nearest][:1], [0])
+        self.assertEqual(sorted(i for _, i in nearest),
+                         np.flatnonzero(distances[0] <= 5.).tolist())
+        self.assertEqual(len(BoxTree(boxes[:0]).query(queries)[0]), 0)
+
+    def test_corner_clearances(self):
+        # Pockets are 4 wide, so every corner faces a wall 4 away. The bottom
+        # of the plate is closer, but across the material.
+        model = make_pocketed_plate(4)
+        index = ModelIndex(model)
+        edges, _ = find_internal_corners(model, index)
+        clearances = get_corner_clearances(index, edges)
+        self.assertTrue(np.allclose(clearances, 4.))
+        self.assertTrue(np.all(np.isinf(
+            get_corner_clearances(index, edges, max_distance=3.))))
+        # In each pocket, the 4 bottom corners touch each other, and each
+        # vertical corner touches 2 of them.
+        pairs = ShapeTree(edges).pairs(1e-6)
+        self.assertEqual(len(pairs), 4 * 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
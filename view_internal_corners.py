@@ -1,29 +1,116 @@
 import argparse
 
-from corner_finder import find_internal_edge_corners
-from corner_finder import find_internal_fillet_corners
+from corner_finder import CornerThresholds
+from corner_finder import MAX_FILLET_RADIUS
+from corner_finder import MIN_ANGLE_DEGREES
+from corner_finder import ModelIndex
+from corner_finder import get_edge_corner_ids
+from corner_finder import get_fillet_corner_ids
+from disk_cache import hash_file
+from importers import ShapeCache
 from importers import import_file
+from tessellation_cache import TessellationCache
+from result_cache import CornerResultCache
+from result_cache import FeatureTableCache
+from result_cache import extract_features_cached
+from result_cache import find_internal_corners_cached
 from viewer import Viewer
 
+# Colors of the corners found with each threshold of a sweep, from the
+# loosest to the strictest threshold
+SWEEP_COLORS = [(1., 0., 0.), (1., .5, 0.), (1., 1., 0.), (0., .8, 0.),
+                (0., .6, 1.), (.6, 0., 1.)]
+
+
+def get_sweep(shp, index, model_hash, cache_dir, radii, angles):
+    """Find the corners of a model for several radius and angle thresholds.
+
+    The features of the model are extracted once (and cached in cache_dir,
+    if given), then queried for each threshold. Returns two lists of
+    (threshold, color, corners), for the fillet and edge corners, from the
+    loosest to the strictest threshold: the corners of each threshold are
+    also found with the looser ones.
+    """
+    cache = FeatureTableCache(cache_dir) if cache_dir else None
+    features = extract_features_cached(shp, index, model_hash, cache)
+    if cache is not None:
+        print("feature cache:", cache.stats())
+    fillets = []
+    for i, radius in enumerate(sorted(radii, reverse=True)):
+        ids = get_fillet_corner_ids(
+            features, CornerThresholds(max_fillet_radius=radius))
+        color = SWEEP_COLORS[i % len(SWEEP_COLORS)]
+        fillets.append((radius, color, [index.faces()[j] for j in ids]))
+    edges = []
+    for i, angle in enumerate(sorted(angles)):
+        ids = get_edge_corner_ids(
+            features, CornerThresholds(min_angle_degrees=angle))
+        color = SWEEP_COLORS[i % len(SWEEP_COLORS)]
+        edges.append((angle, color, [index.edges()[j] for j in ids]))
+    return fillets, edges
+
 
 def main():
     parser = argparse.ArgumentParser(
         description="Visualise the internal corners of a CAD file."
     )
     parser.add_argument('path', type=str, help="file location")
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help="directory where imported shapes, corners and "
+                             "meshes are cached")
+    parser.add_argument('--max-fillet-radius', type=float, nargs='+',
+                        default=[MAX_FILLET_RADIUS],
+                        help="maximum radius of a fillet corner; with "
+                             "several values, the corners of each are "
+                             "drawn with their own color")
+    parser.add_argument('--min-angle', type=float, nargs='+',
+                        default=[MIN_ANGLE_DEGREES],
+                        help="minimum angle of an edge corner, in degrees; "
+                             "with several values, the corners of each are "
+                             "drawn with their own color")
     args = parser.parse_args()
 
-    shp = import_file(args.path)
-    edges = find_internal_edge_corners(shp)
-    fillets = find_internal_fillet_corners(shp)
+    cache = ShapeCache(args.cache_dir) if args.cache_dir else None
+    shp = import_file(args.path, cache)
+    if cache is not None:
+        print("shape cache:", cache.stats())
+    index = ModelIndex(shp)
+    model_hash = hash_file(args.path) if args.cache_dir else None
+    if len(args.max_fillet_radius) > 1 or len(args.min_angle) > 1:
+        # Sweep: query the features of the model for each threshold.
+        fillet_sweep, edge_sweep = get_sweep(
+            shp, index, model_hash, args.cache_dir, args.max_fillet_radius,
+            args.min_angle)
+        for radius, _, fillets in fillet_sweep:
+            print("max fillet radius %g: %d fillet corners"
+                  % (radius, len(fillets)))
+        for angle, _, edges in edge_sweep:
+            print("min angle %g: %d edge corners" % (angle, len(edges)))
+    else:
+        thresholds = CornerThresholds(
+            max_fillet_radius=args.max_fillet_radius[0],
+            min_angle_degrees=args.min_angle[0])
+        result_cache = (CornerResultCache(args.cache_dir) if args.cache_dir
+                        else None)
+        edges, fillets = find_internal_corners_cached(
+            shp, index, model_hash, result_cache, thresholds)
+        if result_cache is not None:
+            print("corner cache:", result_cache.stats())
+        fillet_sweep = [(None, (1., 0., 0.), fillets)]
+        edge_sweep = [(None, (1., 0., 0.), edges)]
 
-    display = Viewer()
+    mesh_cache = TessellationCache(args.cache_dir) if args.cache_dir else None
+    display = Viewer(cache=mesh_cache)
     display.DisplayShape(shp, export_edges=True, transparency=.3,
                          shininess=0, specular_color=(0, 0, 0))
-    for face in fillets:
-        display.DisplayShape(face, color=(1., 0., 0.))
-    for edge in edges:
-        display.DisplayShape(edge, color=(1., 0., 0.), line_width=5.)
+    if mesh_cache is not None:
+        print("\nmesh cache:", mesh_cache.stats())
+    # The corners are drawn as parts of the mesh of the shape. The corners
+    # of stricter thresholds are highlighted last, over the looser ones.
+    for _, color, fillets in fillet_sweep:
+        display.Highlight(fillets, color=color)
+    for _, color, edges in edge_sweep:
+        display.Highlight(edges, color=color, line_width=5.)
     display.render()
 
 
@@ -1,6 +1,8 @@
 import argparse
 
+from importers import ShapeCache
 from importers import import_file
+from tessellation_cache import TessellationCache
 from viewer import Viewer
 
 
@@ -9,12 +11,29 @@ def main():
         description="Visualise and manipulate CAD files."
     )
     parser.add_argument('path', type=str, help="file location")
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help="directory where imported shapes and meshes "
+                             "are cached")
+    parser.add_argument('--lod-levels', type=int, default=0,
+                        help="number of finer levels of detail computed in "
+                             "the background after a coarse first mesh")
+    parser.add_argument('--stream', action='store_true',
+                        help="serve the page right away, and send each part "
+                             "to it as soon as it is meshed")
     args = parser.parse_args()
 
-    shp = import_file(args.path)
+    cache = ShapeCache(args.cache_dir) if args.cache_dir else None
+    shp = import_file(args.path, cache)
+    if cache is not None:
+        print("shape cache:", cache.stats())
 
-    display = Viewer()
+    mesh_cache = TessellationCache(args.cache_dir) if args.cache_dir else None
+    display = Viewer(cache=mesh_cache, lod_levels=args.lod_levels,
+                     streaming=args.stream)
     display.DisplayShape(shp, export_edges=True)
+    # When streaming, the shapes are meshed by render.
+    if mesh_cache is not None and not args.stream:
+        print("\nmesh cache:", mesh_cache.stats())
     display.render()
 
 
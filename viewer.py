@@ -1,9 +1,20 @@
+import asyncio
+import json
 import uuid
 import os
 import sys
+from multiprocessing import Process
 
+from OCC import VERSION as OCC_VERSION
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.BRepTools import breptools_Read
+from OCC.Core.BRepTools import breptools_Write
+from OCC.Core.TopAbs import TopAbs_EDGE
+from OCC.Core.TopAbs import TopAbs_FACE
 from OCC.Core.Tesselator import ShapeTesselator
+from OCC.Core.TopoDS import TopoDS_Shape
 from OCC.Display.WebGl import threejs_renderer
+from OCC.Display.WebGl.threejs_renderer import color_to_hex
 from OCC.Display.WebGl.threejs_renderer import export_edgedata_to_json
 from OCC.Display.WebGl.threejs_renderer import THREEJS_RELEASE
 from OCC.Extend.TopologyUtils import is_edge
@@ -11,6 +22,27 @@ from OCC.Extend.TopologyUtils import is_wire
 from OCC.Extend.TopologyUtils import discretize_edge
 from OCC.Extend.TopologyUtils import discretize_wire
 
+from instances import get_instances
+from instances import get_location_matrix
+from instances import has_repeated_parts
+from instances import transform_points
+from meshing import get_edge_map
+from meshing import get_face_map
+from meshing import get_line_segments
+from meshing import get_polylines
+from meshing import get_triangle_ranges
+from meshing import polyline_matches_edge
+from meshing import write_line_buffers
+from meshing import write_mesh_buffers
+from scene_server import SceneServer
+from tessellation_cache import TessellationCache
+from tessellation_cache import compute_mesh_cached
+from tessellation_cache import hash_shape
+
+# Ratio of the mesh qualities of consecutive levels of detail (larger mesh
+# qualities give coarser meshes)
+LOD_QUALITY_FACTOR = 4.
+
 
 # The code below is mostly coped from pythonOCC, with changes to improve the
 # display.
@@ -102,7 +134,7 @@ threejs_renderer.BODY_PART2 = """
           event.preventDefault();
           if (event.key=="t") {  // t key
               if (selected_target) {
-                    selected_target.material.visible = !selected_target.material.visible;
+                    base_material(selected_target).visible = !base_material(selected_target).visible;
                 }
           }
           else if (event.key=="g") { // g key, toggle grid visibility
@@ -113,7 +145,7 @@ threejs_renderer.BODY_PART2 = """
           }
           else if (event.key=="w") { // g key, toggle axisHelper visibility
                if (selected_target) {
-                    selected_target.material.wireframe = !selected_target.material.wireframe;
+                    base_material(selected_target).wireframe = !base_material(selected_target).wireframe;
                 }
           }
         }
@@ -123,7 +155,7 @@ threejs_renderer.BODY_PART2 = """
             mouse.y = - ( event.clientY / window.innerHeight ) * 2 + 1;
             // restore previous selected target color
             if (selected_target) {
-                selected_target.material.color.setRGB(selected_target_color_r,
+                base_material(selected_target).color.setRGB(selected_target_color_r,
                     selected_target_color_g,
                     selected_target_color_b);
             }
@@ -132,11 +164,16 @@ threejs_renderer.BODY_PART2 = """
             var intersects = raycaster.intersectObjects(scene.children);
             if (intersects.length > 0) {
                 var target = intersects[0].object;
-                selected_target_color_r = target.material.color.r;
-                selected_target_color_g = target.material.color.g;
-                selected_target_color_b = target.material.color.b;
-                target.material.color.setRGB(1., 0.65, 0.);
+                selected_target_color_r = base_material(target).color.r;
+                selected_target_color_g = base_material(target).color.g;
+                selected_target_color_b = base_material(target).color.b;
+                base_material(target).color.setRGB(1., 0.65, 0.);
                 console.log(target);
+                if (target.userData.edge_offsets) {
+                    // segment i starts at vertex 2*i of the line segments
+                    var segment = Math.floor(intersects[0].index / 2);
+                    console.log("edge", find_edge(target.userData.edge_offsets, segment));
+                }
                 selected_target = target;
             }
         }
@@ -148,8 +185,12 @@ threejs_renderer.BODY_PART2 = """
             // compute center of all objects
             scene.traverse(function(child) {
                 if (child instanceof THREE.Mesh) {
-                    child.geometry.computeBoundingBox();
-                    var box = child.geometry.boundingBox;
+                    // instanced meshes keep the box of all their instances
+                    var box = child.userData.bounding_box;
+                    if (!box) {
+                        child.geometry.computeBoundingBox();
+                        box = child.geometry.boundingBox.clone().applyMatrix4(child.matrix);
+                    }
                     var curCenter = new THREE.Vector3().copy(box.min).add(box.max).multiplyScalar(0.5);
                     var radius = new THREE.Vector3().copy(box.max).distanceTo(box.min)/2.;
                     center.add(curCenter);
@@ -185,7 +226,12 @@ threejs_renderer.BODY_PART2 = """
             camera.updateProjectionMatrix();
             controls.target = center;
             controls.update();
-            // adds and adjust a grid helper if needed
+            // adds and adjust a grid helper if needed (replacing the previous
+            // one, when the scene is fitted again as it streams in)
+            if (typeof gridHelper !== 'undefined') {
+                scene.remove(gridHelper);
+                scene.remove(axisHelper);
+            }
             gridHelper = new THREE.GridHelper(maxRad*4, 10)
             scene.add(gridHelper);
             gridHelper.visible = false;
@@ -197,8 +243,257 @@ threejs_renderer.BODY_PART2 = """
         function render() {
             //@IncrementTime@  TODO UNCOMMENT
             update_lights();
+            scene.traverse(function(child) {
+                if (child instanceof THREE.LOD) {
+                    child.update(camera);
+                }
+            });
             renderer.render(scene, camera);
         }
+        function log_first_mesh() {
+            if (!window.first_mesh_logged) {
+                window.first_mesh_logged = true;
+                console.log("first mesh displayed after " + performance.now().toFixed(0) + " ms");
+            }
+        }
+        function poll_lod_level(name, on_load) {
+            // the .json file is written once the level is ready
+            fetch(name + '.json', {cache: 'no-store'}).then(function(response) {
+                if (!response.ok) {
+                    setTimeout(function() { poll_lod_level(name, on_load); }, 500);
+                    return;
+                }
+                response.json().then(function(info) {
+                    load_mesh_buffers(name + '.bin', info.n_vertices, info.n_indices, function(geometry) {
+                        on_load(geometry, info.highlights);
+                    });
+                });
+            });
+        }
+        function add_lod(mesh, name, n_levels, materials) {
+            // mesh is the coarsest level of detail; the finer levels are
+            // loaded as soon as they are computed, see viewer.refine_meshes
+            var lod = new THREE.LOD();
+            mesh.userData.lod_level = 0;
+            lod.addLevel(mesh, 0);
+            scene.add(lod);
+            mesh.geometry.computeBoundingSphere();
+            var radius = mesh.geometry.boundingSphere.radius;
+            for (var level = 1; level <= n_levels; ++level) {
+                load_lod_level(lod, name, level, radius, materials);
+            }
+        }
+        function load_lod_level(lod, name, level, radius, materials) {
+            poll_lod_level(name + '_lod' + level, function(geometry, highlights) {
+                if (highlights.length > 0) {
+                    highlight_triangles(geometry, highlights);
+                }
+                var level_mesh = new THREE.Mesh(geometry, materials.length > 1 ? materials : materials[0]);
+                level_mesh.userData.lod_level = level;
+                lod.addLevel(level_mesh, 0);
+                // the finest level is drawn up close, and each coarser level
+                // from a further distance
+                var finest = Math.max.apply(null, lod.levels.map(function(item) {
+                    return item.object.userData.lod_level;
+                }));
+                lod.levels.forEach(function(item) {
+                    item.distance = 2 * radius * (finest - item.object.userData.lod_level);
+                });
+                lod.levels.sort(function(a, b) { return a.distance - b.distance; });
+            });
+        }
+        function add_instances(mesh, matrices) {
+            // draw the mesh of a part at each of its locations, with a
+            // single draw call if instancing is available (three.js r109+)
+            var box = new THREE.Box3();
+            mesh.geometry.computeBoundingBox();
+            var matrix = new THREE.Matrix4();
+            var object = mesh;
+            if (THREE.InstancedMesh) {
+                object = new THREE.InstancedMesh(mesh.geometry, mesh.material, matrices.length);
+                object.castShadow = true;
+                object.receiveShadow = true;
+            }
+            for (var i = 0; i < matrices.length; ++i) {
+                matrix.fromArray(matrices[i]);
+                box.union(mesh.geometry.boundingBox.clone().applyMatrix4(matrix));
+                if (THREE.InstancedMesh) {
+                    object.setMatrixAt(i, matrix);
+                } else {
+                    // one mesh per instance, sharing the geometry
+                    var instance = i == 0 ? mesh : mesh.clone();
+                    instance.matrixAutoUpdate = false;
+                    instance.matrix.copy(matrix);
+                    scene.add(instance);
+                }
+            }
+            if (THREE.InstancedMesh) {
+                object.userData.bounding_box = box;
+                scene.add(object);
+            }
+        }
+        function stream_scene(url) {
+            // the server sends each shape as soon as it is meshed, see
+            // scene_server.SceneServer; the scene is fitted to the first shape,
+            // and again once all the shapes are loaded
+            var source = new EventSource(url);
+            var loaded = {};
+            var n_loading = 0;
+            var done = false;
+            var fitted = false;
+            function on_load() {
+                n_loading -= 1;
+                if (!fitted || (done && n_loading == 0)) {
+                    fitted = true;
+                    fit_to_scene();
+                }
+            }
+            source.addEventListener('shape', function(event) {
+                var info = JSON.parse(event.data);
+                // events are sent again if the connection is lost
+                if (!loaded[info.url]) {
+                    loaded[info.url] = true;
+                    n_loading += 1;
+                    add_shape(info, on_load);
+                }
+            });
+            source.addEventListener('lines', function(event) {
+                var info = JSON.parse(event.data);
+                if (!loaded[info.url]) {
+                    loaded[info.url] = true;
+                    add_lines(info);
+                }
+            });
+            source.addEventListener('done', function() {
+                source.close();
+                done = true;
+                if (n_loading == 0) {
+                    fit_to_scene();
+                }
+            });
+        }
+        function add_shape(info, on_load) {
+            var materials = info.materials.map(function(m) {
+                var parameters = {color: m.color, specular: m.specular, shininess: m.shininess, side: THREE.DoubleSide};
+                if (m.transparency > 0.) {
+                    parameters.transparent = true;
+                    parameters.premultipliedAlpha = true;
+                    parameters.opacity = m.transparency;
+                }
+                return new THREE.MeshPhongMaterial(parameters);
+            });
+            load_mesh_buffers(info.url, info.n_vertices, info.n_indices, function(geometry) {
+                var mesh;
+                if (info.highlights.length > 0) {
+                    highlight_triangles(geometry, info.highlights);
+                    mesh = new THREE.Mesh(geometry, materials);
+                } else {
+                    mesh = new THREE.Mesh(geometry, materials[0]);
+                }
+                mesh.castShadow = true;
+                mesh.receiveShadow = true;
+                log_first_mesh();
+                if (info.matrices) {
+                    add_instances(mesh, info.matrices);
+                } else {
+                    scene.add(mesh);
+                }
+                on_load();
+            });
+        }
+        function add_lines(info) {
+            load_line_buffers(info.url, info.n_segments, info.n_edges, function(geometry, offsets) {
+                var material = new THREE.LineBasicMaterial({color: info.color, linewidth: info.line_width});
+                var line = new THREE.LineSegments(geometry, material);
+                line.userData.edge_offsets = offsets;
+                scene.add(line);
+            });
+        }
+        function base_material(object) {
+            // meshes with highlighted faces have one material per group
+            return Array.isArray(object.material) ? object.material[0] : object.material;
+        }
+        function highlight_triangles(geometry, highlights) {
+            // highlights[i] is a flat list of [start, count] triangle ranges,
+            // drawn with material i+1: the index is reordered to put the
+            // triangles of each material in a single group
+            var index = geometry.index.array;
+            var n_triangles = index.length / 3;
+            var materials = new Uint8Array(n_triangles);
+            for (var i = 0; i < highlights.length; ++i) {
+                var ranges = highlights[i];
+                for (var j = 0; j < ranges.length; j += 2) {
+                    materials.fill(i + 1, ranges[j], ranges[j] + ranges[j + 1]);
+                }
+            }
+            var new_index = new Uint32Array(index.length);
+            var n = 0;
+            for (var material = 0; material <= highlights.length; ++material) {
+                var start = n;
+                for (var t = 0; t < n_triangles; ++t) {
+                    if (materials[t] == material) {
+                        new_index[n] = index[3 * t];
+                        new_index[n + 1] = index[3 * t + 1];
+                        new_index[n + 2] = index[3 * t + 2];
+                        n += 3;
+                    }
+                }
+                geometry.addGroup(start, n - start, material);
+            }
+            geometry.setIndex(new THREE.BufferAttribute(new_index, 1));
+        }
+        function set_attribute(geometry, name, attribute) {
+            // addAttribute was renamed setAttribute in three.js r110
+            if (geometry.setAttribute) {
+                geometry.setAttribute(name, attribute);
+            } else {
+                geometry.addAttribute(name, attribute);
+            }
+        }
+        function load_line_buffers(url, n_segments, n_edges, on_load) {
+            // the file holds the ends of the line segments (float32) and the
+            // offsets of the edges in the segments (uint32)
+            fetch(url).then(function(response) {
+                return response.arrayBuffer();
+            }).then(function(buffer) {
+                var size = n_segments * 6;
+                var geometry = new THREE.BufferGeometry();
+                set_attribute(geometry, 'position', new THREE.BufferAttribute(
+                    new Float32Array(buffer, 0, size), 3));
+                on_load(geometry, new Uint32Array(buffer, 4 * size, n_edges + 1));
+            });
+        }
+        function find_edge(offsets, segment) {
+            // binary search of the edge made of this segment
+            var low = 0;
+            var high = offsets.length - 2;
+            while (low < high) {
+                var mid = Math.floor((low + high + 1) / 2);
+                if (offsets[mid] <= segment) {
+                    low = mid;
+                } else {
+                    high = mid - 1;
+                }
+            }
+            return low;
+        }
+        function load_mesh_buffers(url, n_vertices, n_indices, on_load) {
+            // the file holds the positions and normals (float32) and the
+            // triangle indices (uint32) of the mesh, one after the other
+            fetch(url).then(function(response) {
+                return response.arrayBuffer();
+            }).then(function(buffer) {
+                var size = n_vertices * 3;
+                var geometry = new THREE.BufferGeometry();
+                set_attribute(geometry, 'position', new THREE.BufferAttribute(
+                    new Float32Array(buffer, 0, size), 3));
+                set_attribute(geometry, 'normal', new THREE.BufferAttribute(
+                    new Float32Array(buffer, 4 * size, size), 3));
+                geometry.setIndex(new THREE.BufferAttribute(
+                    new Uint32Array(buffer, 8 * size, n_indices), 1));
+                on_load(geometry);
+            });
+        }
     </script>
 </body>
 """
@@ -209,6 +504,62 @@ class Viewer(threejs_renderer.ThreejsRenderer):
     # NB: The code below is mostly copied from ThreejsRenderer, with a few
     # changes to improve the display. The original style hasn't been changed,
     # so it looks a bit different from the rest of my code.
+    def __init__(self, path=None, binary=True, cache=None, lod_levels=0, instancing=True, streaming=False):
+        """Create a viewer writing its files in path (default: a temporary
+        directory).
+
+        If binary is True, meshes are written as raw binary buffers (see
+        meshing.write_mesh_buffers) instead of three.js JSON files. In that
+        case:
+        - meshes are also stored in and loaded from the cache, if a
+          TessellationCache is given;
+        - if lod_levels > 0, shapes are first meshed with a coarse quality,
+          and lod_levels finer meshes are computed in the background once
+          the page is served, down to the requested mesh quality (see
+          refine_meshes). The page swaps them in as they are ready, and
+          picks the level to draw from the distance to the camera;
+        - if instancing is True, the parts repeated in a shape (same TShape
+          at different locations, see instances.get_instances) are meshed
+          once, and drawn as instanced geometry. Levels of detail are not
+          computed for them.
+
+        If streaming is True (binary only), shapes are meshed when the scene
+        is rendered rather than when they are displayed, and render serves
+        each of them to the page as soon as it is meshed (see
+        iter_scene_events and scene_server.SceneServer). The parts of a
+        shape are meshed and sent one by one. Levels of detail are not
+        computed in this mode.
+        """
+        if streaming and not binary:
+            raise ValueError("Streaming requires binary meshes")
+        super().__init__(path)
+        self._binary = binary
+        self._cache = cache
+        self._lod_levels = 0 if streaming else lod_levels
+        self._instancing = instancing
+        self._streaming = streaming
+        # calls to DisplayShape and Highlight left for iter_scene_events
+        self._pending_shapes = [] if streaming else None
+        self._pending_highlights = [] if streaming else None
+        # locations of the instances of the parts meshed once
+        self._instances = {}
+        # (shape, mesh qualities) of the finer levels of detail of the meshes
+        self._lod_shapes = {}
+        # number of vertices and indices of the meshes in binary files
+        self._mesh_buffers = {}
+        # polylines to draw, by (color, line width), see _write_edge_batches
+        self._edge_batches = {}
+        # (face map, face ids, triangle offsets) of the meshes, and the faces
+        # to highlight by color, see Highlight
+        self._face_triangles = {}
+        self._face_highlights = {}
+        # (edge map, polylines, line width) of the edges of the meshes, and
+        # the edges to highlight by (color, line width)
+        self._shape_edges = {}
+        self._edge_highlights = {}
+        # number of segments and edges of the line segments in binary files
+        self._line_buffers = {}
+
     def DisplayShape(self,
                      shape,
                      export_edges=False,
@@ -223,6 +574,9 @@ class Viewer(threejs_renderer.ThreejsRenderer):
         if is_edge(shape):
             print("discretize an edge")
             pnts = discretize_edge(shape, deflection=1e-2)
+            if self._binary:
+                self._add_edge_batch([pnts], color, line_width)
+                return self._3js_shapes, self._3js_edges
             edge_hash = "edg%s" % uuid.uuid4().hex
             str_to_write = export_edgedata_to_json(edge_hash, pnts)
             edge_full_path = os.path.join(self._path, edge_hash + '.json')
@@ -234,6 +588,9 @@ class Viewer(threejs_renderer.ThreejsRenderer):
         elif is_wire(shape):
             print("discretize a wire")
             pnts = discretize_wire(shape)
+            if self._binary:
+                self._add_edge_batch([pnts], color, line_width)
+                return self._3js_shapes, self._3js_edges
             wire_hash = "wir%s" % uuid.uuid4().hex
             str_to_write = export_edgedata_to_json(wire_hash, pnts)
             wire_full_path = os.path.join(self._path, wire_hash + '.json')
@@ -242,8 +599,28 @@ class Viewer(threejs_renderer.ThreejsRenderer):
             # store this edge hash
             self._3js_edges[wire_hash] = [color, line_width]
             return self._3js_shapes, self._3js_edges
+        if self._pending_shapes is not None:
+            # meshed when the scene is rendered, see iter_scene_events
+            self._pending_shapes.append((shape, export_edges, color, specular_color, shininess, transparency, line_color, line_width, mesh_quality))
+            return self._3js_shapes, self._3js_edges
+        if self._binary and self._instancing:
+            instances = get_instances(shape)
+            # when streaming, parts are meshed and sent one by one
+            if has_repeated_parts(instances) or (self._streaming and len(instances) > 1):
+                # mesh each part once, and draw it at each of its locations
+                for prototype, locations in instances:
+                    shape_hash = "shp%s" % uuid.uuid4().hex
+                    self._display_mesh(prototype, shape_hash, export_edges, mesh_quality, line_width, lod=False)
+                    self._instances[shape_hash] = locations
+                    self._3js_shapes[shape_hash] = [export_edges, color, specular_color, shininess, transparency, line_color, line_width]
+                return self._3js_shapes, self._3js_edges
         shape_uuid = uuid.uuid4().hex
         shape_hash = "shp%s" % shape_uuid
+        if self._binary:
+            self._display_mesh(shape, shape_hash, export_edges, mesh_quality, line_width)
+            # add this shape to the shape dict, sotres everything related to it
+            self._3js_shapes[shape_hash] = [export_edges, color, specular_color, shininess, transparency, line_color, line_width]
+            return self._3js_shapes, self._3js_edges
         # tesselate
         tess = ShapeTesselator(shape)
         tess.Compute(compute_edges=export_edges,
@@ -254,13 +631,10 @@ class Viewer(threejs_renderer.ThreejsRenderer):
                                                                     shape_hash,
                                                                     tess.ObjGetTriangleCount()))
         sys.stdout.flush()
-        # export to 3JS
-        shape_full_path = os.path.join(self._path, shape_hash + '.json')
         # add this shape to the shape dict, sotres everything related to it
         self._3js_shapes[shape_hash] = [export_edges, color, specular_color, shininess, transparency, line_color, line_width]
-        # generate the mesh
-        #tess.ExportShapeToThreejs(shape_hash, shape_full_path)
-        # and also to JSON
+        # export to 3JS JSON
+        shape_full_path = os.path.join(self._path, shape_hash + '.json')
         with open(shape_full_path, 'w') as json_file:
             json_file.write(tess.ExportShapeToThreejsJSONString(shape_uuid))
         # draw edges if necessary
@@ -285,3 +659,370 @@ class Viewer(threejs_renderer.ThreejsRenderer):
                 # store this edge hash, with black color
                 self._3js_edges[edge_hash] = [(0, 0, 0), line_width]
         return self._3js_shapes, self._3js_edges
+
+    def _display_mesh(self, shape, shape_hash, export_edges, mesh_quality, line_width, lod=True):
+        """Mesh a shape (or get its mesh from the cache) and write it as
+        binary buffers, loaded as typed arrays by the browser."""
+        # hash the shape once for all its levels of detail
+        geometry_hash = hash_shape(shape) if self._cache is not None else None
+        if lod and self._lod_levels > 0:
+            # finer levels are computed later, see _start_refinement
+            qualities = [mesh_quality * LOD_QUALITY_FACTOR ** level for level in range(self._lod_levels, -1, -1)]
+            self._lod_shapes[shape_hash] = (shape, qualities[1:], geometry_hash)
+            mesh_quality = qualities[0]
+        mesh = compute_mesh_cached(shape, self._cache, export_edges, mesh_quality, geometry_hash)
+        positions, normals, indices = mesh['positions'], mesh['normals'], mesh['indices']
+        # update spinning cursor
+        sys.stdout.write("\r%s mesh shape %s, %i triangles     " % (next(self.spinning_cursor),
+                                                                    shape_hash,
+                                                                    len(indices) // 3))
+        sys.stdout.flush()
+        shape_full_path = os.path.join(self._path, shape_hash + '.bin')
+        write_mesh_buffers(shape_full_path, positions, normals, indices)
+        self._mesh_buffers[shape_hash] = (len(positions), len(indices))
+        # keep the triangles of each face, to highlight faces later
+        if 'face_ids' in mesh:
+            self._face_triangles[shape_hash] = (get_face_map(shape), mesh['face_ids'], mesh['face_offsets'])
+        if export_edges:
+            # the edges go in a single buffer with black color, apart from
+            # highlighted ones, see _write_edge_batches
+            polylines = get_polylines(mesh['edge_points'], mesh['edge_offsets'])
+            edge_map = get_edge_map(shape)
+            if edge_map.Extent() != len(polylines):
+                edge_map = None
+            self._shape_edges[shape_hash] = (edge_map, polylines, line_width)
+
+    def Highlight(self, shapes, color=(1., 0., 0.), line_width=None):
+        """Highlight faces or edges of the shapes displayed by DisplayShape.
+
+        The triangles of the faces and the segments of the edges are drawn
+        with this color (and line width, for edges) instead of their own,
+        without meshing them again or adding draw calls per face or edge.
+        Faces and edges that are not part of a displayed shape are displayed
+        on their own. Faces and edges of a part drawn as instanced geometry
+        are highlighted in every instance of the part.
+        """
+        color = tuple(color)
+        if self._pending_highlights is not None:
+            # matched with the shapes as they are meshed, see iter_scene_events
+            self._pending_highlights.append(([shape for shape in shapes], color, line_width))
+            return
+        for shape in shapes:
+            if not self._highlight_shape(shape, color, line_width, list(self._3js_shapes)):
+                self._display_highlight(shape, color, line_width)
+
+    def _highlight_shape(self, shape, color, line_width, shape_hashes):
+        """Highlight a face or edge of one of the displayed shapes with these
+        hashes. Return whether it was found in one of them."""
+        if shape.ShapeType() == TopAbs_FACE:
+            for shape_hash in shape_hashes:
+                if shape_hash not in self._face_triangles:
+                    continue
+                face_map = self._face_triangles[shape_hash][0]
+                face_id = max(face_map.FindIndex(face) for face in self._get_prototype_shapes(shape_hash, shape)) - 1
+                if face_id >= 0:
+                    self._face_highlights.setdefault(shape_hash, {}).setdefault(color, []).append(face_id)
+                    return True
+        elif shape.ShapeType() == TopAbs_EDGE:
+            for shape_hash in shape_hashes:
+                if shape_hash not in self._shape_edges:
+                    continue
+                edge_map, polylines, shape_line_width = self._shape_edges[shape_hash]
+                edge_id = -1
+                if edge_map is not None:
+                    for edge in self._get_prototype_shapes(shape_hash, shape):
+                        edge_id = edge_map.FindIndex(edge) - 1
+                        if edge_id >= 0:
+                            break
+                # check that the ShapeTesselator has the same edge order
+                if edge_id >= 0 and polyline_matches_edge(polylines[edge_id], edge):
+                    style = (color, line_width or shape_line_width)
+                    self._edge_highlights.setdefault(shape_hash, {}).setdefault(style, []).append(edge_id)
+                    return True
+        return False
+
+    def _display_highlight(self, shape, color, line_width):
+        """Display a highlighted shape that is not part of a displayed shape."""
+        if shape.ShapeType() == TopAbs_EDGE:
+            self.DisplayShape(shape, color=color, line_width=line_width or 1.)
+        else:
+            self.DisplayShape(shape, color=color)
+
+    def _get_prototype_shapes(self, shape_hash, shape):
+        """Get the sub-shapes of a displayed shape that may be this shape.
+
+        If the shape with this hash is a part drawn at several locations,
+        these are the shape moved back from each of them.
+        """
+        if shape_hash not in self._instances:
+            return [shape]
+        return [shape.Moved(location.Inverted()) for location in self._instances[shape_hash]]
+
+    def _add_edge_batch(self, polylines, color, line_width):
+        """Add polylines to the batch of lines drawn with this style."""
+        self._edge_batches.setdefault((tuple(color), line_width), []).extend(polylines)
+
+    def _write_edge_batches(self):
+        """Write each batch of lines as one binary file of line segments.
+
+        Each batch is drawn as a single LineSegments object, instead of one
+        file and one object per edge.
+        """
+        for shape_hash, (_, polylines, line_width) in self._shape_edges.items():
+            styles = {}
+            for style, edge_ids in self._edge_highlights.get(shape_hash, {}).items():
+                for edge_id in edge_ids:
+                    styles[edge_id] = style
+            # the edges of instanced parts are moved to each instance
+            if shape_hash in self._instances:
+                matrices = [get_location_matrix(location) for location in self._instances[shape_hash]]
+            else:
+                matrices = [None]
+            for matrix in matrices:
+                for edge_id, polyline in enumerate(polylines):
+                    style = styles.get(edge_id, ((0, 0, 0), line_width))
+                    if matrix is not None:
+                        polyline = transform_points(polyline, matrix)
+                    self._edge_batches.setdefault(style, []).append(polyline)
+        self._shape_edges.clear()
+        self._edge_highlights.clear()
+        for (color, line_width), polylines in self._edge_batches.items():
+            segments, offsets = get_line_segments(polylines)
+            edge_hash = "edg%s" % uuid.uuid4().hex
+            edge_full_path = os.path.join(self._path, edge_hash + '.bin')
+            write_line_buffers(edge_full_path, segments, offsets)
+            self._3js_edges[edge_hash] = [color, line_width]
+            self._line_buffers[edge_hash] = (len(segments) // 2, len(polylines))
+        self._edge_batches.clear()
+
+    def generate_html_file(self):
+        """Generate the HTML file to be rendered by the web browser."""
+        if self._streaming:
+            # the page gets the shapes from the server, see render
+            self._write_html_file("\t\t\tstream_scene('events');\n")
+            return
+        self._write_edge_batches()
+        # loop over shapes to generate html shapes stuff
+        shape_string_list = []
+        shape_string_list.append("loader = new THREE.BufferGeometryLoader();\n")
+        shape_idx = 0
+        for shape_hash in self._3js_shapes:
+            # get properties for this shape
+            export_edges, color, specular_color, shininess, transparency, line_color, line_width = self._3js_shapes[shape_hash]
+            # creates a material for the shape
+            shape_string_list.append('\t\t\t%s_phong_material = new THREE.MeshPhongMaterial({' % shape_hash)
+            shape_string_list.append('color:%s,' % color_to_hex(color))
+            shape_string_list.append('specular:%s,' % color_to_hex(specular_color))
+            shape_string_list.append('shininess:%g,' % shininess)
+            # force double side rendering, see pythonocc issue #645
+            shape_string_list.append('side: THREE.DoubleSide,')
+            if transparency > 0.:
+                shape_string_list.append('transparent: true, premultipliedAlpha: true, opacity:%g,' % transparency)
+            shape_string_list.append('});\n')
+            # creates a material for each highlight color
+            highlights = self._face_highlights.get(shape_hash, {})
+            materials = ['%s_phong_material' % shape_hash]
+            for highlight_color in highlights:
+                material = '%s_highlight_material_%d' % (shape_hash, len(materials))
+                shape_string_list.append('\t\t\t%s = new THREE.MeshPhongMaterial({' % material)
+                shape_string_list.append('color:%s,' % color_to_hex(highlight_color))
+                shape_string_list.append('specular:%s,' % color_to_hex(specular_color))
+                shape_string_list.append('shininess:%g,' % shininess)
+                shape_string_list.append('side: THREE.DoubleSide,')
+                shape_string_list.append('});\n')
+                materials.append(material)
+            # load geometry files
+            if shape_hash in self._mesh_buffers:
+                n_vertices, n_indices = self._mesh_buffers[shape_hash]
+                shape_string_list.append("\t\t\tload_mesh_buffers('%s.bin', %d, %d, function(geometry) {\n" % (shape_hash, n_vertices, n_indices))
+            else:
+                shape_string_list.append("\t\t\tloader.load('%s.json', function(geometry) {\n" % shape_hash)
+            if highlights:
+                # highlighted faces are drawn as groups of the same mesh
+                _, face_ids, offsets = self._face_triangles[shape_hash]
+                ranges = [get_triangle_ranges(face_ids, offsets, ids) for ids in highlights.values()]
+                shape_string_list.append("\t\t\t\thighlight_triangles(geometry, %s);\n" % json.dumps(ranges))
+                shape_string_list.append("\t\t\t\tmesh = new THREE.Mesh(geometry, [%s]);\n" % ", ".join(materials))
+            else:
+                shape_string_list.append("\t\t\t\tmesh = new THREE.Mesh(geometry, %s_phong_material);\n" % shape_hash)
+            # enable shadows for object
+            shape_string_list.append("\t\t\t\tmesh.castShadow = true;\n")
+            shape_string_list.append("\t\t\t\tmesh.receiveShadow = true;\n")
+            shape_string_list.append("\t\t\t\tlog_first_mesh();\n")
+            # add mesh to scene
+            if shape_hash in self._instances:
+                # column-major 4x4 matrices, as read by Matrix4.fromArray
+                matrices = [get_location_matrix(location).T.ravel().tolist() for location in self._instances[shape_hash]]
+                shape_string_list.append("\t\t\t\tadd_instances(mesh, %s);\n" % json.dumps(matrices))
+            elif shape_hash in self._lod_shapes:
+                n_levels = len(self._lod_shapes[shape_hash][1])
+                shape_string_list.append("\t\t\t\tadd_lod(mesh, '%s', %d, [%s]);\n" % (shape_hash, n_levels, ", ".join(materials)))
+            else:
+                shape_string_list.append("\t\t\t\tscene.add(mesh);\n")
+            # last shape, we request for a fit_to_scene
+            if shape_idx == len(self._3js_shapes) - 1:
+                shape_string_list.append("\tfit_to_scene();});\n")
+            else:
+                shape_string_list.append("\t\t\t});\n\n")
+            shape_idx += 1
+        # process edges
+        edge_string_list = []
+        for edge_hash in self._3js_edges:
+            color, line_width = self._3js_edges[edge_hash]
+            if edge_hash in self._line_buffers:
+                n_segments, n_edges = self._line_buffers[edge_hash]
+                edge_string_list.append("\t\t\tload_line_buffers('%s.bin', %d, %d, function(geometry, offsets) {\n" % (edge_hash, n_segments, n_edges))
+                edge_string_list.append("\t\t\t\tline_material = new THREE.LineBasicMaterial({color: %s, linewidth: %s});\n" % ((color_to_hex(color), line_width)))
+                edge_string_list.append("\t\t\t\tline = new THREE.LineSegments(geometry, line_material);\n")
+                # keep the offsets of the edges for picking
+                edge_string_list.append("\t\t\t\tline.userData.edge_offsets = offsets;\n")
+            else:
+                edge_string_list.append("\t\t\tloader.load('%s.json', function(geometry) {\n" % edge_hash)
+                edge_string_list.append("\t\t\t\tline_material = new THREE.LineBasicMaterial({color: %s, linewidth: %s});\n" % ((color_to_hex(color), line_width)))
+                edge_string_list.append("\t\t\t\tline = new THREE.Line(geometry, line_material);\n")
+            # add mesh to scene
+            edge_string_list.append("\t\t\t\tscene.add(line);\n")
+            edge_string_list.append("\t\t\t});\n")
+        self._write_html_file("".join(shape_string_list) + "".join(edge_string_list))
+        self._start_refinement()
+
+    def _write_html_file(self, scene_script):
+        """Write the HTML file, with this script to load the scene."""
+        with open(self._html_filename, "w") as fp:
+            fp.write("<!DOCTYPE HTML>\n")
+            fp.write('<html lang="en">')
+            # header
+            fp.write(threejs_renderer.HEADER.replace('@bg_gradient_color1@', '#ced7de').replace('@bg_gradient_color2@', '#808080').replace('@VERSION@', OCC_VERSION))
+            # body
+            body = (threejs_renderer.BODY_PART0 + threejs_renderer.BODY_PART1 +
+                    scene_script + threejs_renderer.BODY_PART2)
+            fp.write(body)
+            fp.write("</html>\n")
+
+    def iter_scene_events(self):
+        """Mesh the shapes left by DisplayShape in streaming mode, and yield
+        the scene events sent to the page (see scene_server.SceneServer).
+
+        A ('shape', info) event is yielded as soon as a shape is meshed, with
+        its highlighted faces: the page can load and draw it right away.
+        The lines of the scene are all known at the end, and are yielded as
+        ('lines', info) events.
+        """
+        pending_shapes, self._pending_shapes = self._pending_shapes or [], None
+        pending_highlights, self._pending_highlights = self._pending_highlights or [], None
+        # the highlighted shapes not found in the shapes meshed so far
+        unmatched = pending_highlights
+        for args in pending_shapes:
+            known = set(self._3js_shapes)
+            self.DisplayShape(*args)
+            new_hashes = [shape_hash for shape_hash in self._3js_shapes if shape_hash not in known]
+            unmatched = [([shape for shape in shapes if not self._highlight_shape(shape, color, line_width, new_hashes)], color, line_width)
+                         for shapes, color, line_width in unmatched]
+            for shape_hash in new_hashes:
+                yield 'shape', self._get_shape_info(shape_hash)
+        # the remaining highlighted shapes are displayed on their own
+        known = set(self._3js_shapes)
+        for shapes, color, line_width in unmatched:
+            for shape in shapes:
+                self._display_highlight(shape, color, line_width)
+        for shape_hash in self._3js_shapes:
+            if shape_hash not in known:
+                yield 'shape', self._get_shape_info(shape_hash)
+        self._write_edge_batches()
+        for edge_hash, (color, line_width) in self._3js_edges.items():
+            n_segments, n_edges = self._line_buffers[edge_hash]
+            yield 'lines', {'url': edge_hash + '.bin', 'n_segments': n_segments, 'n_edges': n_edges,
+                            'color': int(color_to_hex(color), 16), 'line_width': line_width}
+
+    def _get_shape_info(self, shape_hash):
+        """Get what the page needs to draw a shape written by _display_mesh:
+        its binary file, materials, highlighted triangles and instances."""
+        _, color, specular_color, shininess, transparency, _, _ = self._3js_shapes[shape_hash]
+        highlights = self._face_highlights.get(shape_hash, {})
+        # the first material is the shape's, then one per highlight color
+        materials = [(color, transparency)] + [(highlight_color, 0.) for highlight_color in highlights]
+        ranges = []
+        if highlights:
+            _, face_ids, offsets = self._face_triangles[shape_hash]
+            ranges = [get_triangle_ranges(face_ids, offsets, ids) for ids in highlights.values()]
+        n_vertices, n_indices = self._mesh_buffers[shape_hash]
+        info = {'url': shape_hash + '.bin', 'n_vertices': n_vertices, 'n_indices': n_indices,
+                'materials': [{'color': int(color_to_hex(material_color), 16), 'specular': int(color_to_hex(specular_color), 16),
+                               'shininess': shininess, 'transparency': material_transparency}
+                              for material_color, material_transparency in materials],
+                'highlights': ranges}
+        if shape_hash in self._instances:
+            info['matrices'] = [get_location_matrix(location).T.ravel().tolist() for location in self._instances[shape_hash]]
+        return info
+
+    def render(self, addr="localhost", server_port=8080, open_webbrowser=False):
+        """Render the scene into the browser.
+
+        In streaming mode, the page is served right away, and the shapes are
+        meshed and sent to it while it loads, by an asynchronous server.
+        """
+        if not self._streaming:
+            return super().render(addr, server_port, open_webbrowser)
+        self.generate_html_file()
+        events = self.iter_scene_events()
+        server = SceneServer(self._path, lambda: next(events, None))
+        try:
+            asyncio.run(server.serve(addr, server_port, open_webbrowser))
+        except KeyboardInterrupt:
+            pass
+
+    def _start_refinement(self):
+        """Start computing the finer levels of detail in another process."""
+        if not self._lod_shapes:
+            return
+        tasks = []
+        for shape_hash, (shape, qualities, geometry_hash) in self._lod_shapes.items():
+            brep_path = os.path.join(self._path, shape_hash + '.brep')
+            breptools_Write(shape, brep_path)
+            highlights = list(self._face_highlights.get(shape_hash, {}).values())
+            tasks.append((shape_hash, brep_path, qualities, highlights, geometry_hash))
+        cache_directory = str(self._cache.root) if self._cache is not None else None
+        Process(target=refine_meshes, args=(self._path, tasks, cache_directory), daemon=True).start()
+        self._lod_shapes = {}
+
+
+def refine_meshes(directory, tasks, cache_directory=None):
+    """Compute the finer levels of detail of the meshes of a Viewer.
+
+    Each task is a tuple (shape hash, BRep path, mesh qualities, highlighted
+    face ids by color, hash_shape of the shape or None). Level i (from 1) of a shape is written in directory
+    as <shape hash>_lod<i>.bin (see write_mesh_buffers), followed by a .json
+    file giving its size and highlighted triangle ranges, which the page
+    polls. Each level is computed for all the shapes before the next one.
+    """
+    cache = TessellationCache(cache_directory) if cache_directory else None
+    shapes = {}
+    for shape_hash, brep_path, _, _, _ in tasks:
+        shapes[shape_hash] = TopoDS_Shape()
+        breptools_Read(shapes[shape_hash], brep_path, BRep_Builder())
+    n_levels = max(len(qualities) for _, _, qualities, _, _ in tasks)
+    for level in range(1, n_levels + 1):
+        for shape_hash, _, qualities, highlights, geometry_hash in tasks:
+            if level > len(qualities):
+                continue
+            mesh = compute_mesh_cached(shapes[shape_hash], cache,
+                                       mesh_quality=qualities[level - 1],
+                                       geometry_hash=geometry_hash)
+            name = "%s_lod%d" % (shape_hash, level)
+            write_mesh_buffers(os.path.join(directory, name + '.bin'),
+                               mesh['positions'], mesh['normals'],
+                               mesh['indices'])
+            ranges = []
+            if 'face_ids' in mesh:
+                ranges = [get_triangle_ranges(mesh['face_ids'],
+                                              mesh['face_offsets'], ids)
+                          for ids in highlights]
+            info = {'n_vertices': len(mesh['positions']),
+                    'n_indices': len(mesh['indices']),
+                    'highlights': ranges}
+            # Write the .json file atomically, so the page never sees it
+            # before the level is ready.
+            json_path = os.path.join(directory, name + '.json')
+            with open(json_path + '.tmp', 'w') as f:
+                json.dump(info, f)
+            os.replace(json_path + '.tmp', json_path)